@@ -15,10 +15,18 @@ import os
 import json
 import re
 import io
+import copy
+from collections import OrderedDict
 sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
 from utils.pdf_generator import PDFReportGenerator
 
 from utils.market_analyzer import MarketAnalyzer
+from utils.market_store import ArmazemMercado
+from utils.excel_importer import carregar_planilha, safe_float
+from utils.rastreamento import RastreioImportacao
+from utils.orcamento import alocar_orcamento_marketing
+from utils.desempenho import MedidorRerun, tamanho_sessao
+from utils import instrumentacao
 from utils.visualizations import (
     criar_grafico_evolucao_categoria,
     criar_grafico_ticket_medio,
@@ -28,9 +36,17 @@ from utils.visualizations import (
     criar_grafico_crescimento,
     criar_gauge_score,
     criar_comparacao_tickets,
-    criar_grafico_evolucao_subcategoria
+    criar_grafico_evolucao_subcategoria,
+    criar_grafico_evolucao_multiplas,
+    criar_grafico_historico_desempenho,
+    estatisticas_cache_figuras,
+    LIMITE_PONTOS_SERIE,
+    TEMA_ESCURO
 )
 
+# Cronômetro das etapas deste rerun (usado pelo painel de desempenho)
+medidor = MedidorRerun()
+
 # Configuração da página
 st.set_page_config(
     page_title="Inteligência de Mercado",
@@ -39,6 +55,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Painel de desempenho opcional, ligado só pelo operador (variável de ambiente MERCADO_DEBUG=1):
+# a instrumentação vale para o processo inteiro, então não pode ser ativada por um visitante.
+# As métricas do rerun são a diferença entre snapshots, sem zerar as das outras sessões.
+PAINEL_DESEMPENHO = os.environ.get("MERCADO_DEBUG", "").strip() == "1"
+HISTORICO_DESEMPENHO = 30
+if PAINEL_DESEMPENHO:
+    instrumentacao.ativar()
+    metricas_no_inicio = instrumentacao.snapshot()
+    figuras_no_inicio = estatisticas_cache_figuras()
+    calculos_no_inicio = dict(st.session_state.get('_estatisticas_calculos', {'hits': 0, 'misses': 0}))
+
 # --- FUNÇÕES UTILITÁRIAS ---
 
 def format_br(valor):
@@ -73,12 +100,131 @@ def parse_large_number(text):
             return 0.0
     return 0.0
 
-def safe_float(val):
-    try:
-        if pd.isna(val): return 0.0
-        return float(val)
-    except:
-        return 0.0
+# Fragmentos reexecutam apenas o próprio trecho quando seus widgets mudam
+fragmento = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+# Resultados guardados por método do analyzer (os mais recentes; cada método tem o seu limite)
+LIMITE_CACHE_POR_METODO = 8
+
+def _copia_resultado(valor):
+    """Cópia entregue a quem chamou, para que alterações no lugar não corrompam o cache"""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy()
+    return copy.deepcopy(valor)
+
+def calculo_em_cache(analyzer, metodo, *args):
+    """
+    Executa um método do analyzer uma única vez por versão dos dados de mercado e dos
+    dados do cliente. O cache vive na sessão, então seções revisitadas não recalculam.
+    Devolve sempre uma cópia do resultado guardado.
+    """
+    cliente = tuple(sorted((k, repr(v)) for k, v in analyzer.cliente_data.items()))
+    chave = (getattr(analyzer, 'versao_dados', 0), cliente, repr(args))
+    cache = st.session_state.setdefault('_cache_calculos', {})
+    estatisticas = st.session_state.setdefault('_estatisticas_calculos', {'hits': 0, 'misses': 0})
+    if cache.get('analyzer_id') != id(analyzer):
+        cache.clear()
+        cache.update({'analyzer_id': id(analyzer), 'metodos': {}})
+    resultados = cache['metodos'].setdefault(metodo, OrderedDict())
+    if chave in resultados:
+        estatisticas['hits'] += 1
+        resultados.move_to_end(chave)
+    else:
+        estatisticas['misses'] += 1
+        resultados[chave] = getattr(analyzer, metodo)(*args)
+        while len(resultados) > LIMITE_CACHE_POR_METODO:
+            resultados.popitem(last=False)
+    return _copia_resultado(resultados[chave])
+
+TAMANHO_PAGINA_EDITOR = 50
+
+# Janelas de consolidação oferecidas na lista de subcategorias (meses; None = todo o histórico)
+JANELAS_CONSOLIDACAO = {
+    "Todo o histórico": None,
+    "Últimos 3 meses": 3,
+    "Últimos 6 meses": 6,
+    "Últimos 12 meses": 12,
+}
+
+def editor_em_lote(df, chave, tamanho_pagina=TAMANHO_PAGINA_EDITOR):
+    """
+    Editor de grade paginado (st.data_editor dentro de um st.form, um rerun por salvamento).
+    Retorna (página original, página editada) quando o usuário salva, senão (None, None).
+    A coluna 'ID' identifica a linha original; linhas adicionadas chegam com ID vazio.
+    """
+    n_paginas = max(1, -(-len(df) // tamanho_pagina))
+    pagina = 1
+    if n_paginas > 1:
+        pagina = int(st.number_input(f"Página (de {n_paginas})", min_value=1, max_value=n_paginas, value=1, key=f"pagina_{chave}"))
+    inicio = (pagina - 1) * tamanho_pagina
+    df_pagina = df.iloc[inicio:inicio + tamanho_pagina].reset_index(drop=True)
+    df_pagina.insert(0, 'ID', range(inicio, inicio + len(df_pagina)))
+    
+    with st.form(f"form_editor_{chave}_{pagina}"):
+        editado = st.data_editor(
+            df_pagina, key=f"editor_{chave}_{pagina}", num_rows="dynamic", hide_index=True,
+            use_container_width=True, column_config={'ID': st.column_config.NumberColumn(disabled=True)}
+        )
+        salvar = st.form_submit_button("💾 Salvar Alterações", use_container_width=True)
+    
+    if salvar:
+        return df_pagina, editado
+    return None, None
+
+def _linhas_editadas(original, editado):
+    """Separa a edição da grade em (removidas, alteradas [(antiga, nova)], novas)"""
+    ids_editados = set(editado['ID'].dropna().astype(int))
+    removidas = original[~original['ID'].isin(ids_editados)]
+    por_id = original.set_index('ID')
+    alteradas, novas = [], []
+    for row in editado.itertuples(index=False):
+        linha = row._asdict()
+        if pd.isna(linha['ID']):
+            novas.append(linha)
+            continue
+        antiga = por_id.loc[int(linha['ID'])].to_dict()
+        if any(str(antiga[c]) != str(linha[c]) for c in antiga):
+            alteradas.append((antiga, linha))
+    return removidas, alteradas, novas
+
+def diff_periodos_categoria(categoria, original, editado):
+    """Converte a edição da grade de períodos em registros de alteração para o analyzer"""
+    removidas, alteradas, novas = _linhas_editadas(original, editado)
+    alteracoes = [{'acao': 'remover', 'nivel': 'categoria', 'categoria': categoria, 'periodo': per} for per in removidas['periodo']]
+    for antiga, nova in alteradas:
+        alteracoes.append({
+            'acao': 'atualizar', 'nivel': 'categoria', 'categoria': categoria,
+            'periodo': antiga['periodo'], 'novo_periodo': str(nova['periodo']),
+            'faturamento': safe_float(nova['faturamento']), 'unidades': int(safe_float(nova['unidades']))
+        })
+    for nova in novas:
+        if pd.notna(nova['periodo']) and str(nova['periodo']).strip():
+            alteracoes.append({
+                'acao': 'inserir', 'nivel': 'categoria', 'categoria': categoria, 'periodo': str(nova['periodo']),
+                'faturamento': safe_float(nova['faturamento']), 'unidades': int(safe_float(nova['unidades']))
+            })
+    return alteracoes
+
+def diff_subcategorias(categoria, original, editado):
+    """Converte a edição da grade de subcategorias consolidadas em registros de alteração"""
+    removidas, alteradas, novas = _linhas_editadas(original, editado)
+    alteracoes = [{'acao': 'remover', 'nivel': 'subcategoria', 'categoria': categoria, 'subcategoria': sub} for sub in removidas['subcategoria']]
+    for antiga, nova in alteradas:
+        alt = {'acao': 'atualizar', 'nivel': 'subcategoria', 'categoria': categoria, 'subcategoria': antiga['subcategoria']}
+        if str(nova['subcategoria']).strip() and nova['subcategoria'] != antiga['subcategoria']:
+            alt['novo_nome'] = str(nova['subcategoria']).strip()
+        if safe_float(nova['faturamento_6m']) != safe_float(antiga['faturamento_6m']):
+            alt['faturamento'] = safe_float(nova['faturamento_6m'])
+        if safe_float(nova['unidades_6m']) != safe_float(antiga['unidades_6m']):
+            alt['unidades'] = int(safe_float(nova['unidades_6m']))
+        alteracoes.append(alt)
+    for nova in novas:
+        if pd.notna(nova['subcategoria']) and str(nova['subcategoria']).strip():
+            alteracoes.append({
+                'acao': 'inserir', 'nivel': 'subcategoria', 'categoria': categoria, 'subcategoria': str(nova['subcategoria']).strip(),
+                'faturamento': safe_float(nova['faturamento_6m']), 'unidades': int(safe_float(nova['unidades_6m']))
+            })
+    return alteracoes
 
 def calcular_limites_ticket_local(ticket_mercado, range_permitido=0.20):
     """Calcula limites inferior e superior baseado no ticket do mercado"""
@@ -152,96 +298,32 @@ if 'analyzer' not in st.session_state:
 else:
     # Verificar se o analyzer na sessão tem os métodos mais recentes
     # Se não tiver, migramos os dados para uma nova instância da classe atualizada
-    if not hasattr(st.session_state.analyzer, 'identificar_anomalias') or not hasattr(st.session_state.analyzer, 'editar_mercado_categoria'):
+    if not hasattr(st.session_state.analyzer, 'identificar_anomalias') or not hasattr(st.session_state.analyzer, 'editar_mercado_categoria') \
+            or not hasattr(st.session_state.analyzer, '_totais_mercado') or not hasattr(st.session_state.analyzer, '_registros_subcategoria'):
         old_data = st.session_state.analyzer
         new_analyzer = MarketAnalyzer()
         # Migração segura de dados
         new_analyzer.cliente_data = getattr(old_data, 'cliente_data', {})
         new_analyzer.mercado_categoria = getattr(old_data, 'mercado_categoria', {})
         new_analyzer.mercado_subcategorias = getattr(old_data, 'mercado_subcategorias', {})
+        new_analyzer.reconstruir_indices()
         st.session_state.analyzer = new_analyzer
         st.toast("🔄 Sistema atualizado para a versão de Inteligência 2.0", icon="🚀")
 
+@st.cache_resource
+def obter_armazem():
+    """Base SQLite compartilhada entre sessões, ou None se a persistência não estiver configurada"""
+    caminho = os.environ.get("MERCADO_DB")
+    return ArmazemMercado(caminho) if caminho else None
+
 # --- LÓGICA DE IMPORTAÇÃO EXCEL ---
 
 def processar_excel(file):
+    rastreio = RastreioImportacao(file)
     try:
-        temp_analyzer = MarketAnalyzer()
-        
-        # 1. Cliente
-        df_cliente = pd.read_excel(file, sheet_name="Cliente", header=None)
-        
-        def get_val_by_label(labels, default=""):
-            if isinstance(labels, str): labels = [labels]
-            for i in range(len(df_cliente)):
-                cell_val = str(df_cliente.iloc[i, 0]).strip().lower()
-                for label in labels:
-                    if label.lower() in cell_val:
-                        return df_cliente.iloc[i, 1]
-            return default
-
-        empresa = str(get_val_by_label(["Empresa", "Nome"], "Empresa Exemplo"))
-        cat_macro_cliente = str(get_val_by_label(["Categoria Macro", "Macro", "Categoria"], "Geral"))
-        ticket_medio = safe_float(get_val_by_label(["Ticket Médio Geral", "Ticket Médio"], 0))
-        margem = safe_float(get_val_by_label(["Margem Atual", "Margem"], 0))
-        fat_3m = safe_float(get_val_by_label(["Faturamento Médio 3M", "Faturamento"], 0))
-        uni_3m = int(safe_float(get_val_by_label(["Unidades Médias 3M", "Unidades"], 0)))
-        range_p = safe_float(get_val_by_label(["Range Permitido", "Range"], 0.20))
-        ticket_c = get_val_by_label(["Ticket Customizado", "Customizado"], None)
-        ticket_custom = safe_float(ticket_c) if pd.notna(ticket_c) and str(ticket_c).strip() != "" else None
-        
-        temp_analyzer.set_cliente_data(
-            empresa=empresa, categoria=cat_macro_cliente, ticket_medio=ticket_medio,
-            margem=margem, faturamento_3m=fat_3m, unidades_3m=uni_3m,
-            range_permitido=range_p, ticket_custom=ticket_custom
-        )
-        
-        # 2. Mercado Categoria
-        df_cat = pd.read_excel(file, sheet_name="Mercado_Categoria", skiprows=2)
-        
-        def find_col(df, possible_names):
-            for col in df.columns:
-                if any(name.lower() in str(col).lower() for name in possible_names):
-                    return col
-            return None
-
-        col_cat = find_col(df_cat, ["Categoria"])
-        col_per = find_col(df_cat, ["Periodo", "Período"])
-        col_fat = find_col(df_cat, ["Faturamento"])
-        col_uni = find_col(df_cat, ["Unidades"])
-
-        count_cat = 0
-        if col_cat and col_per:
-            for _, row in df_cat.iterrows():
-                if pd.notna(row[col_cat]) and pd.notna(row[col_per]):
-                    temp_analyzer.add_mercado_categoria(
-                        str(row[col_cat]), str(row[col_per]), 
-                        safe_float(row[col_fat]) if col_fat and col_fat in row and pd.notna(row[col_fat]) else 0, 
-                        int(safe_float(row[col_uni])) if col_uni and col_uni in row and pd.notna(row[col_uni]) else 0
-                    )
-                    count_cat += 1
-                
-        # 3. Mercado Subcategoria (Suporte a dados mensais)
-        df_sub = pd.read_excel(file, sheet_name="Mercado_Subcategoria", skiprows=2)
-        
-        col_sub_cat = find_col(df_sub, ["Categoria"])
-        col_sub_name = find_col(df_sub, ["Subcategoria"])
-        col_sub_per = find_col(df_sub, ["Periodo", "Período"])
-        col_sub_fat = find_col(df_sub, ["Faturamento"])
-        col_sub_uni = find_col(df_sub, ["Unidades"])
-
-        count_sub = 0
-        if col_sub_cat and col_sub_name:
-            for _, row in df_sub.iterrows():
-                if pd.notna(row[col_sub_cat]) and pd.notna(row[col_sub_name]):
-                    temp_analyzer.add_mercado_subcategoria(
-                        categoria=str(row[col_sub_cat]), 
-                        subcategoria=str(row[col_sub_name]), 
-                        faturamento=safe_float(row[col_sub_fat]) if col_sub_fat and col_sub_fat in row and pd.notna(row[col_sub_fat]) else 0, 
-                        unidades=int(safe_float(row[col_sub_uni])) if col_sub_uni and col_sub_uni in row and pd.notna(row[col_sub_uni]) else 0,
-                        periodo=str(row[col_sub_per]) if col_sub_per and col_sub_per in row and pd.notna(row[col_sub_per]) else None
-                    )
-                    count_sub += 1
+        temp_analyzer, resumo = carregar_planilha(file, rastreio=rastreio)
+        empresa, fat_3m, ticket_medio = resumo['empresa'], resumo['faturamento_3m'], resumo['ticket_medio']
+        count_cat, count_sub = resumo['registros_categoria'], resumo['registros_subcategoria']
         
         st.session_state.analyzer = temp_analyzer
         st.session_state['data_version'] = datetime.now().timestamp()
@@ -254,14 +336,22 @@ def processar_excel(file):
         info_msg += f"- 👤 Dados Cliente: {', '.join(detalhes) if detalhes else 'OK'}\n"
         info_msg += f"- 📈 Categorias Macro: {count_cat} registros\n"
         info_msg += f"- 🎯 Subcategorias: {count_sub} registros"
+        if resumo['periodos_duplicados']:
+            info_msg += f"\n- ⚠️ Períodos duplicados (mantido o último): {resumo['periodos_duplicados']}"
         
         st.session_state['last_upload_info'] = info_msg
         return True
     except Exception as e:
-        st.error(f"❌ Erro no processamento: {str(e)}")
+        etapa = f" (etapa '{rastreio.etapa_atual}')" if rastreio.etapa_atual else ""
+        st.error(f"❌ Erro no processamento{etapa}: {str(e)}")
+        tempos = ", ".join(f"{r['etapa']} {r['duracao_s'] * 1000:.0f} ms" for r in rastreio.etapas)
+        if tempos:
+            st.caption(f"Etapas: {tempos}" + (f" · detalhes em {rastreio.destino} (importação {rastreio.id})" if rastreio.destino else ""))
         st.info("Dica: Verifique se as abas 'Cliente', 'Mercado_Categoria' e 'Mercado_Subcategoria' existem e seguem o modelo.")
         return False
 
+medidor.marcar("Inicialização")
+
 # --- CSS CUSTOMIZADO DARK THEME ---
 st.markdown("""
 <style>
@@ -374,6 +464,21 @@ st.markdown("""
         border-bottom: 3px solid #1E3A8A;
     }
     
+    /* Navegação por Seções */
+    [data-testid="stRadio"] > div[role="radiogroup"] {
+        gap: 8px;
+        border-bottom: 2px solid #1a1a1a;
+    }
+    
+    [data-testid="stRadio"] label {
+        color: #A0A0A0;
+        font-size: 0.9rem;
+        text-transform: uppercase;
+        letter-spacing: 1px;
+        padding: 8px 16px;
+        font-weight: 600;
+    }
+    
     /* Insight Cards */
     .insight-card {
         background: linear-gradient(135deg, #1a1a1a 0%, #1e1e1e 100%);
@@ -478,6 +583,7 @@ st.markdown("""
     }
 </style>
 """, unsafe_allow_html=True)
+medidor.marcar("CSS")
 
 # --- SIDEBAR ---
 with st.sidebar:
@@ -521,7 +627,23 @@ with st.sidebar:
     if 'last_upload_info' in st.session_state:
         st.info(st.session_state.last_upload_info)
     
+    # Persistência opcional (ativada pela variável de ambiente MERCADO_DB com o caminho do arquivo SQLite)
+    armazem = obter_armazem()
+    if armazem is not None:
+        with st.expander("💾 Base de Dados"):
+            if st.button("Salvar análise atual", use_container_width=True, disabled=not st.session_state.analyzer.cliente_data.get('empresa')):
+                cliente_salvo = armazem.salvar_analyzer(st.session_state.analyzer)
+                st.success(f"'{cliente_salvo}' salvo na base.")
+            clientes_salvos = [c['cliente'] for c in armazem.listar_clientes()]
+            if clientes_salvos:
+                cliente_sel = st.selectbox("Clientes salvos", clientes_salvos, key="cliente_base_sel")
+                if st.button("Carregar cliente", use_container_width=True):
+                    st.session_state.analyzer = armazem.carregar_analyzer(cliente_sel)
+                    st.session_state['data_version'] = datetime.now().timestamp()
+                    st.rerun()
+    
     st.markdown("---")
+    medidor.marcar("Sidebar")
     
     # Gerar Relatório
     st.markdown(f"""
@@ -540,7 +662,7 @@ with st.sidebar:
     if st.button("Gerar Relatório PDF", use_container_width=True, key="pdf_button"):
         if current_analyzer.cliente_data:
             # Tentar obter o ranking para o PDF
-            df_rank_pdf = current_analyzer.gerar_ranking()
+            df_rank_pdf = calculo_em_cache(current_analyzer, 'gerar_ranking')
             if not df_rank_pdf.empty:
                 with st.spinner("Gerando relatório..."):
                     try:
@@ -572,7 +694,7 @@ with st.sidebar:
                             
                             # 2. Comparação de Tickets
                             r_perm = current_analyzer.cliente_data.get('range_permitido', 0.20)
-                            res_sim = current_analyzer.simular_cenarios(cat_foco, sub_foco)
+                            res_sim = calculo_em_cache(current_analyzer, 'simular_cenarios', cat_foco, sub_foco)
                             l_inf, l_sup = calcular_limites_ticket_local(res_sim['ticket_mercado'], r_perm)
                             fig_ticket = criar_comparacao_tickets(res_sim['ticket_mercado'], row_foco_pdf['Ticket Cliente'], l_inf, l_sup)
                             try:
@@ -606,6 +728,7 @@ with st.sidebar:
                 st.warning("É necessário ter subcategorias cadastradas para gerar o relatório.")
         else:
             st.warning("Adicione dados do cliente antes de gerar o relatório.")
+    medidor.marcar("PDF")
     
     st.markdown("---")
     st.markdown(f"""
@@ -615,6 +738,10 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+    # Preenchido no fim do script, quando todas as etapas do rerun já foram medidas
+    slot_desempenho = st.container() if PAINEL_DESEMPENHO else None
+medidor.marcar("Rodapé da sidebar")
+
 # --- CONTEÚDO PRINCIPAL ---
 
 analyzer = st.session_state.analyzer
@@ -634,19 +761,21 @@ st.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
-# Navegação por Tabs
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+# Navegação por seções: apenas a seção ativa é calculada e renderizada a cada rerun
+SECOES = [
     "DASHBOARD",
     "DADOS DO CLIENTE",
     "GESTÃO DE CATEGORIAS",
     "MERCADO SUBCATEGORIAS",
     "ANÁLISE EXECUTIVA"
-])
+]
+secao_ativa = st.radio("Navegação", SECOES, horizontal=True, key="secao_ativa", label_visibility="collapsed")
+medidor.marcar("Cabeçalho e navegação")
 
 # ====================
-# TAB 1: DASHBOARD (INÍCIO)
+# SEÇÃO 1: DASHBOARD (INÍCIO)
 # ====================
-with tab1:
+def render_dashboard():
     st.markdown(f"""
     <div style="display: flex; align-items: center; margin-bottom: 1.5rem;">
         <div style="width: 32px; height: 32px; background: #1a1a1a; border: 1px solid #333; border-radius: 50%; display: flex; align-items: center; justify-content: center; margin-right: 12px;">
@@ -656,20 +785,12 @@ with tab1:
     </div>
     """, unsafe_allow_html=True)
     
-    # Métricas Principais
-    total_categorias = len(analyzer.mercado_categoria)
-    total_subcategorias = sum(len(subs) for subs in analyzer.mercado_subcategorias.values())
-    
-    # Calcular totais
-    faturamento_total = 0
-    unidades_total = 0
-    
-    for cat_data in analyzer.mercado_categoria.values():
-        for periodo in cat_data:
-            faturamento_total += periodo.get('faturamento', 0)
-            unidades_total += periodo.get('unidades', 0)
-    
-    ticket_medio = faturamento_total / unidades_total if unidades_total > 0 else 0
+    # Métricas Principais (totais mantidos incrementalmente pelo analyzer)
+    totais_mercado = analyzer.get_totais_mercado()
+    total_categorias = totais_mercado['categorias']
+    total_subcategorias = totais_mercado['subcategorias']
+    faturamento_total = totais_mercado['faturamento']
+    ticket_medio = totais_mercado['ticket_medio']
     
     # Grid de Cards
     col1, col2, col3, col4 = st.columns(4)
@@ -750,9 +871,9 @@ with tab1:
         """)
 
 # ====================
-# TAB 2: DADOS DO CLIENTE
+# SEÇÃO 2: DADOS DO CLIENTE
 # ====================
-with tab2:
+def render_dados_cliente():
     st.markdown("## 👤 Configuração dos Dados do Cliente")
     
     with st.form("form_cliente"):
@@ -775,6 +896,9 @@ with tab2:
         col7, col8 = st.columns(2)
         range_permitido = col7.number_input("Range de Ticket Permitido (%)", min_value=0.0, max_value=100.0, value=float(analyzer.cliente_data.get('range_permitido', 0.20) * 100), step=1.0) / 100
         ticket_custom = col8.number_input("Ticket Customizado (Opcional)", min_value=0.0, value=float(analyzer.cliente_data.get('ticket_custom', 0.0) if analyzer.cliente_data.get('ticket_custom') else 0.0), step=0.01)
+        col9, col10 = st.columns(2)
+        cac = col9.number_input("CAC (R$)", min_value=0.0, value=float(analyzer.cliente_data.get('cac') or 0.0), step=1.0)
+        investimento_mkt = col10.number_input("Investimento em Marketing (R$)", min_value=0.0, value=float(analyzer.cliente_data.get('investimento_mkt') or 0.0), step=100.0)
         
         if st.form_submit_button("💾 Salvar Dados do Cliente", use_container_width=True):
             analyzer.set_cliente_data(
@@ -785,7 +909,9 @@ with tab2:
                 faturamento_3m=faturamento_3m,
                 unidades_3m=unidades_3m,
                 range_permitido=range_permitido,
-                ticket_custom=ticket_custom if ticket_custom > 0 else None
+                ticket_custom=ticket_custom if ticket_custom > 0 else None,
+                cac=cac,
+                investimento_mkt=investimento_mkt
             )
             st.success("✅ Dados salvos com sucesso!")
             st.rerun()
@@ -811,9 +937,9 @@ with tab2:
         st.dataframe(df_resumo, use_container_width=True, hide_index=True)
 
 # ====================
-# TAB 3: GESTÃO DE CATEGORIAS
+# SEÇÃO 3: GESTÃO DE CATEGORIAS
 # ====================
-with tab3:
+def render_gestao_categorias():
     st.markdown("## 📈 Gestão de Categorias Macro")
     
     with st.form("nova_categoria"):
@@ -828,9 +954,11 @@ with tab3:
         
         if st.form_submit_button("➕ Adicionar Categoria", use_container_width=True):
             if cat_nome and periodo:
-                analyzer.add_mercado_categoria(cat_nome, periodo, parse_large_number(faturamento), int(parse_large_number(unidades)))
-                st.success(f"✅ Categoria '{cat_nome}' adicionada!")
-                st.rerun()
+                if analyzer.add_mercado_categoria(cat_nome, periodo, parse_large_number(faturamento), int(parse_large_number(unidades))):
+                    st.success(f"✅ Categoria '{cat_nome}' adicionada!")
+                    st.rerun()
+                else:
+                    st.warning(f"⚠️ O período {analyzer.normalizar_periodo(periodo)} já existia em '{cat_nome}' e foi atualizado.")
             else:
                 st.warning("Preencha pelo menos o nome e o período.")
     
@@ -843,27 +971,23 @@ with tab3:
                 df_cat = pd.DataFrame(periodos)
                 
                 if not df_cat.empty:
+                    # Remoções reaproveitam posições na série; exibir sempre em ordem cronológica
+                    df_cat = df_cat.sort_values('periodo', ignore_index=True)
                     df_cat['ticket_medio'] = df_cat.apply(
                         lambda row: row['faturamento'] / row['unidades'] if row['unidades'] > 0 else 0,
                         axis=1
                     )
                     
-                    # Editar períodos
+                    # Editar períodos (grade única; alterações aplicadas em lote)
                     st.markdown("#### ✏️ Editar Períodos")
-                    for i, row in df_cat.iterrows():
-                        with st.form(f"edit_cat_{cat}_{i}"):
-                            c1, c2, c3, c4 = st.columns(4)
-                            new_per = c1.text_input("Período", value=row['periodo'])
-                            new_fat = c2.text_input("Faturamento", value=str(row['faturamento']))
-                            new_uni = c3.text_input("Unidades", value=str(row['unidades']))
-                            
-                            b1, b2 = st.columns(2)
-                            if b1.form_submit_button("💾 Salvar"):
-                                analyzer.editar_mercado_categoria(cat, row['periodo'], new_per, parse_large_number(new_fat), int(parse_large_number(new_uni)))
-                                st.rerun()
-                            if b2.form_submit_button("🗑️ Excluir"):
-                                analyzer.remover_periodo_categoria(cat, row['periodo'])
-                                st.rerun()
+                    original, editado = editor_em_lote(df_cat[['periodo', 'faturamento', 'unidades']], f"cat_{cat}")
+                    if editado is not None:
+                        alteracoes = diff_periodos_categoria(cat, original, editado)
+                        if alteracoes:
+                            analyzer.aplicar_alteracoes(alteracoes)
+                            st.rerun()
+                        else:
+                            st.info("Nenhuma alteração detectada.")
                     
                     # Tabela de Dados
                     st.markdown("#### 📊 Dados da Categoria")
@@ -876,16 +1000,19 @@ with tab3:
                     st.markdown("#### 📈 Visualizações")
                     tab_viz1, tab_viz2 = st.tabs(["Evolução da Categoria", "Ticket Médio"])
                     with tab_viz1:
-                        st.plotly_chart(criar_grafico_evolucao_categoria(df_cat), use_container_width=True)
+                        fidelidade_cat = False
+                        if len(df_cat) > LIMITE_PONTOS_SERIE:
+                            fidelidade_cat = st.checkbox("🔍 Resolução completa", key=f"fidelidade_cat_{cat}", help="Série longa exibida de forma reduzida. Marque para ver todos os pontos.")
+                        st.plotly_chart(criar_grafico_evolucao_categoria(df_cat, fidelidade_total=fidelidade_cat), use_container_width=True)
                     with tab_viz2:
                         st.plotly_chart(criar_grafico_ticket_medio(df_cat), use_container_width=True)
     else:
         st.info("Nenhuma categoria macro cadastrada.")
 
 # ====================
-# TAB 4: SUBCATEGORIAS
+# SEÇÃO 4: SUBCATEGORIAS
 # ====================
-with tab4:
+def render_subcategorias():
     st.markdown("## 🎯 Mercado de Subcategorias")
     
     categorias = list(analyzer.mercado_categoria.keys())
@@ -911,7 +1038,7 @@ with tab4:
         
         if cat_sel in analyzer.mercado_subcategorias:
             # Usar dados consolidados para a lista de visualização
-            subcategorias_consolidadas = analyzer.get_subcategorias_consolidadas(cat_sel)
+            subcategorias_consolidadas = calculo_em_cache(analyzer, 'get_subcategorias_consolidadas', cat_sel)
             
             st.markdown("### 📋 Lista de Subcategorias (Consolidado)")
             if not subcategorias_consolidadas:
@@ -919,41 +1046,473 @@ with tab4:
             else:
                 df_sub_raw = pd.DataFrame(subcategorias_consolidadas)
                 
+                # Janela de consolidação (somas por diferença de prefixos mensais)
+                meses_disponiveis = analyzer.get_prefixos_mensais(cat_sel)['meses']
+                janela = st.selectbox("Janela de consolidação", list(JANELAS_CONSOLIDACAO) + ["Personalizada"], key=f"janela_sub_{cat_sel}")
+                if janela == "Todo o histórico" or meses_disponiveis.empty:
+                    df_sub_disp = df_sub_raw.copy()
+                else:
+                    if janela == "Personalizada":
+                        rotulos = list(meses_disponiveis.strftime('%Y-%m'))
+                        inicio, fim = st.select_slider("Meses", options=rotulos, value=(rotulos[0], rotulos[-1]), key=f"janela_meses_{cat_sel}")
+                        consolidado_janela = calculo_em_cache(analyzer, 'consolidar_janela', cat_sel, inicio, fim)
+                    else:
+                        consolidado_janela = calculo_em_cache(analyzer, 'consolidar_janela', cat_sel, None, None, JANELAS_CONSOLIDACAO[janela])
+                    df_sub_disp = pd.DataFrame(consolidado_janela, columns=['categoria', 'subcategoria', 'faturamento', 'unidades', 'ticket_medio', 'inicio', 'fim', 'meses'])
+                    if not df_sub_disp.empty:
+                        st.caption(f"Período: {df_sub_disp['inicio'].iloc[0]} a {df_sub_disp['fim'].iloc[0]} ({df_sub_disp['meses'].iloc[0]} meses)")
+                    df_sub_disp = df_sub_disp.drop(columns=['inicio', 'fim', 'meses'])
+                
                 # Tabela de visualização
-                df_sub_disp = df_sub_raw.copy()
                 # Garantir que as colunas existem antes de formatar
-                if 'faturamento_6m' in df_sub_disp.columns:
-                    df_sub_disp['faturamento_6m'] = df_sub_disp['faturamento_6m'].apply(format_br)
-                if 'ticket_medio' in df_sub_disp.columns:
-                    df_sub_disp['ticket_medio'] = df_sub_disp['ticket_medio'].apply(format_br)
+                for coluna in ('faturamento_6m', 'faturamento', 'ticket_medio'):
+                    if coluna in df_sub_disp.columns:
+                        df_sub_disp[coluna] = df_sub_disp[coluna].apply(format_br)
                 
                 st.dataframe(df_sub_disp, use_container_width=True)
                 
                 st.markdown("#### ✏️ Editar Subcategorias")
-                for i, row in df_sub_raw.iterrows():
-                    with st.expander(f"Editar: {row['subcategoria']}"):
-                        with st.form(f"edit_sub_{cat_sel}_{i}"):
-                            c1, c2, c3 = st.columns(3)
-                            new_sub = c1.text_input("Nome Subcategoria", value=row['subcategoria'])
-                            new_fat = c2.text_input("Faturamento (R$)", value=str(row.get('faturamento_6m', 0)))
-                            new_uni = c3.text_input("Unidades", value=str(row.get('unidades_6m', 0)))
-                            
-                            b1, b2 = st.columns(2)
-                            if b1.form_submit_button("💾 Salvar Alterações"):
-                                analyzer.editar_mercado_subcategoria(cat_sel, row['subcategoria'], new_sub, parse_large_number(new_fat), int(parse_large_number(new_uni)))
-                                st.rerun()
-                            if b2.form_submit_button("🗑️ Excluir Subcategoria", type="secondary"):
-                                analyzer.remover_mercado_subcategoria(cat_sel, row['subcategoria'])
-                                st.rerun()
+                st.caption("Renomeie, altere totais (redistribuídos proporcionalmente entre os meses), adicione ou exclua linhas e salve tudo de uma vez.")
+                original, editado = editor_em_lote(df_sub_raw[['subcategoria', 'faturamento_6m', 'unidades_6m']], f"sub_{cat_sel}")
+                if editado is not None:
+                    alteracoes = diff_subcategorias(cat_sel, original, editado)
+                    if alteracoes:
+                        analyzer.aplicar_alteracoes(alteracoes)
+                        st.rerun()
+                    else:
+                        st.info("Nenhuma alteração detectada.")
 
 # ====================
-# TAB 5: ANÁLISE EXECUTIVA (DASHBOARD)
+# SEÇÃO 5: ANÁLISE EXECUTIVA (DASHBOARD)
 # ====================
-with tab5:
+@fragmento
+def painel_cenarios(row_foco):
+    """Simulador de share, indicadores e projeções (reexecuta sozinho ao mover os sliders)"""
+    sub_foco_dashboard = row_foco['Subcategoria']
+    
+    # Simulador de Cenário
+    st.markdown("### 💰 Simulador de Cenário")
+
+    with st.expander("⚙️ Ajustar Metas de Share", expanded=False):
+        col_s1, col_s2, col_s3 = st.columns(3)
+        s_cons = col_s1.slider("Share Conservador (%)", 0.0, 5.0, 0.2, 0.1) / 100
+        s_prov = col_s2.slider("Share Provável (%)", 0.0, 10.0, 0.5, 0.1) / 100
+        s_otim = col_s3.slider("Share Otimista (%)", 0.0, 20.0, 1.0, 0.1) / 100
+
+    custom_shares = {
+        'Conservador': {'share_alvo': s_cons, 'label': f"{s_cons*100:.1f}%"},
+        'Provável': {'share_alvo': s_prov, 'label': f"{s_prov*100:.1f}%"},
+        'Otimista': {'share_alvo': s_otim, 'label': f"{s_otim*100:.1f}%"}
+    }
+
+    res = calculo_em_cache(analyzer, 'simular_cenarios', row_foco['Categoria Macro'], sub_foco_dashboard, custom_shares)
+
+    # Cards de Indicadores
+    st.markdown("#### 📈 Indicadores de Market Share")
+    m1, m2, m3, m4, m5 = st.columns(5)
+
+    share_atual_calc = analyzer.calcular_share_atual(res['mercado_6m'])
+
+    with m1:
+        st.markdown(criar_metric_card("💼", "Tamanho Mercado (6M)", f"R$ {format_br(res['mercado_6m'])}"), unsafe_allow_html=True)
+    with m2:
+        st.markdown(criar_metric_card("📊", "Seu Share Atual", f"{share_atual_calc:.2f}%"), unsafe_allow_html=True)
+    with m3:
+        share_alvo = custom_shares['Provável']['share_alvo'] * 100
+        st.markdown(criar_metric_card("🎯", "Meta de Share", f"{share_alvo:.1f}%"), unsafe_allow_html=True)
+    with m4:
+        # Obter ticket médio consolidado da subcategoria
+        subcat_consolidada = next((s for s in calculo_em_cache(analyzer, 'get_subcategorias_consolidadas', row_foco['Categoria Macro']) if s['subcategoria'] == sub_foco_dashboard), {})
+        ticket_mercado_cons = subcat_consolidada.get('ticket_medio', 0)
+        st.markdown(criar_metric_card("💰", "Ticket Mercado", f"R$ {format_br(ticket_mercado_cons)}"), unsafe_allow_html=True)
+    with m5:
+        st.markdown(criar_metric_card("📈", "Sua Margem", f"{analyzer.cliente_data.get('margem', 0)*100:.1f}%"), unsafe_allow_html=True)
+
+    # Gráficos de Score e Ticket
+    g1, g2 = st.columns(2)
+    with g1:
+        st.plotly_chart(criar_gauge_score(row_foco['Score'], row_foco['Status']), use_container_width=True)
+    with g2:
+        r_perm = analyzer.cliente_data.get('range_permitido', 0.20)
+        l_inf, l_sup = calcular_limites_ticket_local(ticket_mercado_cons, r_perm)
+        st.plotly_chart(criar_comparacao_tickets(ticket_mercado_cons, row_foco['Ticket Cliente'], l_inf, l_sup), use_container_width=True)
+
+    # Projeções de Receita e Lucro
+    st.markdown("#### 📈 Projeções de Receita e Lucro")
+    df_cen = res['cenarios'].copy()
+
+    c_tab1, c_tab2 = st.tabs(["Tabela de Dados", "Gráfico Comparativo"])
+    with c_tab1:
+        df_disp_cen = df_cen.copy()
+        df_disp_cen['Receita Projetada 6M'] = df_disp_cen['Receita Projetada 6M'].apply(format_br)
+        df_disp_cen['Lucro Projetado 6M'] = df_disp_cen['Lucro Projetado 6M'].apply(format_br)
+        df_disp_cen['Delta vs Atual'] = df_disp_cen['Delta vs Atual'].apply(format_br)
+        df_disp_cen['Crescimento (%)'] = df_disp_cen['Crescimento (%)'].apply(lambda x: f"{x:,.1f}%".replace(",", "X").replace(".", ",").replace("X", "."))
+        st.dataframe(df_disp_cen, use_container_width=True)
+    with c_tab2:
+        st.plotly_chart(criar_grafico_cenarios(df_cen), use_container_width=True)
+
+    # Insights dos Cenários
+    st.markdown("### 💡 Insights dos Cenários")
+
+    fat_base_3m = float(analyzer.cliente_data.get('faturamento_3m', 0))
+    if fat_base_3m == 0:
+        st.warning("⚠️ Seu faturamento atual está zerado nos 'Dados do Cliente'. As porcentagens de crescimento podem não refletir a realidade.")
+
+    i_col1, i_col2, i_col3 = st.columns(3)
+
+    with i_col1:
+        row = df_cen.iloc[0]
+        c_val = row['Crescimento (%)']
+        c_color = "#2ecc71" if c_val > 0 else ("#e74c3c" if c_val < 0 else "#A0A0A0")
+        st.markdown(f"""
+        <div class="insight-card" style="border-left-color: #2ecc71;">
+            <div class="insight-title">🟢 Cenário Conservador</div>
+            • Receita: R$ {format_br(row['Receita Projetada 6M'])}<br>
+            • Lucro: R$ {format_br(row['Lucro Projetado 6M'])}<br>
+            • Crescimento: <span style="color: {c_color}; font-weight: bold;">{c_val:,.1f}%</span>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with i_col2:
+        row = df_cen.iloc[1]
+        c_val = row['Crescimento (%)']
+        c_color = "#2ecc71" if c_val > 0 else ("#e74c3c" if c_val < 0 else "#A0A0A0")
+        st.markdown(f"""
+        <div class="insight-card" style="border-left-color: #f1c40f;">
+            <div class="insight-title">🟡 Cenário Provável</div>
+            • Receita: R$ {format_br(row['Receita Projetada 6M'])}<br>
+            • Lucro: R$ {format_br(row['Lucro Projetado 6M'])}<br>
+            • Crescimento: <span style="color: {c_color}; font-weight: bold;">{c_val:,.1f}%</span>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with i_col3:
+        row = df_cen.iloc[2]
+        c_val = row['Crescimento (%)']
+        c_color = "#2ecc71" if c_val > 0 else ("#e74c3c" if c_val < 0 else "#A0A0A0")
+        st.markdown(f"""
+        <div class="insight-card" style="border-left-color: #e74c3c;">
+            <div class="insight-title">🔴 Cenário Otimista</div>
+            • Receita: R$ {format_br(row['Receita Projetada 6M'])}<br>
+            • Lucro: R$ {format_br(row['Lucro Projetado 6M'])}<br>
+            • Crescimento: <span style="color: {c_color}; font-weight: bold;">{c_val:,.1f}%</span>
+        </div>
+        """, unsafe_allow_html=True)
+
+@fragmento
+def painel_anomalias(categoria):
+    """Dashboard de anomalias da categoria em foco"""
+    # ==========================================
+    # NOVO: DASHBOARD DE ANOMALIAS E OPORTUNIDADES
+    # ==========================================
+    st.markdown("---")
+    st.markdown("### 🚨 Dashboard de Anomalias e Oportunidades")
+
+    anomalias_raw = calculo_em_cache(analyzer, 'identificar_anomalias', categoria)
+    # Consolidar anomalias por subcategoria e tipo para evitar duplicidade
+    anomalias = []
+    seen_anom = set()
+    for a in anomalias_raw:
+        key = (a['subcategoria'], a['tipo'])
+        if key not in seen_anom:
+            anomalias.append(a)
+            seen_anom.add(key)
+
+    if anomalias:
+        anom_col1, anom_col2 = st.columns([2, 1])
+        with anom_col1:
+            for anom in anomalias:
+                cor_sev = "#FF4B4B" if anom['severidade'] == "Alta" else ("#FFA421" if anom['severidade'] == "Média" else "#1E3A8A")
+                st.markdown(f"""
+                <div class="insight-card" style="border-left-color: {cor_sev};">
+                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 10px;">
+                        <span style="font-weight: bold; color: #FFFFFF; font-size: 1.1rem;">{anom['tipo']}</span>
+                        <span style="background-color: {cor_sev}; color: #FFFFFF; padding: 3px 10px; border-radius: 12px; font-size: 0.8rem; font-weight: bold;">{anom['severidade']}</span>
+                    </div>
+                    <div style="color: #E0E0E0; font-size: 1rem;">
+                        <strong>{anom['subcategoria']}</strong><br>
+                        {anom['mensagem']}
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+        with anom_col2:
+            st.metric("Total de Anomalias", len(anomalias), delta="Críticas detectadas")
+    else:
+        st.success("✅ Nenhuma anomalia crítica detectada. Seu portfólio está bem equilibrado!")
+
+@fragmento
+def painel_matriz_recomendacao(categoria):
+    """Matriz de recomendação automática da categoria em foco"""
+    # ==========================================
+    # NOVO: MATRIZ DE RECOMENDAÇÃO AUTOMÁTICA (AÇÃO IMEDIATA)
+    # ==========================================
+    st.markdown("---")
+    st.markdown("### 🎯 Matriz de Recomendação Automática (Ação Imediata)")
+
+    plano_raw = calculo_em_cache(analyzer, 'gerar_plano_acao', categoria)
+    # Consolidar plano por subcategoria para evitar duplicidade
+    plano_completo = []
+    seen_sub = set()
+    for p in plano_raw:
+        if p['Subcategoria'] not in seen_sub:
+            plano_completo.append(p)
+            seen_sub.add(p['Subcategoria'])
+
+    if plano_completo:
+        # Criar uma tabela visual das recomendações
+        rec_data = []
+        for rec in plano_completo:
+            rec_data.append({
+                "Subcategoria": rec['Subcategoria'],
+                "Prioridade": rec['Prioridade'],
+                "Recomendação": rec['Recomendacao_Curta'],
+                "Ação Imediata": rec['Acao_Imediata']
+            })
+
+        df_rec = pd.DataFrame(rec_data)
+
+        # Exibir em colunas para melhor visualização
+        for idx, rec in enumerate(plano_completo):
+            if idx % 2 == 0:
+                rec_col1, rec_col2 = st.columns(2)
+
+            col_target = rec_col1 if idx % 2 == 0 else rec_col2
+
+            with col_target:
+                st.markdown(f"""
+                <div class="insight-card" style="border-left-color: {rec['Cor']}; background: linear-gradient(135deg, #0a0a0a 0%, #1a1a1a 100%);">
+                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 12px;">
+                        <span style="font-weight: bold; color: #FFFFFF; font-size: 1.1rem;">{rec['Subcategoria']}</span>
+                        <span style="background-color: {rec['Cor']}; color: #FFFFFF; padding: 4px 12px; border-radius: 15px; font-size: 0.8rem; font-weight: bold;">{rec['Prioridade']}</span>
+                    </div>
+                    <div style="margin-bottom: 10px; padding: 10px; background: rgba(255,255,255,0.05); border-radius: 8px;">
+                        <div style="color: #A0A0A0; font-size: 0.85rem; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 5px;">Recomendação</div>
+                        <div style="color: #FFFFFF; font-weight: bold; font-size: 1rem;">{rec['Recomendacao_Curta']}</div>
+                    </div>
+                    <div style="padding: 10px; background: rgba({rec['Cor'].lstrip('#')}, 0.1); border-radius: 8px; border-left: 3px solid {rec['Cor']};">
+                        <div style=\"color: #A0A0A0; font-size: 0.85rem; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 5px;\">Ação Imediata</div>
+                        <div style="color: #FFFFFF; font-size: 0.95rem;">{rec['Acao_Imediata']}</div>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
+@fragmento
+def simulador_what_if(row_foco):
+    """Simulador de mudanças de preço e volume"""
+    # ==========================================
+    # NOVO: SIMULADOR DE CENÁRIO
+    # ==========================================
+    st.markdown("---")
+    st.markdown("### 🔮 Simulador de Cenário")
+
+    with st.expander("⚙️ Simular Mudanças de Preço e Volume", expanded=False):
+        sim_col1, sim_col2, sim_col3 = st.columns(3)
+
+        with sim_col1:
+            preco_change = st.slider("Mudança de Preço (%)", -50.0, 50.0, 0.0, 5.0, key="price_sim")
+
+        with sim_col2:
+            volume_change = st.slider("Mudança de Volume (%)", -50.0, 100.0, 0.0, 5.0, key="volume_sim")
+
+        with sim_col3:
+            st.markdown("<div style='height: 20px;'></div>", unsafe_allow_html=True)
+            simular_btn = st.button("🚀 Simular Cenário", use_container_width=True)
+
+        if simular_btn or 'what_if_result' in st.session_state:
+            # Calcular impacto
+            ticket_atual = float(row_foco['Ticket Cliente'])
+            novo_ticket = ticket_atual * (1 + preco_change / 100)
+
+            fat_atual = float(analyzer.cliente_data.get('faturamento_3m', 0))
+            novo_fat = fat_atual * (1 + volume_change / 100)
+
+            margem = float(analyzer.cliente_data.get('margem', 0.35))
+            lucro_atual = fat_atual * margem
+            lucro_novo = novo_fat * margem
+            delta_lucro = lucro_novo - lucro_atual
+
+            # Exibir resultados
+            st.markdown("#### 📊 Resultado da Simulação")
+
+            sim_res_col1, sim_res_col2, sim_res_col3, sim_res_col4 = st.columns(4)
+
+            with sim_res_col1:
+                st.markdown(f"""
+                <div class="insight-card">
+                    <div class="insight-title">Novo Ticket</div>
+                    <div style="font-size: 1.5rem; color: #1E3A8A; font-weight: bold;">R$ {format_br(novo_ticket)}</div>
+                    <div style="font-size: 0.85rem; color: #A0A0A0; margin-top: 5px;">
+                        Mudança: <span style="color: {'#2ecc71' if novo_ticket > ticket_atual else '#e74c3c'}; font-weight: bold;">{preco_change:+.1f}%</span>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
+            with sim_res_col2:
+                st.markdown(f"""
+                <div class="insight-card">
+                    <div class="insight-title">Novo Faturamento</div>
+                    <div style="font-size: 1.5rem; color: #1E3A8A; font-weight: bold;">R$ {format_br(novo_fat)}</div>
+                    <div style="font-size: 0.85rem; color: #A0A0A0; margin-top: 5px;">
+                        Mudança: <span style="color: {'#2ecc71' if novo_fat > fat_atual else '#e74c3c'}; font-weight: bold;">{volume_change:+.1f}%</span>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
+            with sim_res_col3:
+                st.markdown(f"""
+                <div class="insight-card">
+                    <div class="insight-title">Novo Lucro (3M)</div>
+                    <div style="font-size: 1.5rem; color: #1E3A8A; font-weight: bold;">R$ {format_br(lucro_novo)}</div>
+                    <div style="font-size: 0.85rem; color: #A0A0A0; margin-top: 5px;">
+                        Margem: {margem*100:.1f}%
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
+            with sim_res_col4:
+                delta_pct = (delta_lucro / lucro_atual * 100) if lucro_atual > 0 else 0
+                cor_delta = "#2ecc71" if delta_lucro > 0 else "#e74c3c"
+                st.markdown(f"""
+                <div class="insight-card">
+                    <div class="insight-title">Impacto no Lucro</div>
+                    <div style="font-size: 1.5rem; color: {cor_delta}; font-weight: bold;">R$ {format_br(abs(delta_lucro))}</div>
+                    <div style="font-size: 0.85rem; color: #A0A0A0; margin-top: 5px;">
+                        <span style="color: {cor_delta}; font-weight: bold;">{delta_pct:+.1f}%</span>
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
+            # Insight da simulação
+            st.markdown("#### 💡 Insight da Simulação")
+            if preco_change > 0 and volume_change < 0:
+                insight = f"⚠️ **Atenção**: Aumentar preço em {preco_change:.1f}% pode reduzir volume em {abs(volume_change):.1f}%. Avalie a elasticidade do seu produto."
+            elif preco_change < 0 and volume_change > 0:
+                insight = f"✅ **Oportunidade**: Reduzir preço em {abs(preco_change):.1f}% pode aumentar volume em {volume_change:.1f}%. Verifique se a margem continua saudável."
+            elif delta_lucro > 0:
+                insight = f"🚀 **Positivo**: Este cenário aumentaria seu lucro em R$ {format_br(delta_lucro)}. Considere implementar."
+            else:
+                insight = f"📉 **Cuidado**: Este cenário reduziria seu lucro em R$ {format_br(abs(delta_lucro))}. Revise a estratégia."
+
+            st.info(insight)
+
+@fragmento
+def painel_foco(df_ranking):
+    """Card da subcategoria em foco e painéis dependentes (reexecuta sozinho ao trocar o foco)"""
+    # Análise Detalhada
+    sub_foco_dashboard = st.selectbox("Selecione uma Subcategoria para Análise Detalhada:", df_ranking["Subcategoria"].tolist(), key="dashboard_sub_foco_selector")
+    st.session_state["selected_sub_cat_foco"] = sub_foco_dashboard
+
+    row_foco = df_ranking[df_ranking["Subcategoria"] == sub_foco_dashboard].iloc[0]
+    st.session_state["selected_macro_cat"] = row_foco["Categoria Macro"]
+
+    painel_cenarios(row_foco)
+    
+    # Evolução Mensal da Subcategoria
+    st.markdown("---")
+    st.markdown(f"### 📅 Evolução Mensal: {sub_foco_dashboard}")
+
+    # Série mensal contínua da subcategoria (fatia da grade mensal pré-calculada)
+    serie_mensal_sub = analyzer.get_evolucao_subcategoria(row_foco['Categoria Macro'], sub_foco_dashboard)
+    if not serie_mensal_sub.empty:
+        fidelidade_sub = False
+        if len(serie_mensal_sub) > LIMITE_PONTOS_SERIE:
+            fidelidade_sub = st.checkbox("🔍 Resolução completa", key="fidelidade_sub_foco", help="Série longa exibida de forma reduzida. Marque para ver todos os pontos.")
+        st.plotly_chart(criar_grafico_evolucao_subcategoria(serie_mensal_sub, sub_foco_dashboard, fidelidade_total=fidelidade_sub), use_container_width=True)
+
+        with st.expander("📊 Comparar com as principais subcategorias da categoria"):
+            grade_cat = analyzer.get_grade_mensal(row_foco['Categoria Macro'])
+            top_subs = df_ranking[df_ranking['Categoria Macro'] == row_foco['Categoria Macro']]['Subcategoria'].head(9).tolist()
+            st.plotly_chart(criar_grafico_evolucao_multiplas(grade_cat['faturamento'], top_subs), use_container_width=True)
+    else:
+        st.info("Dados mensais detalhados não disponíveis para esta subcategoria.")
+
+    # Tendência e Projeção
+    st.markdown("---")
+    st.markdown("### 📈 Tendência e Projeção de Demanda")
+
+    confianca = calculo_em_cache(analyzer, 'calcular_confianca', row_foco['Categoria Macro'], sub_foco_dashboard)
+    cor_conf = "green" if confianca['nivel'] == "Alta" else ("orange" if confianca['nivel'] == "Média" else "red")
+
+    st.markdown(f"**Índice de Confiança da Projeção:** <span style='color:{cor_conf}; font-weight:bold;'>{confianca['score']}% ({confianca['nivel']})</span>", unsafe_allow_html=True)
+
+    if confianca['motivos']:
+        with st.expander("Ver detalhes da confiabilidade"):
+            for m in confianca['motivos']:
+                st.write(f"• {m}")
+
+    tendencia_res = calculo_em_cache(analyzer, 'calcular_tendencia', row_foco['Categoria Macro'], sub_foco_dashboard)
+
+    t_col1, t_col2, t_col3 = st.columns([1, 1, 2])
+    with t_col1:
+        st.metric("Tendência Atual", tendencia_res['tendencia'], delta=f"{tendencia_res['crescimento_mensal']:.1f}% mensal")
+    with t_col2:
+        st.metric("Projeção Total (3 Meses)", f"R$ {format_br(tendencia_res['projecao_3m'])}")
+    with t_col3:
+        meses = ["Mês 1", "Mês 2", "Mês 3"]
+        valores = tendencia_res.get('mensal', [0, 0, 0])
+        df_proj = pd.DataFrame({"Mês": meses, "Faturamento": valores})
+
+        # Calcular um range seguro para o eixo Y não cortar o texto
+        max_val = max(valores) if valores else 0
+        y_range = [0, max_val * 1.25] if max_val > 0 else [0, 100]
+
+        fig_proj = px.bar(df_proj, x="Mês", y="Faturamento",
+                         text=[f"R$ {format_br(v)}" for v in valores],
+                         title="Projeção Mensal Detalhada",
+                         color_discrete_sequence=["#1E3A8A"],
+                         template=TEMA_ESCURO)
+
+        fig_proj.update_traces(
+            textposition='outside',
+            textfont=dict(size=11, color='#FFFFFF'),
+            cliponaxis=False  # Garante que o texto não seja cortado pelas bordas
+        )
+
+        fig_proj.update_layout(
+            height=300, # Aumentado levemente para melhor respiro
+            margin=dict(l=10, r=10, t=50, b=10), # Mais margem no topo para o título e valores
+            yaxis=dict(range=y_range, showgrid=True, zeroline=True),
+            xaxis=dict(showgrid=False)
+        )
+        st.plotly_chart(fig_proj, use_container_width=True)
+
+    # Plano de Ação
+    st.markdown("---")
+    st.markdown("### 🧠 Plano de Ação Sugerido")
+    plano = calculo_em_cache(analyzer, 'gerar_plano_acao', row_foco['Categoria Macro'])
+    sub_plano = next((p for p in plano if p['Subcategoria'] == sub_foco_dashboard), None)
+
+    if sub_plano:
+        lista_acoes = sub_plano.get('Ações', [])
+        if not lista_acoes and 'Recomendação' in sub_plano:
+            lista_acoes = [sub_plano['Recomendação']]
+
+        acoes_html = "".join([f"<li style='margin-bottom: 8px;'>{acao}</li>" for acao in lista_acoes])
+
+        st.markdown(f"""
+        <div class="insight-card" style="border-left-color: {sub_plano.get('Cor', '#1E3A8A')};">
+            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
+                <span style="font-size: 1.3rem; font-weight: bold; color: {sub_plano.get('Cor', '#1E3A8A')};">🎯 Prioridade: {sub_plano.get('Prioridade', 'N/A')}</span>
+                <span style="background-color: {sub_plano.get('Cor', '#1E3A8A')}; color: #FFFFFF; padding: 4px 12px; border-radius: 15px; font-size: 0.9rem; font-weight: bold;">Score: {sub_plano.get('Score', 0):.2f}</span>
+            </div>
+            <ul style="list-style-type: none; padding-left: 0; font-size: 1.1rem; color: #E0E0E0;">
+                {acoes_html}
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.warning("Não foi possível gerar recomendações para esta subcategoria.")
+
+    painel_anomalias(row_foco['Categoria Macro'])
+    painel_matriz_recomendacao(row_foco['Categoria Macro'])
+    simulador_what_if(row_foco)
+
+def render_analise_executiva():
     st.markdown("## 📊 Análise Executiva e Simulações")
     
     # Garantir que o ranking use dados consolidados
-    df_ranking = analyzer.gerar_ranking()
+    df_ranking = calculo_em_cache(analyzer, 'gerar_ranking')
     
     if df_ranking.empty:
         st.info("📋 Importe ou adicione dados nas abas anteriores para visualizar a análise executiva.")
@@ -970,405 +1529,47 @@ with tab5:
         
         st.markdown("---")
         
-        # Análise Detalhada
-        sub_foco_dashboard = st.selectbox("Selecione uma Subcategoria para Análise Detalhada:", df_ranking["Subcategoria"].tolist(), key="dashboard_sub_foco_selector")
-        st.session_state["selected_sub_cat_foco"] = sub_foco_dashboard
-        
-        row_foco = df_ranking[df_ranking["Subcategoria"] == sub_foco_dashboard].iloc[0]
-        st.session_state["selected_macro_cat"] = row_foco["Categoria Macro"]
-        
-        # Simulador de Cenário
-        st.markdown("### 💰 Simulador de Cenário")
-        
-        with st.expander("⚙️ Ajustar Metas de Share", expanded=False):
-            col_s1, col_s2, col_s3 = st.columns(3)
-            s_cons = col_s1.slider("Share Conservador (%)", 0.0, 5.0, 0.2, 0.1) / 100
-            s_prov = col_s2.slider("Share Provável (%)", 0.0, 10.0, 0.5, 0.1) / 100
-            s_otim = col_s3.slider("Share Otimista (%)", 0.0, 20.0, 1.0, 0.1) / 100
-        
-        custom_shares = {
-            'Conservador': {'share_alvo': s_cons, 'label': f"{s_cons*100:.1f}%"},
-            'Provável': {'share_alvo': s_prov, 'label': f"{s_prov*100:.1f}%"},
-            'Otimista': {'share_alvo': s_otim, 'label': f"{s_otim*100:.1f}%"}
-        }
-        
-        res = analyzer.simular_cenarios(row_foco['Categoria Macro'], sub_foco_dashboard, custom_shares)
-        
-        # Cards de Indicadores
-        st.markdown("#### 📈 Indicadores de Market Share")
-        m1, m2, m3, m4, m5 = st.columns(5)
-        
-        share_atual_calc = analyzer.calcular_share_atual(res['mercado_6m'])
-        
-        with m1:
-            st.markdown(criar_metric_card("💼", "Tamanho Mercado (6M)", f"R$ {format_br(res['mercado_6m'])}"), unsafe_allow_html=True)
-        with m2:
-            st.markdown(criar_metric_card("📊", "Seu Share Atual", f"{share_atual_calc:.2f}%"), unsafe_allow_html=True)
-        with m3:
-            share_alvo = custom_shares['Provável']['share_alvo'] * 100
-            st.markdown(criar_metric_card("🎯", "Meta de Share", f"{share_alvo:.1f}%"), unsafe_allow_html=True)
-        with m4:
-            # Obter ticket médio consolidado da subcategoria
-            subcat_consolidada = next((s for s in analyzer.get_subcategorias_consolidadas(row_foco['Categoria Macro']) if s['subcategoria'] == sub_foco_dashboard), {})
-            ticket_mercado_cons = subcat_consolidada.get('ticket_medio', 0)
-            st.markdown(criar_metric_card("💰", "Ticket Mercado", f"R$ {format_br(ticket_mercado_cons)}"), unsafe_allow_html=True)
-        with m5:
-            st.markdown(criar_metric_card("📈", "Sua Margem", f"{analyzer.cliente_data.get('margem', 0)*100:.1f}%"), unsafe_allow_html=True)
-        
-        # Gráficos de Score e Ticket
-        g1, g2 = st.columns(2)
-        with g1:
-            st.plotly_chart(criar_gauge_score(row_foco['Score'], row_foco['Status']), use_container_width=True)
-        with g2:
-            r_perm = analyzer.cliente_data.get('range_permitido', 0.20)
-            l_inf, l_sup = calcular_limites_ticket_local(ticket_mercado_cons, r_perm)
-            st.plotly_chart(criar_comparacao_tickets(ticket_mercado_cons, row_foco['Ticket Cliente'], l_inf, l_sup), use_container_width=True)
-        
-        # Projeções de Receita e Lucro
-        st.markdown("#### 📈 Projeções de Receita e Lucro")
-        df_cen = res['cenarios'].copy()
-        
-        c_tab1, c_tab2 = st.tabs(["Tabela de Dados", "Gráfico Comparativo"])
-        with c_tab1:
-            df_disp_cen = df_cen.copy()
-            df_disp_cen['Receita Projetada 6M'] = df_disp_cen['Receita Projetada 6M'].apply(format_br)
-            df_disp_cen['Lucro Projetado 6M'] = df_disp_cen['Lucro Projetado 6M'].apply(format_br)
-            df_disp_cen['Delta vs Atual'] = df_disp_cen['Delta vs Atual'].apply(format_br)
-            df_disp_cen['Crescimento (%)'] = df_disp_cen['Crescimento (%)'].apply(lambda x: f"{x:,.1f}%".replace(",", "X").replace(".", ",").replace("X", "."))
-            st.dataframe(df_disp_cen, use_container_width=True)
-        with c_tab2:
-            st.plotly_chart(criar_grafico_cenarios(df_cen), use_container_width=True)
-        
-        # Evolução Mensal da Subcategoria
-        st.markdown("---")
-        st.markdown(f"### 📅 Evolução Mensal: {sub_foco_dashboard}")
-        
-        # Obter dados mensais da subcategoria
-        dados_mensais_sub = pd.DataFrame(analyzer.mercado_subcategorias.get(row_foco['Categoria Macro'], []))
-        if not dados_mensais_sub.empty:
-            st.plotly_chart(criar_grafico_evolucao_subcategoria(dados_mensais_sub, sub_foco_dashboard), use_container_width=True)
-        else:
-            st.info("Dados mensais detalhados não disponíveis para esta subcategoria.")
+        painel_foco(df_ranking)
 
-        # Tendência e Projeção
         st.markdown("---")
-        st.markdown("### 📈 Tendência e Projeção de Demanda")
-        
-        confianca = analyzer.calcular_confianca(row_foco['Categoria Macro'], sub_foco_dashboard)
-        cor_conf = "green" if confianca['nivel'] == "Alta" else ("orange" if confianca['nivel'] == "Média" else "red")
-        
-        st.markdown(f"**Índice de Confiança da Projeção:** <span style='color:{cor_conf}; font-weight:bold;'>{confianca['score']}% ({confianca['nivel']})</span>", unsafe_allow_html=True)
-        
-        if confianca['motivos']:
-            with st.expander("Ver detalhes da confiabilidade"):
-                for m in confianca['motivos']:
-                    st.write(f"• {m}")
-        
-        tendencia_res = analyzer.calcular_tendencia(row_foco['Categoria Macro'], subcategoria=sub_foco_dashboard)
-        
-        t_col1, t_col2, t_col3 = st.columns([1, 1, 2])
-        with t_col1:
-            st.metric("Tendência Atual", tendencia_res['tendencia'], delta=f"{tendencia_res['crescimento_mensal']:.1f}% mensal")
-        with t_col2:
-            st.metric("Projeção Total (3 Meses)", f"R$ {format_br(tendencia_res['projecao_3m'])}")
-        with t_col3:
-            meses = ["Mês 1", "Mês 2", "Mês 3"]
-            valores = tendencia_res.get('mensal', [0, 0, 0])
-            df_proj = pd.DataFrame({"Mês": meses, "Faturamento": valores})
-            
-            # Calcular um range seguro para o eixo Y não cortar o texto
-            max_val = max(valores) if valores else 0
-            y_range = [0, max_val * 1.25] if max_val > 0 else [0, 100]
-
-            fig_proj = px.bar(df_proj, x="Mês", y="Faturamento",
-                             text=[f"R$ {format_br(v)}" for v in valores],
-                             title="Projeção Mensal Detalhada",
-                             color_discrete_sequence=["#1E3A8A"])
-            
-            fig_proj.update_traces(
-                textposition='outside',
-                textfont=dict(size=11, color='#FFFFFF'),
-                cliponaxis=False  # Garante que o texto não seja cortado pelas bordas
-            )
-            
-            fig_proj.update_layout(
-                height=300, # Aumentado levemente para melhor respiro
-                margin=dict(l=10, r=10, t=50, b=10), # Mais margem no topo para o título e valores
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                font=dict(color='#FFFFFF'),
-                yaxis=dict(
-                    range=y_range,
-                    showgrid=True,
-                    gridcolor='rgba(255,255,255,0.1)',
-                    zeroline=True,
-                    zerolinecolor='rgba(255,255,255,0.2)'
-                ),
-                xaxis=dict(showgrid=False)
-            )
-            st.plotly_chart(fig_proj, use_container_width=True)
-        
-        # Plano de Ação
-        st.markdown("---")
-        st.markdown("### 🧠 Plano de Ação Sugerido")
-        plano = analyzer.gerar_plano_acao(row_foco['Categoria Macro'])
-        sub_plano = next((p for p in plano if p['Subcategoria'] == sub_foco_dashboard), None)
-        
-        if sub_plano:
-            lista_acoes = sub_plano.get('Ações', [])
-            if not lista_acoes and 'Recomendação' in sub_plano:
-                lista_acoes = [sub_plano['Recomendação']]
-            
-            acoes_html = "".join([f"<li style='margin-bottom: 8px;'>{acao}</li>" for acao in lista_acoes])
-            
-            st.markdown(f"""
-            <div class="insight-card" style="border-left-color: {sub_plano.get('Cor', '#1E3A8A')};">
-                <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
-                    <span style="font-size: 1.3rem; font-weight: bold; color: {sub_plano.get('Cor', '#1E3A8A')};">🎯 Prioridade: {sub_plano.get('Prioridade', 'N/A')}</span>
-                    <span style="background-color: {sub_plano.get('Cor', '#1E3A8A')}; color: #FFFFFF; padding: 4px 12px; border-radius: 15px; font-size: 0.9rem; font-weight: bold;">Score: {sub_plano.get('Score', 0):.2f}</span>
-                </div>
-                <ul style="list-style-type: none; padding-left: 0; font-size: 1.1rem; color: #E0E0E0;">
-                    {acoes_html}
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.warning("Não foi possível gerar recomendações para esta subcategoria.")
-        
-        # Insights dos Cenários
-        st.markdown("### 💡 Insights dos Cenários")
-        
-        fat_base_3m = float(analyzer.cliente_data.get('faturamento_3m', 0))
-        if fat_base_3m == 0:
-            st.warning("⚠️ Seu faturamento atual está zerado nos 'Dados do Cliente'. As porcentagens de crescimento podem não refletir a realidade.")
-        
-        i_col1, i_col2, i_col3 = st.columns(3)
-        
-        with i_col1:
-            row = df_cen.iloc[0]
-            c_val = row['Crescimento (%)']
-            c_color = "#2ecc71" if c_val > 0 else ("#e74c3c" if c_val < 0 else "#A0A0A0")
-            st.markdown(f"""
-            <div class="insight-card" style="border-left-color: #2ecc71;">
-                <div class="insight-title">🟢 Cenário Conservador</div>
-                • Receita: R$ {format_br(row['Receita Projetada 6M'])}<br>
-                • Lucro: R$ {format_br(row['Lucro Projetado 6M'])}<br>
-                • Crescimento: <span style="color: {c_color}; font-weight: bold;">{c_val:,.1f}%</span>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with i_col2:
-            row = df_cen.iloc[1]
-            c_val = row['Crescimento (%)']
-            c_color = "#2ecc71" if c_val > 0 else ("#e74c3c" if c_val < 0 else "#A0A0A0")
-            st.markdown(f"""
-            <div class="insight-card" style="border-left-color: #f1c40f;">
-                <div class="insight-title">🟡 Cenário Provável</div>
-                • Receita: R$ {format_br(row['Receita Projetada 6M'])}<br>
-                • Lucro: R$ {format_br(row['Lucro Projetado 6M'])}<br>
-                • Crescimento: <span style="color: {c_color}; font-weight: bold;">{c_val:,.1f}%</span>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with i_col3:
-            row = df_cen.iloc[2]
-            c_val = row['Crescimento (%)']
-            c_color = "#2ecc71" if c_val > 0 else ("#e74c3c" if c_val < 0 else "#A0A0A0")
-            st.markdown(f"""
-            <div class="insight-card" style="border-left-color: #e74c3c;">
-                <div class="insight-title">🔴 Cenário Otimista</div>
-                • Receita: R$ {format_br(row['Receita Projetada 6M'])}<br>
-                • Lucro: R$ {format_br(row['Lucro Projetado 6M'])}<br>
-                • Crescimento: <span style="color: {c_color}; font-weight: bold;">{c_val:,.1f}%</span>
-            </div>
-            """, unsafe_allow_html=True)
+        painel_orcamento()
 
-        # ==========================================
-        # NOVO: DASHBOARD DE ANOMALIAS E OPORTUNIDADES
-        # ==========================================
-        st.markdown("---")
-        st.markdown("### 🚨 Dashboard de Anomalias e Oportunidades")
-        
-        anomalias_raw = analyzer.identificar_anomalias(row_foco['Categoria Macro'])
-        # Consolidar anomalias por subcategoria e tipo para evitar duplicidade
-        anomalias = []
-        seen_anom = set()
-        for a in anomalias_raw:
-            key = (a['subcategoria'], a['tipo'])
-            if key not in seen_anom:
-                anomalias.append(a)
-                seen_anom.add(key)
-        
-        if anomalias:
-            anom_col1, anom_col2 = st.columns([2, 1])
-            with anom_col1:
-                for anom in anomalias:
-                    cor_sev = "#FF4B4B" if anom['severidade'] == "Alta" else ("#FFA421" if anom['severidade'] == "Média" else "#1E3A8A")
-                    st.markdown(f"""
-                    <div class="insight-card" style="border-left-color: {cor_sev};">
-                        <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 10px;">
-                            <span style="font-weight: bold; color: #FFFFFF; font-size: 1.1rem;">{anom['tipo']}</span>
-                            <span style="background-color: {cor_sev}; color: #FFFFFF; padding: 3px 10px; border-radius: 12px; font-size: 0.8rem; font-weight: bold;">{anom['severidade']}</span>
-                        </div>
-                        <div style="color: #E0E0E0; font-size: 1rem;">
-                            <strong>{anom['subcategoria']}</strong><br>
-                            {anom['mensagem']}
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-            with anom_col2:
-                st.metric("Total de Anomalias", len(anomalias), delta="Críticas detectadas")
-        else:
-            st.success("✅ Nenhuma anomalia crítica detectada. Seu portfólio está bem equilibrado!")
-        
-        # ==========================================
-        # NOVO: MATRIZ DE RECOMENDAÇÃO AUTOMÁTICA (AÇÃO IMEDIATA)
-        # ==========================================
-        st.markdown("---")
-        st.markdown("### 🎯 Matriz de Recomendação Automática (Ação Imediata)")
-        
-        plano_raw = analyzer.gerar_plano_acao(row_foco['Categoria Macro'])
-        # Consolidar plano por subcategoria para evitar duplicidade
-        plano_completo = []
-        seen_sub = set()
-        for p in plano_raw:
-            if p['Subcategoria'] not in seen_sub:
-                plano_completo.append(p)
-                seen_sub.add(p['Subcategoria'])
-        
-        if plano_completo:
-            # Criar uma tabela visual das recomendações
-            rec_data = []
-            for rec in plano_completo:
-                rec_data.append({
-                    "Subcategoria": rec['Subcategoria'],
-                    "Prioridade": rec['Prioridade'],
-                    "Recomendação": rec['Recomendacao_Curta'],
-                    "Ação Imediata": rec['Acao_Imediata']
-                })
-            
-            df_rec = pd.DataFrame(rec_data)
-            
-            # Exibir em colunas para melhor visualização
-            for idx, rec in enumerate(plano_completo):
-                if idx % 2 == 0:
-                    rec_col1, rec_col2 = st.columns(2)
-                
-                col_target = rec_col1 if idx % 2 == 0 else rec_col2
-                
-                with col_target:
-                    st.markdown(f"""
-                    <div class="insight-card" style="border-left-color: {rec['Cor']}; background: linear-gradient(135deg, #0a0a0a 0%, #1a1a1a 100%);">
-                        <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 12px;">
-                            <span style="font-weight: bold; color: #FFFFFF; font-size: 1.1rem;">{rec['Subcategoria']}</span>
-                            <span style="background-color: {rec['Cor']}; color: #FFFFFF; padding: 4px 12px; border-radius: 15px; font-size: 0.8rem; font-weight: bold;">{rec['Prioridade']}</span>
-                        </div>
-                        <div style="margin-bottom: 10px; padding: 10px; background: rgba(255,255,255,0.05); border-radius: 8px;">
-                            <div style="color: #A0A0A0; font-size: 0.85rem; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 5px;">Recomendação</div>
-                            <div style="color: #FFFFFF; font-weight: bold; font-size: 1rem;">{rec['Recomendacao_Curta']}</div>
-                        </div>
-                        <div style="padding: 10px; background: rgba({rec['Cor'].lstrip('#')}, 0.1); border-radius: 8px; border-left: 3px solid {rec['Cor']};">
-                            <div style=\"color: #A0A0A0; font-size: 0.85rem; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 5px;\">Ação Imediata</div>
-                            <div style="color: #FFFFFF; font-size: 0.95rem;">{rec['Acao_Imediata']}</div>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-        
-        # ==========================================
-        # NOVO: SIMULADOR DE CENÁRIO
-        # ==========================================
-        st.markdown("---")
-        st.markdown("### 🔮 Simulador de Cenário")
-        
-        with st.expander("⚙️ Simular Mudanças de Preço e Volume", expanded=False):
-            sim_col1, sim_col2, sim_col3 = st.columns(3)
-            
-            with sim_col1:
-                preco_change = st.slider("Mudança de Preço (%)", -50.0, 50.0, 0.0, 5.0, key="price_sim")
-            
-            with sim_col2:
-                volume_change = st.slider("Mudança de Volume (%)", -50.0, 100.0, 0.0, 5.0, key="volume_sim")
-            
-            with sim_col3:
-                st.markdown("<div style='height: 20px;'></div>", unsafe_allow_html=True)
-                simular_btn = st.button("🚀 Simular Cenário", use_container_width=True)
-            
-            if simular_btn or 'what_if_result' in st.session_state:
-                # Calcular impacto
-                ticket_atual = float(row_foco['Ticket Cliente'])
-                novo_ticket = ticket_atual * (1 + preco_change / 100)
-                
-                fat_atual = float(analyzer.cliente_data.get('faturamento_3m', 0))
-                novo_fat = fat_atual * (1 + volume_change / 100)
-                
-                margem = float(analyzer.cliente_data.get('margem', 0.35))
-                lucro_atual = fat_atual * margem
-                lucro_novo = novo_fat * margem
-                delta_lucro = lucro_novo - lucro_atual
-                
-                # Exibir resultados
-                st.markdown("#### 📊 Resultado da Simulação")
-                
-                sim_res_col1, sim_res_col2, sim_res_col3, sim_res_col4 = st.columns(4)
-                
-                with sim_res_col1:
-                    st.markdown(f"""
-                    <div class="insight-card">
-                        <div class="insight-title">Novo Ticket</div>
-                        <div style="font-size: 1.5rem; color: #1E3A8A; font-weight: bold;">R$ {format_br(novo_ticket)}</div>
-                        <div style="font-size: 0.85rem; color: #A0A0A0; margin-top: 5px;">
-                            Mudança: <span style="color: {'#2ecc71' if novo_ticket > ticket_atual else '#e74c3c'}; font-weight: bold;">{preco_change:+.1f}%</span>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with sim_res_col2:
-                    st.markdown(f"""
-                    <div class="insight-card">
-                        <div class="insight-title">Novo Faturamento</div>
-                        <div style="font-size: 1.5rem; color: #1E3A8A; font-weight: bold;">R$ {format_br(novo_fat)}</div>
-                        <div style="font-size: 0.85rem; color: #A0A0A0; margin-top: 5px;">
-                            Mudança: <span style="color: {'#2ecc71' if novo_fat > fat_atual else '#e74c3c'}; font-weight: bold;">{volume_change:+.1f}%</span>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with sim_res_col3:
-                    st.markdown(f"""
-                    <div class="insight-card">
-                        <div class="insight-title">Novo Lucro (3M)</div>
-                        <div style="font-size: 1.5rem; color: #1E3A8A; font-weight: bold;">R$ {format_br(lucro_novo)}</div>
-                        <div style="font-size: 0.85rem; color: #A0A0A0; margin-top: 5px;">
-                            Margem: {margem*100:.1f}%
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with sim_res_col4:
-                    delta_pct = (delta_lucro / lucro_atual * 100) if lucro_atual > 0 else 0
-                    cor_delta = "#2ecc71" if delta_lucro > 0 else "#e74c3c"
-                    st.markdown(f"""
-                    <div class="insight-card">
-                        <div class="insight-title">Impacto no Lucro</div>
-                        <div style="font-size: 1.5rem; color: {cor_delta}; font-weight: bold;">R$ {format_br(abs(delta_lucro))}</div>
-                        <div style="font-size: 0.85rem; color: #A0A0A0; margin-top: 5px;">
-                            <span style="color: {cor_delta}; font-weight: bold;">{delta_pct:+.1f}%</span>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                # Insight da simulação
-                st.markdown("#### 💡 Insight da Simulação")
-                if preco_change > 0 and volume_change < 0:
-                    insight = f"⚠️ **Atenção**: Aumentar preço em {preco_change:.1f}% pode reduzir volume em {abs(volume_change):.1f}%. Avalie a elasticidade do seu produto."
-                elif preco_change < 0 and volume_change > 0:
-                    insight = f"✅ **Oportunidade**: Reduzir preço em {abs(preco_change):.1f}% pode aumentar volume em {volume_change:.1f}%. Verifique se a margem continua saudável."
-                elif delta_lucro > 0:
-                    insight = f"🚀 **Positivo**: Este cenário aumentaria seu lucro em R$ {format_br(delta_lucro)}. Considere implementar."
-                else:
-                    insight = f"📉 **Cuidado**: Este cenário reduziria seu lucro em R$ {format_br(abs(delta_lucro))}. Revise a estratégia."
-                
-                st.info(insight)
+@fragmento
+def painel_orcamento():
+    """Distribuição do investimento em marketing do cliente entre as subcategorias"""
+    st.markdown("### 💰 Alocação do Orçamento de Marketing")
+    col_orc1, col_orc2, col_orc3 = st.columns([2, 2, 1])
+    orcamento = col_orc1.number_input("Orçamento (R$)", min_value=0.0, value=float(analyzer.cliente_data.get('investimento_mkt') or 0.0), step=100.0, key="orcamento_alocacao")
+    share_maximo = col_orc2.slider("Share máximo capturável por subcategoria (%)", min_value=0.1, max_value=20.0, value=1.0, step=0.1, key="share_alocacao") / 100
+    usar_total = col_orc3.checkbox("Gastar todo o orçamento", value=False, key="orcamento_total_alocacao",
+                                   help="Investe o orçamento inteiro mesmo quando R$ 1 adicional retorna menos de R$ 1")
+
+    resultado = alocar_orcamento_marketing(analyzer, orcamento=orcamento, share_maximo=share_maximo,
+                                           usar_orcamento_total=usar_total)
+    if resultado['motivo']:
+        st.info(f"ℹ️ {resultado['motivo']}")
+        return
+
+    m1, m2, m3, m4, m5 = st.columns(5)
+    m1.metric("Investimento Alocado", f"R$ {format_br(resultado['alocado'])}")
+    m2.metric("Não Alocado", f"R$ {format_br(resultado['nao_alocado'])}")
+    m3.metric("Receita Incremental", f"R$ {format_br(resultado['receita'])}")
+    m4.metric("Lucro Incremental", f"R$ {format_br(resultado['lucro'])}")
+    m5.metric("ROI Projetado", f"{resultado['roi']:.1f}%")
+    if resultado['nao_alocado'] > 0.005 and not usar_total:
+        st.caption("O restante do orçamento não foi alocado: investir mais retornaria menos de R$ 1 por R$ 1 investido.")
+    df_alocacao = resultado['alocacao']
+    st.dataframe(df_alocacao[df_alocacao['Investimento'] > 0], use_container_width=True, hide_index=True)
+
+RENDERIZADORES_SECAO = {
+    "DASHBOARD": render_dashboard,
+    "DADOS DO CLIENTE": render_dados_cliente,
+    "GESTÃO DE CATEGORIAS": render_gestao_categorias,
+    "MERCADO SUBCATEGORIAS": render_subcategorias,
+    "ANÁLISE EXECUTIVA": render_analise_executiva
+}
+RENDERIZADORES_SECAO[secao_ativa]()
+medidor.marcar(f"Aba: {secao_ativa.title()}")
 
 # --- RODAPÉ FINAL ---
 st.markdown("---")
@@ -1377,3 +1578,57 @@ st.markdown(f"""
     Desenvolvido por <strong>Vinícius Lima</strong> | CNPJ: 47.192.694/0001-70
 </div>
 """, unsafe_allow_html=True)
+medidor.marcar("Rodapé")
+
+# --- PAINEL DE DESEMPENHO (OPCIONAL) ---
+def render_painel_desempenho(slot):
+    """Tempos do último rerun completo, métricas do analyzer, caches, memória da sessão e histórico"""
+    total = medidor.total()
+    figuras = estatisticas_cache_figuras()
+    calculos = st.session_state.get('_estatisticas_calculos', {'hits': 0, 'misses': 0})
+    hits_calc = calculos['hits'] - calculos_no_inicio.get('hits', 0)
+    misses_calc = calculos['misses'] - calculos_no_inicio.get('misses', 0)
+    hits_fig = figuras['hits'] - figuras_no_inicio['hits']
+    misses_fig = figuras['misses'] - figuras_no_inicio['misses']
+
+    historico = st.session_state.setdefault('_historico_desempenho', [])
+    rerun = (historico[-1]['rerun'] + 1) if historico else 1
+    historico.append({'rerun': rerun, 'total': total, 'etapas': dict(medidor.etapas)})
+    del historico[:-HISTORICO_DESEMPENHO]
+
+    with slot:
+        with st.expander("⏱️ Desempenho", expanded=True):
+            st.metric("Último rerun", f"{total * 1000:.0f} ms")
+            df_etapas = pd.DataFrame({'Etapa': list(medidor.etapas), 'ms': [v * 1000 for v in medidor.etapas.values()]})
+            df_etapas['%'] = df_etapas['ms'] / (total * 1000) * 100 if total > 0 else 0.0
+            st.dataframe(df_etapas.round(1), use_container_width=True, hide_index=True)
+
+            c1, c2 = st.columns(2)
+            c1.metric("Cache de cálculos", f"{hits_calc}/{hits_calc + misses_calc}",
+                      help=f"Acertos neste rerun. Taxa na sessão: {calculos['hits'] / max(calculos['hits'] + calculos['misses'], 1):.0%}")
+            c2.metric("Cache de figuras", f"{hits_fig}/{hits_fig + misses_fig}",
+                      help=f"Acertos neste rerun. Taxa no processo: {figuras['taxa_acerto']:.0%} ({figuras['tamanho']}/{figuras['capacidade']} figuras)")
+            st.caption(f"Construção de figuras neste rerun: {(figuras['segundos_construcao'] - figuras_no_inicio['segundos_construcao']) * 1000:.0f} ms")
+
+            st.markdown("**Analyzer (este rerun)**")
+            df_metodos = instrumentacao.tabela(instrumentacao.diferenca(metricas_no_inicio))
+            if df_metodos.empty:
+                st.caption("Nenhum método do analyzer executado.")
+            else:
+                df_metodos = df_metodos.head(10).assign(total_ms=lambda d: d['total_s'] * 1000, proprio_ms=lambda d: d['proprio_s'] * 1000,
+                                                        media_ms=lambda d: d['media_s'] * 1000)
+                st.dataframe(df_metodos[['metodo', 'chamadas', 'total_ms', 'proprio_ms', 'media_ms']].round(2),
+                             use_container_width=True, hide_index=True)
+
+            # Serializar a sessão inteira é caro: só sob demanda
+            if st.button("Medir memória da sessão", key="medir_memoria_sessao", use_container_width=True):
+                tamanhos = tamanho_sessao(st.session_state)
+                st.caption(f"Memória da sessão: {sum(tamanhos.values()) / 1024 ** 2:.2f} MB - " +
+                           ", ".join(f"{k}: {v / 1024:.0f} KB" for k, v in list(tamanhos.items())[:3]))
+
+            df_historico = pd.DataFrame([{'rerun': h['rerun'], 'etapa': etapa, 'segundos': segundos}
+                                         for h in historico for etapa, segundos in h['etapas'].items()])
+            st.plotly_chart(criar_grafico_historico_desempenho(df_historico), use_container_width=True)
+
+if PAINEL_DESEMPENHO:
+    render_painel_desempenho(slot_desempenho)
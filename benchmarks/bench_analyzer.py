@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do MarketAnalyzer em escala (10² a 10⁵ subcategorias) com dados sintéticos:
+tempo e pico de memória de cada operação e curvas de escala (expoente log-log).
+
+Uso:
+    python benchmarks/bench_analyzer.py
+    python benchmarks/bench_analyzer.py --tamanhos 100 1000 --repeticoes 5 --saida resultados.json --grafico escala.html
+"""
+
+import argparse
+import time
+
+from comum import ambiente, expoentes_escala, imprimir_tabela, medir, rss_mb, salvar_json
+
+from utils.dados_sinteticos import gerar_analyzer, gerar_dados_mercado
+
+
+def operacoes(analyzer):
+    """
+    Operações medidas (as de categoria percorrem todas as categorias, como o processamento em lote):
+    ranking, plano e consolidação são globais; cenários usam a subcategoria do topo do ranking.
+    """
+    categorias = list(analyzer.mercado_subcategorias.keys())
+    topo = analyzer.gerar_ranking().iloc[0]
+    cat_foco, sub_foco = topo['Categoria Macro'], topo['Subcategoria']
+
+    def anomalias():
+        for cat in categorias:
+            analyzer.identificar_anomalias(cat)
+
+    def tendencia():
+        for cat in categorias:
+            analyzer.calcular_tendencia(cat)
+        analyzer.calcular_tendencia(cat_foco, sub_foco)
+
+    return {
+        'get_subcategorias_consolidadas': analyzer.get_subcategorias_consolidadas,
+        'gerar_ranking': analyzer.gerar_ranking,
+        'identificar_anomalias': anomalias,
+        'gerar_plano_acao': analyzer.gerar_plano_acao,
+        'simular_cenarios': lambda: analyzer.simular_cenarios(cat_foco, sub_foco),
+        'calcular_tendencia': tendencia,
+    }
+
+
+def executar(tamanhos, subcategorias_por_categoria=100, meses=6, repeticoes=3, memoria=True, semente=42):
+    linhas = []
+    for tamanho in tamanhos:
+        por_categoria = min(subcategorias_por_categoria, tamanho)
+        categorias = max(tamanho // por_categoria, 1)
+        print(f"\n▶ {categorias * por_categoria} subcategorias ({categorias} categorias × {por_categoria}, {meses} meses)")
+
+        inicio = time.perf_counter()
+        dados = gerar_dados_mercado(categorias, por_categoria, meses, semente=semente)
+        tempo_geracao = time.perf_counter() - inicio
+        carga = medir(lambda: gerar_analyzer(dados), repeticoes=1, memoria=memoria)
+        analyzer = gerar_analyzer(dados)
+        base = {'subcategorias': categorias * por_categoria, 'categorias': categorias,
+                'registros': len(dados['subcategoria']) + len(dados['categoria'])}
+        linhas.append({**base, 'operacao': 'carga (aplicar_alteracoes)', **carga, 'geracao_s': tempo_geracao})
+
+        # Caches do analyzer (cubo, grade, prefixos) zerados antes de cada execução: custo a frio
+        for nome, funcao in operacoes(analyzer).items():
+            resultado = medir(funcao, repeticoes=repeticoes, preparar=analyzer._invalidar_caches, memoria=memoria)
+            linhas.append({**base, 'operacao': nome, **resultado})
+            print(f"  {nome:<32} {resultado['mediana']:.4f}s" + (f"  pico {resultado['pico_mb']:.1f} MB" if memoria else ""))
+        del analyzer, dados
+    return linhas
+
+
+def salvar_grafico(linhas, caminho):
+    """Curvas de escala em escala log-log (HTML interativo do Plotly)"""
+    import pandas as pd
+    import plotly.express as px
+    fig = px.line(pd.DataFrame(linhas), x='subcategorias', y='mediana', color='operacao', markers=True,
+                  log_x=True, log_y=True, title="MarketAnalyzer - tempo mediano por nº de subcategorias",
+                  labels={'subcategorias': 'Subcategorias', 'mediana': 'Tempo (s)', 'operacao': 'Operação'})
+    fig.write_html(caminho)
+    print(f"Gráfico gravado em {caminho}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de escala do MarketAnalyzer com dados sintéticos.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help="Quantidades totais de subcategorias (padrão: 100 1000 10000 100000)")
+    parser.add_argument('--por-categoria', type=int, default=100, help="Subcategorias por categoria (padrão: 100)")
+    parser.add_argument('--meses', type=int, default=6, help="Meses de histórico (padrão: 6)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções por operação (padrão: 3)")
+    parser.add_argument('--sem-memoria', action='store_true', help="Não mede o pico de memória (tracemalloc)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="Arquivo JSON com os resultados")
+    parser.add_argument('--grafico', help="Arquivo HTML com as curvas de escala")
+    args = parser.parse_args(argv)
+
+    linhas = executar(sorted(args.tamanhos), args.por_categoria, args.meses, args.repeticoes,
+                      memoria=not args.sem_memoria, semente=args.semente)
+
+    print()
+    colunas = ['subcategorias', 'operacao', 'mediana', 'min', 'max'] + ([] if args.sem_memoria else ['pico_mb'])
+    imprimir_tabela(linhas, colunas)
+
+    curvas = expoentes_escala(linhas, 'subcategorias')
+    print("\nExpoente de escala (inclinação log-log; ~1 linear, ~2 quadrático):")
+    for operacao, pontos in curvas.items():
+        print(f"  {operacao:<32} " + "  ".join(f"→{n}: {e:.2f}" for n, e in pontos))
+    print(f"\nPico de RSS do processo: {rss_mb():.0f} MB")
+
+    if args.saida:
+        salvar_json(args.saida, {'ambiente': ambiente(), 'parametros': vars(args), 'resultados': linhas,
+                                 'expoentes': curvas, 'pico_rss_mb': rss_mb()})
+    if args.grafico:
+        salvar_grafico(linhas, args.grafico)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
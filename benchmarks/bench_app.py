@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de latência de ponta a ponta do app.py com streamlit.testing.v1.AppTest:
+roteiro de interações típicas (upload, abas, troca de foco, formulário do cliente, PDF)
+sobre planilhas sintéticas de tamanho crescente, com tempo e pico de memória por interação.
+
+Uso:
+    python benchmarks/bench_app.py --saida resultados/app.json
+    python benchmarks/bench_app.py --tamanhos 100 1000 --comparar resultados/app.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from comum import RAIZ, ambiente, imprimir_tabela, rss_mb, salvar_json
+
+from streamlit.testing.v1 import AppTest
+
+from utils.dados_sinteticos import gerar_dados_mercado, salvar_planilha
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def botao(at, rotulo):
+    """Botão (inclusive de formulário) pelo texto do rótulo"""
+    return next(b for b in at.button if rotulo in b.label)
+
+
+def roteiro(conteudo_xlsx):
+    """
+    Interações na ordem em que um analista as faria. Cada passo recebe o AppTest, aplica a
+    interação sem executar o script e devolve o AppTest; o rerun é o que se mede.
+    """
+    def trocar_foco(at):
+        seletor = at.selectbox(key="dashboard_sub_foco_selector")
+        opcoes = seletor.options
+        return seletor.set_value(opcoes[len(opcoes) // 2] if len(opcoes) > 1 else opcoes[0])
+
+    def editar_cliente(at):
+        campo = next(n for n in at.number_input if n.label == "Ticket Médio (R$)")
+        campo.set_value(round(float(campo.value) * 1.05, 2))
+        return botao(at, "Salvar Dados do Cliente").click()
+
+    passos = [
+        ('abrir app', lambda at: at),
+        ('selecionar arquivo', lambda at: at.file_uploader(key="excel_uploader_v5").set_value(("dados.xlsx", conteudo_xlsx, MIME_XLSX))),
+        ('processar planilha', lambda at: botao(at, "Processar Planilha").click()),
+    ]
+    passos += [(f"aba {secao.lower()}", lambda at, secao=secao: at.radio(key="secao_ativa").set_value(secao))
+               for secao in ("DASHBOARD", "DADOS DO CLIENTE", "GESTÃO DE CATEGORIAS", "MERCADO SUBCATEGORIAS", "ANÁLISE EXECUTIVA")]
+    passos += [
+        ('trocar subcategoria em foco', trocar_foco),
+        ('aba dados do cliente (volta)', lambda at: at.radio(key="secao_ativa").set_value("DADOS DO CLIENTE")),
+        ('salvar formulário do cliente', editar_cliente),
+        ('gerar relatório pdf', lambda at: at.button(key="pdf_button").click()),
+    ]
+    return passos
+
+
+def executar_roteiro(conteudo_xlsx, timeout, memoria=False):
+    """Executa o roteiro completo em uma sessão nova; devolve {interação: medição}"""
+    at = AppTest.from_file(str(RAIZ / 'app.py'), default_timeout=timeout)
+    medicoes = {}
+    for nome, interacao in roteiro(conteudo_xlsx):
+        erro = None
+        try:
+            interacao(at)
+        except Exception as e:
+            medicoes[nome] = {'segundos': None, 'erro': f"interação indisponível: {type(e).__name__}: {e}"}
+            continue
+        if memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            at.run()
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+        segundos = time.perf_counter() - inicio
+        medicao = {'segundos': segundos, 'erro': erro or ("; ".join(str(x.value) for x in at.exception) or None)}
+        if memoria:
+            medicao['pico_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+        medicoes[nome] = medicao
+    return medicoes
+
+
+def executar(tamanhos, por_categoria=50, meses=6, repeticoes=3, timeout=300, memoria=True, semente=42):
+    linhas = []
+    for tamanho in tamanhos:
+        categorias = max(tamanho // min(por_categoria, tamanho), 1)
+        dados = gerar_dados_mercado(categorias, min(por_categoria, tamanho), meses, semente=semente)
+        conteudo = salvar_planilha(dados).getvalue()
+        subcategorias = len(dados['subcategoria']['subcategoria'].unique())
+        print(f"\n▶ {subcategorias} subcategorias ({len(dados['subcategoria'])} linhas, xlsx de {len(conteudo) / 1024:.0f} KB)")
+
+        # Tempos sem tracemalloc (a instrumentação distorce a latência); memória em uma passada extra
+        execucoes = [executar_roteiro(conteudo, timeout) for _ in range(max(int(repeticoes), 1))]
+        picos = executar_roteiro(conteudo, timeout, memoria=True) if memoria else {}
+        for nome, _ in roteiro(conteudo):
+            tempos = [e[nome]['segundos'] for e in execucoes if e[nome]['segundos'] is not None]
+            erros = {e[nome]['erro'] for e in execucoes if e[nome]['erro']}
+            linha = {
+                'subcategorias': subcategorias,
+                'interacao': nome,
+                'mediana': statistics.median(tempos) if tempos else None,
+                'min': min(tempos) if tempos else None,
+                'max': max(tempos) if tempos else None,
+                'erro': " | ".join(sorted(erros)) or None,
+            }
+            if memoria:
+                linha['pico_mb'] = picos.get(nome, {}).get('pico_mb')
+            linhas.append(linha)
+            print(f"  {nome:<32} " + (f"{linha['mediana']:.3f}s" if tempos else "—") + (f"  ⚠ {linha['erro']}" if linha['erro'] else ""))
+    return linhas
+
+
+def comparar(linhas, caminho_anterior):
+    """Variação da mediana de cada interação contra um resultado gravado anteriormente"""
+    with open(caminho_anterior, encoding='utf-8') as f:
+        anterior = {(l['subcategorias'], l['interacao']): l for l in json.load(f)['resultados']}
+    comparacao = []
+    for linha in linhas:
+        base = anterior.get((linha['subcategorias'], linha['interacao']))
+        if base and base.get('mediana') and linha.get('mediana'):
+            comparacao.append({'subcategorias': linha['subcategorias'], 'interacao': linha['interacao'],
+                               'anterior': base['mediana'], 'atual': linha['mediana'],
+                               'variacao_pct': (linha['mediana'] / base['mediana'] - 1) * 100})
+    return comparacao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de latência por interação do app Streamlit (AppTest).")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100, 1000, 5000],
+                        help="Quantidades de subcategorias (padrão: 100 1000 5000)")
+    parser.add_argument('--por-categoria', type=int, default=50, help="Subcategorias por categoria (padrão: 50)")
+    parser.add_argument('--meses', type=int, default=6, help="Meses de histórico (padrão: 6)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções do roteiro por tamanho (padrão: 3)")
+    parser.add_argument('--timeout', type=float, default=300, help="Tempo máximo de cada rerun em segundos (padrão: 300)")
+    parser.add_argument('--sem-memoria', action='store_true', help="Não mede o pico de memória (tracemalloc)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="Arquivo JSON com os resultados")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparar as medianas")
+    args = parser.parse_args(argv)
+
+    linhas = executar(sorted(args.tamanhos), args.por_categoria, args.meses, args.repeticoes, args.timeout,
+                      memoria=not args.sem_memoria, semente=args.semente)
+    print()
+    imprimir_tabela(linhas, ['subcategorias', 'interacao', 'mediana', 'min', 'max'] + ([] if args.sem_memoria else ['pico_mb']))
+
+    comparacao = comparar(linhas, args.comparar) if args.comparar else []
+    if comparacao:
+        print(f"\nComparação com {args.comparar}:")
+        imprimir_tabela(comparacao, ['subcategorias', 'interacao', 'anterior', 'atual', 'variacao_pct'])
+
+    print(f"\nPico de RSS do processo: {rss_mb():.0f} MB")
+    if args.saida:
+        salvar_json(args.saida, {'ambiente': ambiente(), 'parametros': vars(args), 'resultados': linhas,
+                                 'comparacao': comparacao, 'pico_rss_mb': rss_mb()})
+    return 1 if any(l['erro'] for l in linhas) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
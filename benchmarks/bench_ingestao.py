@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de ingestão de planilhas (1 mil a 500 mil linhas no layout Cliente / Mercado_Categoria /
+Mercado_Subcategoria): linhas por segundo, pico de memória (tracemalloc) e pico de RSS de cada
+caminho de leitura. Cada medição roda em um processo novo, para que o RSS de um caminho não
+contamine o do seguinte.
+
+Uso:
+    python benchmarks/bench_ingestao.py
+    python benchmarks/bench_ingestao.py --linhas 1000 10000 --caminhos pandas openpyxl --saida ingestao.json
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from comum import ambiente, imprimir_tabela, medir, rss_atual_mb, rss_mb, salvar_json
+
+import pandas as pd
+
+from utils.dados_sinteticos import gerar_analyzer, gerar_dados_mercado, salvar_planilha
+
+CAMINHOS = {
+    'pandas': "carregar_planilha (pandas)",
+    'openpyxl': "carregar_planilha (openpyxl somente leitura)",
+    'snapshot_sqlite': "snapshot SQLite (ArmazemMercado.carregar_analyzer)",
+    'snapshot_pickle': "snapshot pickle do analyzer",
+    'extract_data': "import_excel_data.extract_data (layout legado)",
+    'analyze_excel': "analyze_excel.analyze_excel_structure",
+}
+
+
+def salvar_planilha_legada(dados, caminho):
+    """Layout lido por import_excel_data.extract_data: cliente em posições fixas e subcategorias consolidadas"""
+    cliente = dados['cliente']
+    valores = ['Empresa', 'categoria', 'ticket_medio', 'margem', 'faturamento_3m', 'unidades_3m', 'range_permitido', 'ticket_custom']
+    df_cliente = pd.DataFrame([["CONFIGURAÇÃO DO CLIENTE", None]] + [[None, None]] * 3 +
+                              [[campo, cliente[campo.lower()] if campo != 'Empresa' else cliente['empresa']] for campo in valores])
+    df_cat = dados['categoria'].rename(columns={'categoria': 'Categoria', 'periodo': 'Periodo (texto)',
+                                                'faturamento': 'Faturamento (R$)', 'unidades': 'Unidades'})
+    df_sub = (dados['subcategoria'].groupby(['categoria', 'subcategoria'], as_index=False, sort=False)
+              [['faturamento', 'unidades']].sum()
+              .rename(columns={'categoria': 'Categoria Macro', 'subcategoria': 'Subcategoria',
+                               'faturamento': 'Faturamento 6M (R$)', 'unidades': 'Unidades 6M'}))
+    with pd.ExcelWriter(caminho, engine='openpyxl') as writer:
+        df_cliente.to_excel(writer, sheet_name='Cliente', index=False, header=False)
+        df_cat.to_excel(writer, sheet_name='Mercado_Categoria', index=False, startrow=2)
+        df_sub.to_excel(writer, sheet_name='Mercado_Subcategoria', index=False, startrow=2)
+    return len(df_cat) + len(df_sub)
+
+
+def _executar_caminho(caminho, arquivo):
+    """Função executada no processo filho: devolve a chamada sem argumentos do caminho escolhido"""
+    if caminho in ('pandas', 'openpyxl'):
+        from utils.excel_importer import carregar_planilha
+        return lambda: carregar_planilha(arquivo, motor=caminho)
+    if caminho == 'snapshot_sqlite':
+        from utils.market_store import ArmazemMercado
+        armazem = ArmazemMercado(arquivo)
+        cliente = armazem.listar_clientes()[0]['cliente']
+        return lambda: armazem.carregar_analyzer(cliente)
+    if caminho == 'snapshot_pickle':
+        def carregar():
+            with open(arquivo, 'rb') as f:
+                return pickle.load(f)
+        return carregar
+    if caminho == 'extract_data':
+        from import_excel_data import extract_data
+        return lambda: extract_data(arquivo)
+    if caminho == 'analyze_excel':
+        from analyze_excel import analyze_excel_structure
+
+        def analisar():
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyze_excel_structure(arquivo)
+        return analisar
+    raise ValueError(f"Caminho desconhecido: {caminho}")
+
+
+def medir_no_processo(caminho, arquivo, repeticoes):
+    """Executado em um processo novo: RSS de base (após os imports), tempos e picos de memória"""
+    funcao = _executar_caminho(caminho, arquivo)
+    rss_base = rss_atual_mb()
+    resultado = medir(funcao, repeticoes=repeticoes)
+    resultado.update({'rss_base_mb': rss_base, 'pico_rss_mb': rss_mb()})
+    return resultado
+
+
+def preparar_arquivos(linhas_alvo, pasta, por_categoria, meses, semente):
+    """Gera os arquivos de entrada de cada caminho para ~linhas_alvo linhas de mercado"""
+    linhas_por_categoria = (por_categoria + 1) * meses
+    dados = gerar_dados_mercado(max(math.ceil(linhas_alvo / linhas_por_categoria), 1), por_categoria, meses, semente=semente)
+    linhas = len(dados['categoria']) + len(dados['subcategoria'])
+    base = Path(pasta) / f"mercado_{linhas}"
+
+    inicio = time.perf_counter()
+    arquivos = {'xlsx': salvar_planilha(dados, f"{base}.xlsx")}
+    print(f"  planilha de {linhas} linhas gravada em {time.perf_counter() - inicio:.1f}s "
+          f"({os.path.getsize(arquivos['xlsx']) / 1024 ** 2:.1f} MB)")
+    linhas_legado = salvar_planilha_legada(dados, f"{base}_legado.xlsx")
+    arquivos['legado'] = f"{base}_legado.xlsx"
+
+    analyzer = gerar_analyzer(dados)
+    from utils.market_store import ArmazemMercado
+    armazem = ArmazemMercado(f"{base}.db")
+    armazem.salvar_analyzer(analyzer)
+    armazem.fechar()
+    arquivos['db'] = f"{base}.db"
+    with open(f"{base}.pkl", 'wb') as f:
+        pickle.dump(analyzer, f, protocol=pickle.HIGHEST_PROTOCOL)
+    arquivos['pkl'] = f"{base}.pkl"
+    return linhas, linhas_legado, arquivos
+
+
+def executar(linhas_alvo, caminhos, pasta, por_categoria=100, meses=12, repeticoes=1, semente=42):
+    entrada = {'pandas': 'xlsx', 'openpyxl': 'xlsx', 'analyze_excel': 'xlsx', 'extract_data': 'legado',
+               'snapshot_sqlite': 'db', 'snapshot_pickle': 'pkl'}
+    resultados = []
+    contexto = get_context('spawn')
+    for alvo in linhas_alvo:
+        print(f"\n▶ ~{alvo} linhas")
+        linhas, linhas_legado, arquivos = preparar_arquivos(alvo, pasta, por_categoria, meses, semente)
+        for caminho in caminhos:
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                try:
+                    medicao = executor.submit(medir_no_processo, caminho, arquivos[entrada[caminho]], repeticoes).result()
+                    erro = None
+                except Exception as e:
+                    medicao, erro = {}, f"{type(e).__name__}: {e}"
+            n = linhas_legado if caminho == 'extract_data' else linhas
+            linha = {'linhas': n, 'caminho': CAMINHOS[caminho], **medicao, 'erro': erro}
+            if medicao.get('mediana'):
+                linha['linhas_por_s'] = n / medicao['mediana']
+            resultados.append(linha)
+            print(f"  {CAMINHOS[caminho]:<52} " + (f"{medicao['mediana']:.3f}s  {linha['linhas_por_s']:,.0f} linhas/s"
+                                                    if medicao else f"⚠ {erro}"))
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de vazão e memória da ingestão de planilhas.")
+    parser.add_argument('--linhas', type=int, nargs='+', default=[1000, 10000, 100000, 500000],
+                        help="Quantidades aproximadas de linhas de mercado (padrão: 1000 10000 100000 500000)")
+    parser.add_argument('--caminhos', nargs='+', choices=list(CAMINHOS), default=list(CAMINHOS),
+                        help="Caminhos de ingestão medidos (padrão: todos)")
+    parser.add_argument('--por-categoria', type=int, default=100, help="Subcategorias por categoria (padrão: 100)")
+    parser.add_argument('--meses', type=int, default=12, help="Meses de histórico (padrão: 12)")
+    parser.add_argument('--repeticoes', type=int, default=1, help="Execuções por caminho (padrão: 1)")
+    parser.add_argument('--pasta', help="Pasta para as planilhas geradas (padrão: temporária, apagada ao final)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="Arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temporaria:
+        pasta = args.pasta or temporaria
+        Path(pasta).mkdir(parents=True, exist_ok=True)
+        resultados = executar(sorted(args.linhas), args.caminhos, pasta, args.por_categoria, args.meses,
+                              args.repeticoes, args.semente)
+
+    print()
+    imprimir_tabela(resultados, ['linhas', 'caminho', 'mediana', 'linhas_por_s', 'pico_mb', 'rss_base_mb', 'pico_rss_mb'])
+    if args.saida:
+        salvar_json(args.saida, {'ambiente': ambiente(), 'parametros': vars(args), 'resultados': resultados})
+    return 1 if any(r['erro'] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
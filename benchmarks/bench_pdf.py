@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark da geração do relatório PDF: tempo de cada seção do PDFReportGenerator, da
+serialização (fpdf2) e da rasterização dos gráficos (Plotly + Kaleido), medidos em separado,
+com páginas por segundo e tamanho do arquivo para datasets sintéticos e subcategorias em foco.
+
+Uso:
+    python benchmarks/bench_pdf.py
+    python benchmarks/bench_pdf.py --tamanhos 100 1000 --focos topo base --saida pdf.json
+"""
+
+import argparse
+import statistics
+import time
+
+from comum import ambiente, imprimir_tabela, medir, salvar_json
+
+from utils.dados_sinteticos import gerar_analyzer
+from utils.pdf_generator import PDFReportGenerator
+from utils.visualizations import criar_comparacao_tickets, criar_gauge_score
+
+# Mesma ordem de gerar_relatorio
+SECOES = ['add_summary', 'add_market_share_indicators', 'add_market_opportunities',
+          'add_growth_scenarios', 'add_demand_projection', 'add_anomalies_and_recommendations']
+
+FOCOS = {'topo': 0.0, 'meio': 0.5, 'base': 1.0}
+
+
+def linha_foco(df_ranking, foco):
+    """Linha do ranking na posição relativa do foco (topo = maior score, base = menor)"""
+    return df_ranking.iloc[round(FOCOS[foco] * (len(df_ranking) - 1))]
+
+
+def gerar_por_secao(analyzer, row_foco, frio=False):
+    """Gera um relatório completo cronometrando cada seção e a serialização; devolve tempos e o PDF"""
+    if frio:
+        analyzer._invalidar_caches()
+    tempos = {}
+    inicio_total = time.perf_counter()
+    pdf = PDFReportGenerator(analyzer=analyzer, cliente_data=analyzer.cliente_data, cat_foco=row_foco['Categoria Macro'],
+                             sub_foco=row_foco['Subcategoria'], row_foco=row_foco)
+    pdf.add_page()
+    for secao in SECOES:
+        inicio = time.perf_counter()
+        getattr(pdf, secao)()
+        tempos[secao] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    conteudo = bytes(pdf.output())
+    tempos['output (fpdf2)'] = time.perf_counter() - inicio
+    tempos['total'] = time.perf_counter() - inicio_total
+    return tempos, pdf.page_no(), conteudo
+
+
+def rasterizar(analyzer, row_foco, repeticoes):
+    """Construção das figuras usadas no PDF (Plotly) e conversão para PNG (Kaleido), em separado"""
+    range_permitido = analyzer.cliente_data.get('range_permitido', 0.20)
+    ticket_mercado = float(row_foco['Ticket Mercado'])
+    figuras = {
+        'score_gauge': lambda: criar_gauge_score(row_foco['Score'], row_foco['Status']),
+        'ticket_comp': lambda: criar_comparacao_tickets(ticket_mercado, row_foco['Ticket Cliente'],
+                                                        ticket_mercado * (1 - range_permitido), ticket_mercado * (1 + range_permitido)),
+    }
+    resultados = []
+    for nome, construir in figuras.items():
+        construcao = medir(construir, repeticoes=repeticoes, memoria=False)
+        resultados.append({'etapa': f"figura {nome} (plotly)", 'mediana': construcao['mediana'], 'erro': None})
+        figura = construir()
+        try:
+            png = figura.to_image(format="png", width=600, height=400, scale=2)
+            conversao = medir(lambda: figura.to_image(format="png", width=600, height=400, scale=2),
+                              repeticoes=repeticoes, memoria=False)
+            resultados.append({'etapa': f"png {nome} (kaleido)", 'mediana': conversao['mediana'],
+                               'bytes': len(png), 'erro': None})
+        except Exception as e:
+            mensagem = (str(e).strip().splitlines() or [''])[0]
+            resultados.append({'etapa': f"png {nome} (kaleido)", 'mediana': None, 'erro': f"{type(e).__name__}: {mensagem}"})
+    return resultados
+
+
+def executar(tamanhos, focos, por_categoria=100, meses=6, repeticoes=3, frio=False, semente=42):
+    linhas = []
+    for tamanho in tamanhos:
+        por_cat = min(por_categoria, tamanho)
+        analyzer = gerar_analyzer(categorias=max(tamanho // por_cat, 1), subcategorias_por_categoria=por_cat,
+                                  meses=meses, semente=semente)
+        df_ranking = analyzer.gerar_ranking()
+        print(f"\n▶ {len(df_ranking)} subcategorias")
+        for foco in focos:
+            row_foco = linha_foco(df_ranking, foco)
+            base = {'subcategorias': len(df_ranking), 'foco': foco}
+
+            execucoes = [gerar_por_secao(analyzer, row_foco, frio) for _ in range(max(int(repeticoes), 1))]
+            paginas, conteudo = execucoes[-1][1], execucoes[-1][2]
+            memoria = medir(lambda: gerar_por_secao(analyzer, row_foco, frio), repeticoes=1)
+            for etapa in SECOES + ['output (fpdf2)', 'total']:
+                linhas.append({**base, 'etapa': etapa, 'mediana': statistics.median(e[0][etapa] for e in execucoes)})
+            total = linhas[-1]
+            total.update({'paginas': paginas, 'bytes': len(conteudo), 'pico_mb': memoria['pico_mb'],
+                          'paginas_por_s': paginas / total['mediana'] if total['mediana'] > 0 else None})
+            for resultado in rasterizar(analyzer, row_foco, repeticoes):
+                linhas.append({**base, **resultado})
+            print(f"  foco {foco:<5} ({row_foco['Subcategoria']}): {total['mediana']:.3f}s, {paginas} páginas, "
+                  f"{len(conteudo) / 1024:.0f} KB, {total['paginas_por_s']:.1f} páginas/s")
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da geração do relatório PDF por seção.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="Quantidades de subcategorias (padrão: 100 1000 10000)")
+    parser.add_argument('--focos', nargs='+', choices=list(FOCOS), default=list(FOCOS),
+                        help="Posição da subcategoria em foco no ranking (padrão: topo meio base)")
+    parser.add_argument('--por-categoria', type=int, default=100, help="Subcategorias por categoria (padrão: 100)")
+    parser.add_argument('--meses', type=int, default=6, help="Meses de histórico (padrão: 6)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Relatórios gerados por combinação (padrão: 3)")
+    parser.add_argument('--caches-frios', action='store_true', help="Zera os caches do analyzer antes de cada relatório")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="Arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    linhas = executar(sorted(args.tamanhos), args.focos, args.por_categoria, args.meses, args.repeticoes,
+                      frio=args.caches_frios, semente=args.semente)
+    print()
+    imprimir_tabela([l for l in linhas if l['etapa'] in SECOES + ['output (fpdf2)', 'total']],
+                    ['subcategorias', 'foco', 'etapa', 'mediana', 'paginas', 'paginas_por_s', 'bytes', 'pico_mb'])
+    print()
+    imprimir_tabela([l for l in linhas if l['etapa'] not in SECOES + ['output (fpdf2)', 'total']],
+                    ['subcategorias', 'foco', 'etapa', 'mediana', 'bytes', 'erro'])
+    if args.saida:
+        salvar_json(args.saida, {'ambiente': ambiente(), 'parametros': vars(args), 'resultados': linhas})
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Funções compartilhadas pelos benchmarks: medição de tempo/memória, curvas de escala e saída
+"""
+
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Permite rodar os scripts direto (python benchmarks/x.py) a partir de qualquer pasta
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+
+def medir(funcao: Callable, repeticoes: int = 3, preparar: Callable = None, memoria: bool = True) -> Dict:
+    """
+    Executa `funcao` `repeticoes` vezes (chamando `preparar` antes de cada execução, fora da
+    medição) e devolve tempos em segundos. Com `memoria`, faz uma execução extra sob tracemalloc
+    para obter o pico de memória alocada (MB), sem distorcer os tempos medidos.
+    """
+    tempos = []
+    for _ in range(max(int(repeticoes), 1)):
+        if preparar:
+            preparar()
+        gc.collect()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    resultado = {'min': min(tempos), 'mediana': statistics.median(tempos), 'max': max(tempos), 'repeticoes': len(tempos)}
+    if memoria:
+        if preparar:
+            preparar()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            funcao()
+            resultado['pico_mb'] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+    return resultado
+
+
+def _status_proc(campo: str):
+    """Valor (MB) de um campo de /proc/self/status (Linux); None em outros sistemas"""
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith(campo + ':'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def rss_atual_mb() -> float:
+    """Memória residente atual do processo (MB); 0 quando o sistema não informa"""
+    atual = _status_proc('VmRSS')
+    return atual if atual is not None else 0.0
+
+
+def rss_mb() -> float:
+    """
+    Pico de memória residente do processo (MB); 0 quando o sistema não informa. No Linux usa
+    VmHWM, pois o ru_maxrss de um processo criado por spawn herda o pico do processo pai.
+    """
+    pico = _status_proc('VmHWM')
+    if pico is not None:
+        return pico
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+    except (ImportError, AttributeError):
+        return 0.0
+
+
+def expoentes_escala(linhas: List[Dict], eixo: str, chave_grupo: str = 'operacao', chave_tempo: str = 'mediana') -> Dict:
+    """
+    Expoente empírico de crescimento (inclinação log-log entre tamanhos consecutivos) por grupo:
+    ~1 indica custo linear, ~2 quadrático. Devolve {grupo: [(tamanho, expoente), ...]}.
+    """
+    grupos = {}
+    for linha in sorted(linhas, key=lambda l: l[eixo]):
+        grupos.setdefault(linha[chave_grupo], []).append((linha[eixo], linha[chave_tempo]))
+    curvas = {}
+    for grupo, pontos in grupos.items():
+        curvas[grupo] = [(n1, math.log(t1 / t0) / math.log(n1 / n0))
+                         for (n0, t0), (n1, t1) in zip(pontos, pontos[1:]) if t0 > 0 and t1 > 0 and n1 != n0]
+    return curvas
+
+
+def imprimir_tabela(linhas: List[Dict], colunas: List[str]):
+    """Tabela de texto alinhada com as colunas escolhidas (números com 4 casas significativas)"""
+    def formatar(valor):
+        if valor is None:
+            return ""
+        if isinstance(valor, float):
+            return f"{valor:.4g}"
+        return str(valor)
+
+    celulas = [[formatar(l.get(c, '')) for c in colunas] for l in linhas]
+    larguras = [max([len(c)] + [len(linha[i]) for linha in celulas]) for i, c in enumerate(colunas)]
+    print("  ".join(c.ljust(w) for c, w in zip(colunas, larguras)))
+    print("  ".join("-" * w for w in larguras))
+    for linha in celulas:
+        print("  ".join(v.rjust(w) for v, w in zip(linha, larguras)))
+
+
+def ambiente() -> Dict:
+    """Metadados da execução, gravados junto dos resultados para comparar versões"""
+    import numpy
+    import pandas
+    commit = None
+    try:
+        import subprocess
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        pass
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pandas.__version__,
+        'numpy': numpy.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def salvar_json(caminho: str, dados: Dict):
+    Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2, default=str)
+    print(f"Resultados gravados em {caminho}")
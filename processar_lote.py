@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Processamento em lote (sem interface) de uma pasta de planilhas de clientes:
+importação, ranking, anomalias, plano de ação, cenários e, opcionalmente, o relatório PDF.
+
+Uso:
+    python processar_lote.py planilhas/ --saida resultados/ --processos 8 --pdf
+
+Com MERCADO_INSTRUMENTACAO=1, grava também metricas.json (tempos por método do MarketAnalyzer).
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from utils import instrumentacao
+from utils.excel_importer import carregar_planilha
+
+
+def nome_pasta(texto):
+    """Nome seguro para a pasta de saída de um cliente"""
+    return re.sub(r'[^\w\-]+', '_', str(texto)).strip('_') or 'cliente'
+
+
+def pastas_saida(planilhas):
+    """
+    Pasta de saída única por planilha. Nomes que colidem depois da limpeza (ex.: 'a b.xlsx' e
+    'a_b.xlsx', ou só maiúsculas/minúsculas) recebem um sufixo _2, _3, ... na ordem dos arquivos,
+    para que processos em paralelo não sobrescrevam os resultados uns dos outros.
+    """
+    pastas, usadas = {}, set()
+    for caminho in planilhas:
+        base = nome_pasta(Path(caminho).stem)
+        nome, n = base, 1
+        while nome.lower() in usadas:
+            n += 1
+            nome = f"{base}_{n}"
+        usadas.add(nome.lower())
+        pastas[str(caminho)] = nome
+    return pastas
+
+
+def salvar_json(caminho, dados):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2, default=float)
+
+
+def processar_planilha(caminho, pasta_saida, gerar_pdf=False, pasta_cliente=None):
+    """
+    Executa o pipeline completo de uma planilha e devolve a linha do resumo consolidado.
+    `pasta_cliente` é o nome da subpasta de saída (padrão: derivado do nome do arquivo; no lote,
+    vem de pastas_saida para evitar colisões).
+    """
+    inicio = time.perf_counter()
+    pasta_cliente = pasta_cliente or nome_pasta(Path(caminho).stem)
+    linha = {'arquivo': Path(caminho).name, 'pasta': pasta_cliente, 'empresa': None, 'status': 'ok', 'erro': None}
+    instrumentacao.resetar()
+    try:
+        analyzer, resumo = carregar_planilha(caminho)
+        linha['empresa'] = resumo['empresa']
+        destino = Path(pasta_saida) / pasta_cliente
+        destino.mkdir(parents=True, exist_ok=True)
+
+        df_ranking = analyzer.gerar_ranking()
+        df_ranking.to_csv(destino / 'ranking.csv', index=False, encoding='utf-8-sig')
+
+        anomalias = []
+        if not df_ranking.empty:
+            for cat in df_ranking['Categoria Macro'].unique():
+                anomalias.extend({'categoria': cat, **a} for a in analyzer.identificar_anomalias(cat))
+        salvar_json(destino / 'anomalias.json', anomalias)
+
+        plano = analyzer.gerar_plano_acao()
+        salvar_json(destino / 'plano_acao.json', plano)
+
+        linha.update({
+            'subcategorias': len(df_ranking),
+            'anomalias': len(anomalias),
+            'acoes': len(plano),
+            'registros_categoria': resumo['registros_categoria'],
+            'registros_subcategoria': resumo['registros_subcategoria'],
+        })
+
+        if not df_ranking.empty:
+            topo = df_ranking.iloc[0]
+            cat_foco, sub_foco = topo['Categoria Macro'], topo['Subcategoria']
+            cenarios = analyzer.simular_cenarios(cat_foco, sub_foco)
+            cenarios['cenarios'].to_csv(destino / 'cenarios.csv', index=False, encoding='utf-8-sig')
+            linha.update({
+                'subcategoria_foco': sub_foco,
+                'score_foco': float(topo['Score']),
+                'status_foco': topo['Status'],
+                'mercado_foco': float(topo['Mercado (R$)']),
+            })
+
+            if gerar_pdf:
+                from utils.pdf_generator import PDFReportGenerator
+                pdf = PDFReportGenerator(analyzer=analyzer, cliente_data=analyzer.cliente_data,
+                                         cat_foco=cat_foco, sub_foco=sub_foco, row_foco=topo)
+                (destino / 'relatorio.pdf').write_bytes(pdf.gerar_relatorio())
+
+        if instrumentacao.ativa():
+            salvar_json(destino / 'metricas.json', instrumentacao.snapshot())
+    except Exception as e:
+        linha.update({'status': 'erro', 'erro': f"{type(e).__name__}: {e}"})
+
+    linha['segundos'] = round(time.perf_counter() - inicio, 3)
+    return linha
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Processa em lote uma pasta de planilhas de mercado.")
+    parser.add_argument('pasta', help="Pasta com as planilhas .xlsx dos clientes")
+    parser.add_argument('--saida', default='resultados_lote', help="Pasta de saída (padrão: resultados_lote)")
+    parser.add_argument('--processos', type=int, default=os.cpu_count(), help="Número de processos (padrão: nº de CPUs)")
+    parser.add_argument('--padrao', default='*.xlsx', help="Padrão dos arquivos (padrão: *.xlsx)")
+    parser.add_argument('--pdf', action='store_true', help="Gera também o relatório PDF de cada cliente")
+    args = parser.parse_args(argv)
+
+    planilhas = sorted(p for p in Path(args.pasta).glob(args.padrao) if not p.name.startswith('~$'))
+    if not planilhas:
+        print(f"Nenhuma planilha encontrada em {args.pasta} ({args.padrao})")
+        return 1
+    Path(args.saida).mkdir(parents=True, exist_ok=True)
+
+    pastas = pastas_saida(planilhas)
+    for caminho, pasta in pastas.items():
+        if pasta != nome_pasta(Path(caminho).stem):
+            print(f"⚠️ {Path(caminho).name}: nome de pasta já usado por outra planilha, resultados em '{pasta}'")
+
+    print(f"📊 {len(planilhas)} planilhas | {args.processos} processos | saída: {args.saida}")
+    inicio = time.perf_counter()
+    linhas = []
+    with ProcessPoolExecutor(max_workers=args.processos) as executor:
+        futuros = {executor.submit(processar_planilha, str(p), args.saida, args.pdf, pastas[str(p)]): p for p in planilhas}
+        for i, futuro in enumerate(as_completed(futuros), 1):
+            linha = futuro.result()
+            linhas.append(linha)
+            marcador = "✅" if linha['status'] == 'ok' else "❌"
+            print(f"[{i}/{len(planilhas)}] {marcador} {linha['arquivo']} ({linha['segundos']}s){' - ' + linha['erro'] if linha['erro'] else ''}")
+
+    resumo = pd.DataFrame(linhas).sort_values('arquivo')
+    for coluna in ('subcategorias', 'anomalias', 'acoes', 'registros_categoria', 'registros_subcategoria'):
+        if coluna in resumo.columns:
+            resumo[coluna] = resumo[coluna].astype('Int64')
+    resumo.to_csv(Path(args.saida) / 'resumo.csv', index=False, encoding='utf-8-sig')
+    erros = int((resumo['status'] == 'erro').sum())
+    print(f"\nConcluído em {time.perf_counter() - inicio:.1f}s: {len(resumo) - erros} ok, {erros} com erro")
+    print(f"Resumo: {Path(args.saida) / 'resumo.csv'}")
+    return 1 if erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gerador de dados de mercado sintéticos (categorias, subcategorias e meses) para testes de escala
+"""
+
+import io
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.market_analyzer import MarketAnalyzer
+
+
+def gerar_dados_mercado(categorias: int = 5, subcategorias_por_categoria: int = 20, meses: int = 12,
+                        inicio: str = '2024-01', sazonalidade: float = 0.15, ruido: float = 0.10,
+                        tendencia: float = 0.01, semente: int = 42) -> Dict:
+    """
+    Gera um marketplace sintético reprodutível (mesma semente = mesmos dados):
+    - cada categoria tem um tamanho de mercado e uma fase sazonal própria;
+    - cada subcategoria tem participação, ticket e tendência mensal próprios;
+    - faturamento mensal = base × (1 + tendência)^t × (1 + sazonalidade × sen) × ruído lognormal;
+    - a série da categoria macro é a soma mensal das subcategorias.
+    Retorna {'cliente': kwargs de set_cliente_data, 'categoria': DataFrame, 'subcategoria': DataFrame}.
+    """
+    rng = np.random.default_rng(semente)
+    n_cat, n_sub, n_mes = max(int(categorias), 1), max(int(subcategorias_por_categoria), 1), max(int(meses), 1)
+    periodos = pd.period_range(pd.Period(inicio, freq='M'), periods=n_mes, freq='M').strftime('%Y-%m')
+    nomes_cat = np.array([f"Categoria {i + 1:04d}" for i in range(n_cat)], dtype=object)
+
+    # Parâmetros por categoria (n_cat) e por subcategoria (n_cat × n_sub)
+    mercado_cat = rng.lognormal(np.log(5e6), 0.8, n_cat)
+    fase = rng.uniform(0, 12, n_cat)
+    participacao = rng.lognormal(0.0, 1.0, (n_cat, n_sub))
+    participacao /= participacao.sum(axis=1, keepdims=True)
+    ticket = rng.lognormal(np.log(150), 0.6, (n_cat, n_sub))
+    crescimento = rng.normal(tendencia, 0.02, (n_cat, n_sub))
+
+    # Cubo de faturamento (categoria × subcategoria × mês)
+    t = np.arange(n_mes)
+    sazonal = 1 + sazonalidade * np.sin(2 * np.pi * (t[None, :] + fase[:, None]) / 12)
+    base = (mercado_cat[:, None] * participacao)[:, :, None]
+    faturamento = base * (1 + crescimento[:, :, None]) ** t * sazonal[:, None, :]
+    faturamento *= rng.lognormal(0.0, ruido, faturamento.shape)
+    ticket_mes = ticket[:, :, None] * rng.lognormal(0.0, ruido / 2, faturamento.shape)
+    unidades = np.maximum(np.rint(faturamento / ticket_mes), 1).astype(int)
+    faturamento = np.round(faturamento, 2)
+
+    total = n_cat * n_sub * n_mes
+    df_sub = pd.DataFrame({
+        'categoria': np.repeat(nomes_cat, n_sub * n_mes),
+        'subcategoria': np.repeat(np.array([f"Sub {i + 1:04d}-{j + 1:03d}" for i in range(n_cat) for j in range(n_sub)],
+                                           dtype=object), n_mes),
+        'periodo': np.tile(np.asarray(periodos, dtype=object), n_cat * n_sub),
+        'faturamento': faturamento.reshape(total),
+        'unidades': unidades.reshape(total)
+    })
+    df_cat = pd.DataFrame({
+        'categoria': np.repeat(nomes_cat, n_mes),
+        'periodo': np.tile(np.asarray(periodos, dtype=object), n_cat),
+        'faturamento': np.round(faturamento.sum(axis=1), 2).reshape(n_cat * n_mes),
+        'unidades': unidades.sum(axis=1).reshape(n_cat * n_mes)
+    })
+
+    # Cliente com ticket próximo da mediana do mercado e ~0,5% de share da primeira categoria
+    fat_3m = float(faturamento[0, :, -3:].sum() * 0.005)
+    ticket_cliente = round(float(np.median(ticket)), 2)
+    cliente = {
+        'empresa': 'Empresa Sintética',
+        'categoria': str(nomes_cat[0]),
+        'ticket_medio': ticket_cliente,
+        'margem': 30.0,
+        'faturamento_3m': round(fat_3m, 2),
+        'unidades_3m': int(fat_3m / ticket_cliente) if ticket_cliente > 0 else 0,
+        'range_permitido': 20.0,
+        'ticket_custom': None,
+        'cac': round(ticket_cliente * 0.3, 2),
+        'investimento_mkt': round(fat_3m * 0.1, 2)
+    }
+    return {'cliente': cliente, 'categoria': df_cat, 'subcategoria': df_sub}
+
+
+def gerar_analyzer(dados: Dict = None, **parametros) -> MarketAnalyzer:
+    """MarketAnalyzer carregado em lote com os dados sintéticos (gera-os com `parametros` se `dados` não vier)"""
+    dados = dados or gerar_dados_mercado(**parametros)
+    analyzer = MarketAnalyzer()
+    analyzer.set_cliente_data(**dados['cliente'])
+    analyzer.aplicar_alteracoes(pd.concat([
+        dados['categoria'].assign(acao='inserir', nivel='categoria'),
+        dados['subcategoria'].assign(acao='inserir', nivel='subcategoria')
+    ], ignore_index=True))
+    return analyzer
+
+
+def salvar_planilha(dados: Dict, destino: Union[str, io.BytesIO] = None) -> Union[str, io.BytesIO]:
+    """
+    Grava os dados no layout do modelo (abas Cliente, Mercado_Categoria e Mercado_Subcategoria,
+    cabeçalhos na 3ª linha), pronto para carregar_planilha. Sem destino, devolve um BytesIO.
+    """
+    destino = io.BytesIO() if destino is None else destino
+    cliente = dados['cliente']
+    df_cliente = pd.DataFrame([
+        ["CONFIGURAÇÃO DO CLIENTE", "VALORES"],
+        ["Empresa", cliente['empresa']],
+        ["Categoria Macro", cliente['categoria']],
+        ["Ticket Médio Geral", cliente['ticket_medio']],
+        ["Margem Atual", cliente['margem']],
+        ["Faturamento Médio 3M", cliente['faturamento_3m']],
+        ["Unidades Médias 3M", cliente['unidades_3m']],
+        ["Range Permitido", cliente['range_permitido'] / 100 if cliente['range_permitido'] > 1 else cliente['range_permitido']],
+        ["Ticket Customizado", cliente['ticket_custom']],
+        ["CAC", cliente['cac']],
+        ["Investimento Mkt", cliente['investimento_mkt']],
+    ])
+    abas = {
+        'Mercado_Categoria': ("MERCADO - CATEGORIA MACRO (dados sintéticos)",
+                              dados['categoria'].rename(columns={'categoria': 'Categoria', 'periodo': 'Periodo',
+                                                                 'faturamento': 'Faturamento', 'unidades': 'Unidades'})),
+        'Mercado_Subcategoria': ("MERCADO - SUBCATEGORIAS (dados sintéticos)",
+                                 dados['subcategoria'].rename(columns={'categoria': 'Categoria Macro', 'subcategoria': 'Subcategoria',
+                                                                       'periodo': 'Periodo', 'faturamento': 'Faturamento',
+                                                                       'unidades': 'Unidades'})),
+    }
+    with pd.ExcelWriter(destino, engine='openpyxl') as writer:
+        df_cliente.to_excel(writer, sheet_name='Cliente', index=False, header=False)
+        for aba, (titulo, df) in abas.items():
+            pd.DataFrame([[titulo]]).to_excel(writer, sheet_name=aba, index=False, header=False)
+            df.to_excel(writer, sheet_name=aba, index=False, startrow=2)
+    if isinstance(destino, io.BytesIO):
+        destino.seek(0)
+    return destino
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Medições de desempenho de cada rerun do app (etapas do script e memória da sessão)
+"""
+
+import pickle
+import sys
+import time
+from typing import Dict, Mapping
+
+
+class MedidorRerun:
+    """
+    Cronômetro por marcos: cada marcar(nome) atribui a `nome` o tempo decorrido desde o marco
+    anterior (etapas com o mesmo nome se acumulam), sem precisar reindentar o script.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._ultimo = self.inicio
+        self.etapas = {}
+
+    def marcar(self, nome: str) -> float:
+        agora = time.perf_counter()
+        duracao = agora - self._ultimo
+        self.etapas[nome] = self.etapas.get(nome, 0.0) + duracao
+        self._ultimo = agora
+        return duracao
+
+    def total(self) -> float:
+        return time.perf_counter() - self.inicio
+
+
+def tamanho_sessao(estado: Mapping) -> Dict[str, int]:
+    """
+    Tamanho aproximado (bytes) de cada chave do session_state, pelo tamanho serializado em pickle;
+    objetos não serializáveis (widgets, conexões) entram com sys.getsizeof.
+    """
+    tamanhos = {}
+    for chave in list(estado.keys()):
+        valor = estado[chave]
+        try:
+            tamanhos[str(chave)] = len(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            tamanhos[str(chave)] = sys.getsizeof(valor)
+    return dict(sorted(tamanhos.items(), key=lambda item: -item[1]))
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Leitura das planilhas de mercado (abas Cliente, Mercado_Categoria e Mercado_Subcategoria)
+sem dependência do Streamlit, usada pelo app e pelo processamento em lote
+"""
+
+from typing import Dict, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.market_analyzer import MarketAnalyzer
+from utils.rastreamento import RastreioImportacao
+
+
+ABAS = ("Cliente", "Mercado_Categoria", "Mercado_Subcategoria")
+ETAPAS_LEITURA = {"Cliente": "ler_cliente", "Mercado_Categoria": "ler_categoria",
+                  "Mercado_Subcategoria": "ler_subcategoria"}
+
+
+def safe_float(val):
+    try:
+        if pd.isna(val): return 0.0
+        return float(val)
+    except:
+        return 0.0
+
+
+def ler_abas(file, motor: str = 'pandas', rastreio: RastreioImportacao = None) -> Dict[str, pd.DataFrame]:
+    """
+    Lê as três abas do modelo abrindo o arquivo uma única vez: Cliente sem cabeçalho e as abas
+    de mercado com o cabeçalho na 3ª linha. motor='pandas' usa pd.ExcelFile; motor='openpyxl'
+    percorre as linhas em modo somente leitura (sem a conversão por célula do pandas).
+    Com `rastreio`, a abertura e a leitura de cada aba são registradas como etapas.
+    """
+    rastreio = rastreio or RastreioImportacao(destino='')
+    abas = {}
+    if motor == 'openpyxl':
+        with rastreio.etapa('abrir_arquivo', motor=motor):
+            wb = load_workbook(file, read_only=True, data_only=True)
+        try:
+            for aba in ABAS:
+                with rastreio.etapa(ETAPAS_LEITURA[aba], aba=aba) as etapa:
+                    linhas = list(wb[aba].iter_rows(values_only=True))
+                    if aba == 'Cliente':
+                        abas[aba] = pd.DataFrame(linhas)
+                    else:
+                        cabecalho = list(linhas[2]) if len(linhas) > 2 else []
+                        df = pd.DataFrame(linhas[3:])
+                        df.columns = (cabecalho + [None] * df.shape[1])[:df.shape[1]] if df.shape[1] else []
+                        abas[aba] = df if not df.empty else pd.DataFrame(columns=cabecalho)
+                    etapa.update(linhas=len(abas[aba]), colunas=abas[aba].shape[1])
+        finally:
+            wb.close()
+        return abas
+
+    with rastreio.etapa('abrir_arquivo', motor=motor):
+        xls = pd.ExcelFile(file)
+    with xls:
+        for aba in ABAS:
+            with rastreio.etapa(ETAPAS_LEITURA[aba], aba=aba) as etapa:
+                if aba == 'Cliente':
+                    abas[aba] = pd.read_excel(xls, sheet_name=aba, header=None)
+                else:
+                    abas[aba] = pd.read_excel(xls, sheet_name=aba, skiprows=2)
+                etapa.update(linhas=len(abas[aba]), colunas=abas[aba].shape[1])
+    return abas
+
+
+def _find_col(df, possible_names):
+    for col in df.columns:
+        if any(name.lower() in str(col).lower() for name in possible_names):
+            return col
+    return None
+
+
+def _coluna_numerica(df, col):
+    return pd.to_numeric(df[col], errors='coerce').fillna(0) if col else 0
+
+
+def _valores_invalidos(df, cols) -> int:
+    """Células preenchidas que não são números (viram 0 na conversão)"""
+    total = 0
+    for col in cols:
+        if col:
+            total += int((df[col].notna() & pd.to_numeric(df[col], errors='coerce').isna()).sum())
+    return total
+
+
+def carregar_planilha(file, motor: str = 'pandas', rastreio: RastreioImportacao = None) -> Tuple[MarketAnalyzer, Dict]:
+    """
+    Lê uma planilha no formato do modelo e devolve um MarketAnalyzer preenchido e um resumo
+    da importação. Erros de leitura são propagados para quem chamou.
+    Cada etapa é registrada no log de importação (utils.rastreamento); passe um `rastreio`
+    próprio para consultar as etapas depois (ex.: a etapa em que a importação falhou).
+    """
+    rastreio = rastreio or RastreioImportacao(file, motor=motor)
+    with rastreio:
+        return _carregar_planilha(file, motor, rastreio)
+
+
+def _carregar_planilha(file, motor: str, rastreio: RastreioImportacao) -> Tuple[MarketAnalyzer, Dict]:
+    temp_analyzer = MarketAnalyzer()
+    abas = ler_abas(file, motor, rastreio)
+
+    # 1. Cliente
+    df_cliente = abas["Cliente"]
+
+    with rastreio.etapa('dados_cliente', linhas=len(df_cliente)) as etapa:
+        rotulos_ausentes = []
+
+        def get_val_by_label(labels, default=""):
+            if isinstance(labels, str): labels = [labels]
+            for i in range(len(df_cliente)):
+                cell_val = str(df_cliente.iloc[i, 0]).strip().lower()
+                for label in labels:
+                    if label.lower() in cell_val:
+                        return df_cliente.iloc[i, 1]
+            rotulos_ausentes.append(labels[0])
+            return default
+
+        empresa = str(get_val_by_label(["Empresa", "Nome"], "Empresa Exemplo"))
+        cat_macro_cliente = str(get_val_by_label(["Categoria Macro", "Macro", "Categoria"], "Geral"))
+        ticket_medio = safe_float(get_val_by_label(["Ticket Médio Geral", "Ticket Médio"], 0))
+        margem = safe_float(get_val_by_label(["Margem Atual", "Margem"], 0))
+        fat_3m = safe_float(get_val_by_label(["Faturamento Médio 3M", "Faturamento"], 0))
+        uni_3m = int(safe_float(get_val_by_label(["Unidades Médias 3M", "Unidades"], 0)))
+        range_p = safe_float(get_val_by_label(["Range Permitido", "Range"], 0.20))
+        ticket_c = get_val_by_label(["Ticket Customizado", "Customizado"], None)
+        ticket_custom = safe_float(ticket_c) if pd.notna(ticket_c) and str(ticket_c).strip() != "" else None
+        cac = safe_float(get_val_by_label(["CAC", "Custo de Aquisição"], 0))
+        investimento_mkt = safe_float(get_val_by_label(["Investimento Mkt", "Investimento em Marketing", "Investimento"], 0))
+
+        temp_analyzer.set_cliente_data(
+            empresa=empresa, categoria=cat_macro_cliente, ticket_medio=ticket_medio,
+            margem=margem, faturamento_3m=fat_3m, unidades_3m=uni_3m,
+            range_permitido=range_p, ticket_custom=ticket_custom,
+            cac=cac, investimento_mkt=investimento_mkt
+        )
+        etapa['campos_ausentes'] = rotulos_ausentes
+
+    # 2. Colunas das abas de mercado (Mercado Categoria e Mercado Subcategoria)
+    df_cat = abas["Mercado_Categoria"]
+    df_sub = abas["Mercado_Subcategoria"]
+
+    with rastreio.etapa('detectar_colunas') as etapa:
+        col_cat = _find_col(df_cat, ["Categoria"])
+        col_per = _find_col(df_cat, ["Periodo", "Período"])
+        col_fat = _find_col(df_cat, ["Faturamento"])
+        col_uni = _find_col(df_cat, ["Unidades"])
+
+        col_sub_cat = _find_col(df_sub, ["Categoria"])
+        col_sub_name = _find_col(df_sub, ["Subcategoria"])
+        col_sub_per = _find_col(df_sub, ["Periodo", "Período"])
+        col_sub_fat = _find_col(df_sub, ["Faturamento"])
+        col_sub_uni = _find_col(df_sub, ["Unidades"])
+
+        colunas = {
+            'categoria': {'categoria': col_cat, 'periodo': col_per, 'faturamento': col_fat, 'unidades': col_uni},
+            'subcategoria': {'categoria': col_sub_cat, 'subcategoria': col_sub_name, 'periodo': col_sub_per,
+                             'faturamento': col_sub_fat, 'unidades': col_sub_uni},
+        }
+        etapa['colunas'] = {aba: {nome: None if col is None else str(col) for nome, col in cols.items()}
+                            for aba, cols in colunas.items()}
+        etapa['ausentes'] = [f"{aba}.{nome}" for aba, cols in colunas.items() for nome, col in cols.items() if col is None]
+
+    # 3. Conversão das linhas (Subcategoria com suporte a dados mensais)
+    # Os registros das duas abas são carregados em lote (uma única invalidação de caches)
+    with rastreio.etapa('converter_linhas', linhas=len(df_cat) + len(df_sub)) as etapa:
+        lotes = []
+        count_cat = 0
+        rejeitadas_cat = len(df_cat)
+        invalidos = 0
+        if col_cat and col_per:
+            validas = df_cat[df_cat[col_cat].notna() & df_cat[col_per].notna()]
+            lotes.append(pd.DataFrame({
+                'acao': 'inserir', 'nivel': 'categoria',
+                'categoria': validas[col_cat].astype(str), 'periodo': validas[col_per].astype(str),
+                'faturamento': _coluna_numerica(validas, col_fat), 'unidades': _coluna_numerica(validas, col_uni)
+            }))
+            count_cat = len(validas)
+            rejeitadas_cat -= count_cat
+            invalidos += _valores_invalidos(validas, [col_fat, col_uni])
+
+        count_sub = 0
+        rejeitadas_sub = len(df_sub)
+        if col_sub_cat and col_sub_name:
+            validas = df_sub[df_sub[col_sub_cat].notna() & df_sub[col_sub_name].notna()]
+            periodo = validas[col_sub_per].astype(str).where(validas[col_sub_per].notna(), None) if col_sub_per else None
+            lotes.append(pd.DataFrame({
+                'acao': 'inserir', 'nivel': 'subcategoria',
+                'categoria': validas[col_sub_cat].astype(str), 'subcategoria': validas[col_sub_name].astype(str),
+                'periodo': periodo,
+                'faturamento': _coluna_numerica(validas, col_sub_fat), 'unidades': _coluna_numerica(validas, col_sub_uni)
+            }))
+            count_sub = len(validas)
+            rejeitadas_sub -= count_sub
+            invalidos += _valores_invalidos(validas, [col_sub_fat, col_sub_uni])
+
+        etapa.update(aceitas=count_cat + count_sub, rejeitadas=rejeitadas_cat + rejeitadas_sub,
+                     rejeitadas_categoria=rejeitadas_cat, rejeitadas_subcategoria=rejeitadas_sub,
+                     valores_nao_numericos=invalidos)
+
+    # 4. Carga no analyzer
+    with rastreio.etapa('carregar_analyzer', linhas=count_cat + count_sub) as etapa:
+        if lotes:
+            temp_analyzer.aplicar_alteracoes(pd.concat(lotes, ignore_index=True))
+        count_cat -= len(temp_analyzer.periodos_duplicados)
+        etapa.update(registros_categoria=count_cat, registros_subcategoria=count_sub,
+                     rejeitadas=len(temp_analyzer.periodos_duplicados))
+
+    resumo = {
+        'empresa': empresa,
+        'faturamento_3m': fat_3m,
+        'ticket_medio': ticket_medio,
+        'registros_categoria': count_cat,
+        'registros_subcategoria': count_sub,
+        'periodos_duplicados': len(temp_analyzer.periodos_duplicados)
+    }
+    return temp_analyzer, resumo
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentação opcional dos métodos públicos do MarketAnalyzer: chamadas, latência (total,
+própria, p50/p95), tamanho das entradas e quem chamou cada método
+"""
+
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Amostras de latência mantidas por método (as mais recentes) para os percentis
+LIMITE_AMOSTRAS = 10_000
+
+_trava = threading.Lock()
+_local = threading.local()
+_metricas = {}
+_originais = {}
+
+
+def _nova_metrica() -> Dict:
+    return {'chamadas': 0, 'erros': 0, 'total': 0.0, 'filhos': 0.0, 'max': 0.0,
+            'amostras': deque(maxlen=LIMITE_AMOSTRAS), 'soma_argumentos': 0, 'max_argumentos': 0,
+            'soma_registros': 0, 'max_registros': 0, 'chamadores': {}}
+
+
+def _tamanho_argumentos(args, kwargs) -> int:
+    """Soma dos tamanhos das entradas com len() (listas, dicts, DataFrames), ignorando textos"""
+    return sum(len(v) for v in (*args, *kwargs.values()) if hasattr(v, '__len__') and not isinstance(v, str))
+
+
+def _registros_analyzer(analyzer) -> int:
+    """Volume de dados do analyzer no momento da chamada (calculado uma vez por versão dos dados)"""
+    caches = getattr(analyzer, '_caches', None)
+    if caches is None:
+        return 0
+    if 'registros_instrumentacao' not in caches:
+        caches['registros_instrumentacao'] = (sum(len(r) for r in analyzer.mercado_subcategorias.values()) +
+                                              sum(len(r) for r in analyzer.mercado_categoria.values()))
+    return caches['registros_instrumentacao']
+
+
+def _instrumentar(nome: str, funcao, estatico: bool = False):
+    """Envolve o método: mede o tempo total e o dos métodos instrumentados chamados por ele"""
+    @functools.wraps(funcao)
+    def medido(*args, **kwargs):
+        pilha = getattr(_local, 'pilha', None)
+        if pilha is None:
+            pilha = _local.pilha = []
+        chamador = pilha[-1][0] if pilha else None
+        quadro = [nome, 0.0]
+        pilha.append(quadro)
+        erro = False
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        except Exception:
+            erro = True
+            raise
+        finally:
+            duracao = time.perf_counter() - inicio
+            pilha.pop()
+            if pilha:
+                pilha[-1][1] += duracao
+            tamanho = _tamanho_argumentos(args if estatico else args[1:], kwargs)
+            registros = 0 if estatico or not args else _registros_analyzer(args[0])
+            with _trava:
+                m = _metricas.setdefault(nome, _nova_metrica())
+                m['chamadas'] += 1
+                m['erros'] += erro
+                m['total'] += duracao
+                m['filhos'] += quadro[1]
+                m['max'] = max(m['max'], duracao)
+                m['amostras'].append(duracao)
+                m['soma_argumentos'] += tamanho
+                m['max_argumentos'] = max(m['max_argumentos'], tamanho)
+                m['soma_registros'] += registros
+                m['max_registros'] = max(m['max_registros'], registros)
+                m['chamadores'][chamador] = m['chamadores'].get(chamador, 0) + 1
+    return medido
+
+
+def ativar(classe=None):
+    """
+    Substitui os métodos públicos da classe (padrão: MarketAnalyzer) pelas versões medidas.
+    Desativada, a classe fica intocada: o custo da instrumentação é zero.
+    """
+    if classe is None:
+        from utils.market_analyzer import MarketAnalyzer
+        classe = MarketAnalyzer
+    if classe in _originais:
+        return
+    originais = {}
+    for nome, atributo in list(vars(classe).items()):
+        if nome.startswith('_'):
+            continue
+        if isinstance(atributo, staticmethod):
+            setattr(classe, nome, staticmethod(_instrumentar(nome, atributo.__func__, estatico=True)))
+        elif callable(atributo) and not isinstance(atributo, type):
+            setattr(classe, nome, _instrumentar(nome, atributo))
+        else:
+            continue
+        originais[nome] = atributo
+    _originais[classe] = originais
+
+
+def desativar(classe=None):
+    """Restaura os métodos originais (as métricas já coletadas são mantidas até resetar())"""
+    classes = list(_originais) if classe is None else [classe]
+    for cls in classes:
+        for nome, atributo in _originais.pop(cls, {}).items():
+            setattr(cls, nome, atributo)
+
+
+def ativa(classe=None) -> bool:
+    if classe is None:
+        return bool(_originais)
+    return classe in _originais
+
+
+def resetar():
+    with _trava:
+        _metricas.clear()
+
+
+@contextmanager
+def instrumentado(classe=None):
+    """Ativa a instrumentação dentro de um bloco `with` (desativa ao sair, se foi este bloco que ativou)"""
+    ja_ativa = ativa(classe)
+    ativar(classe)
+    try:
+        yield
+    finally:
+        if not ja_ativa:
+            desativar(classe)
+
+
+def snapshot() -> Dict[str, Dict]:
+    """
+    Cópia das métricas por método: chamadas, erros, tempo total e próprio (sem os métodos
+    instrumentados chamados por ele), média, p50, p95 e máximo em segundos, tamanho médio/máximo
+    dos argumentos, registros do analyzer na chamada e contagem por método chamador.
+    """
+    with _trava:
+        copia = {nome: {**m, 'amostras': list(m['amostras']), 'chamadores': dict(m['chamadores'])}
+                 for nome, m in _metricas.items()}
+    resultado = {}
+    for nome, m in copia.items():
+        p50, p95 = np.percentile(m['amostras'], [50, 95]) if m['amostras'] else (0.0, 0.0)
+        resultado[nome] = {
+            'chamadas': m['chamadas'],
+            'erros': m['erros'],
+            'total_s': m['total'],
+            'proprio_s': m['total'] - m['filhos'],
+            'media_s': m['total'] / m['chamadas'],
+            'p50_s': float(p50),
+            'p95_s': float(p95),
+            'max_s': m['max'],
+            'argumentos_medio': m['soma_argumentos'] / m['chamadas'],
+            'argumentos_max': m['max_argumentos'],
+            'registros_medio': m['soma_registros'] / m['chamadas'],
+            'registros_max': m['max_registros'],
+            'chamadores': {(c if c is not None else '(externo)'): n for c, n in m['chamadores'].items()},
+        }
+    return resultado
+
+
+def diferenca(inicio: Dict[str, Dict], fim: Dict[str, Dict] = None) -> Dict[str, Dict]:
+    """
+    Métricas acumuladas entre dois snapshots (padrão do fim: agora), sem zerar as métricas dos
+    demais usuários do processo. Percentis não são subtraíveis: p50/p95/max vêm do snapshot final.
+    """
+    fim = snapshot() if fim is None else fim
+    resultado = {}
+    for nome, m in fim.items():
+        antes = inicio.get(nome, {})
+        chamadas = m['chamadas'] - antes.get('chamadas', 0)
+        if chamadas <= 0:
+            continue
+        total = m['total_s'] - antes.get('total_s', 0.0)
+        chamadores_antes = antes.get('chamadores', {})
+        resultado[nome] = {
+            **m,
+            'chamadas': chamadas,
+            'erros': m['erros'] - antes.get('erros', 0),
+            'total_s': total,
+            'proprio_s': m['proprio_s'] - antes.get('proprio_s', 0.0),
+            'media_s': total / chamadas,
+            'chamadores': {c: n - chamadores_antes.get(c, 0) for c, n in m['chamadores'].items()
+                           if n > chamadores_antes.get(c, 0)},
+        }
+    return resultado
+
+
+def tabela(metricas: Dict[str, Dict] = None) -> pd.DataFrame:
+    """Snapshot em DataFrame (uma linha por método), ordenado pelo tempo total"""
+    metricas = snapshot() if metricas is None else metricas
+    if not metricas:
+        return pd.DataFrame(columns=['metodo', 'chamadas', 'total_s', 'proprio_s', 'p50_s', 'p95_s'])
+    df = pd.DataFrame([{'metodo': nome, **{k: v for k, v in m.items() if k != 'chamadores'},
+                        'chamadores': ", ".join(f"{c} ({n})" for c, n in sorted(m['chamadores'].items(), key=lambda x: -x[1]))}
+                       for nome, m in metricas.items()])
+    return df.sort_values('total_s', ascending=False, ignore_index=True)
@@ -4,14 +4,26 @@
 Módulo de cálculos de mercado e análise estratégica - Suporte a Múltiplas Categorias e Dados Mensais
 """
 
+import os
+
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
 
+from utils.market_cube import CuboMercado
+
 
 class MarketAnalyzer:
     """Classe para análise de mercado e cálculo de scores com suporte a múltiplas categorias e dados mensais"""
     
+    # Colunas de cada nível e a chave que identifica a linha dentro da categoria
+    COLUNAS_NIVEL = {
+        'categoria': (['periodo', 'faturamento', 'unidades', 'ticket_medio'], 'periodo', 'novo_periodo'),
+        'subcategoria': (['subcategoria', 'periodo', 'faturamento', 'unidades', 'ticket_medio'], 'subcategoria', 'novo_nome'),
+    }
+    COLUNAS_ALTERACAO = ['acao', 'nivel', 'categoria', 'subcategoria', 'periodo',
+                         'novo_nome', 'novo_periodo', 'faturamento', 'unidades']
+
     def __init__(self):
         self.cliente_data = {
             'cac': 0.0,
@@ -21,6 +33,30 @@ class MarketAnalyzer:
         self.mercado_categoria = {} 
         # Estrutura: { 'Categoria Nome': [ {subcategoria, periodo, faturamento, unidades, ticket_medio} ] }
         self.mercado_subcategorias = {}
+        # Índice { categoria: { periodo normalizado: posição na lista } } e totais acumulados por categoria
+        self._indice_periodos = {}
+        self._totais_categoria = {}
+        # Totais acumulados { categoria: { subcategoria: {faturamento, unidades, registros} } } e do mercado todo
+        self._totais_subcategoria = {}
+        self._totais_mercado = {'faturamento': 0.0, 'unidades': 0}
+        # Registros de cada subcategoria { categoria: { subcategoria: [registros] } } (os mesmos dicts das listas)
+        self._registros_subcategoria = {}
+        # Períodos recebidos em duplicidade (o último valor prevalece): [ (categoria, periodo) ]
+        self.periodos_duplicados = []
+        # Estruturas derivadas (grades mensais etc.), reconstruídas sob demanda a cada versão dos dados
+        self.versao_dados = 0
+        self._caches = {}
+        
+    def _invalidar_caches(self):
+        """Marca uma nova versão dos dados de mercado e descarta as estruturas derivadas"""
+        self.versao_dados = getattr(self, 'versao_dados', 0) + 1
+        self._caches = {}
+
+    def _cache(self) -> Dict:
+        """Estruturas derivadas da versão atual (analyzers restaurados de versões antigas não têm _caches)"""
+        if not hasattr(self, '_caches'):
+            self._invalidar_caches()
+        return self._caches
         
     def set_cliente_data(self, empresa: str, categoria: str, ticket_medio: float,
                         margem: float, faturamento_3m: float, unidades_3m: int,
@@ -40,22 +76,193 @@ class MarketAnalyzer:
             'investimento_mkt': investimento_mkt
         })
         
-    def add_mercado_categoria(self, categoria: str, periodo: str, faturamento: float, unidades: int):
-        """Adiciona dados de mercado para uma categoria específica"""
-        if categoria not in self.mercado_categoria:
-            self.mercado_categoria[categoria] = []
-            
+    @staticmethod
+    def normalizar_periodo(periodo) -> str:
+        """Normaliza um período para 'AAAA-MM' (ex.: '2024-01-01 00:00:00' -> '2024-01'); textos não reconhecidos são mantidos"""
+        if periodo is None or (not isinstance(periodo, str) and pd.isna(periodo)):
+            return None
+        texto = str(periodo).strip()
+        data = pd.to_datetime(texto, errors='coerce')
+        return data.strftime('%Y-%m') if pd.notna(data) else texto
+
+    def _registro_categoria(self, periodo: str, faturamento: float, unidades: int) -> Dict:
         # Garantir tipos numéricos
         faturamento = float(faturamento) if faturamento else 0.0
         unidades = int(float(unidades)) if unidades else 0
-            
-        ticket_medio = faturamento / unidades if unidades > 0 else 0
-        self.mercado_categoria[categoria].append({
+        return {
             'periodo': periodo,
             'faturamento': faturamento,
             'unidades': unidades,
-            'ticket_medio': ticket_medio
-        })
+            'ticket_medio': faturamento / unidades if unidades > 0 else 0
+        }
+
+    def _somar_totais_categoria(self, categoria: str, registro: Dict, sinal: int = 1):
+        """Atualiza os totais acumulados da categoria com um registro (sinal -1 para retirar)"""
+        for totais in (self._totais_categoria.setdefault(categoria, {'faturamento': 0.0, 'unidades': 0}), self._totais_mercado):
+            totais['faturamento'] += sinal * registro['faturamento']
+            totais['unidades'] += sinal * registro['unidades']
+
+    def _somar_totais_subcategoria(self, categoria: str, registro: Dict, sinal: int = 1):
+        """Atualiza os totais acumulados da subcategoria com um registro mensal (sinal -1 para retirar)"""
+        totais = self._totais_subcategoria.setdefault(categoria, {}).setdefault(
+            registro['subcategoria'], {'faturamento': 0.0, 'unidades': 0, 'registros': 0})
+        totais['faturamento'] += sinal * registro['faturamento']
+        totais['unidades'] += sinal * registro['unidades']
+        totais['registros'] += sinal
+        if totais['registros'] <= 0:
+            del self._totais_subcategoria[categoria][registro['subcategoria']]
+
+    def _reconstruir_totais_subcategoria(self, categorias: List[str]):
+        """Recalcula de uma vez (groupby) os totais e o índice das subcategorias das categorias informadas"""
+        for cat in categorias:
+            registros = self.mercado_subcategorias.get(cat, [])
+            if not registros:
+                self._totais_subcategoria.pop(cat, None)
+                self._registros_subcategoria.pop(cat, None)
+                continue
+            indice = {}
+            for registro in registros:
+                indice.setdefault(registro['subcategoria'], []).append(registro)
+            self._registros_subcategoria[cat] = indice
+            df = pd.DataFrame(registros, columns=['subcategoria', 'faturamento', 'unidades'])
+            agrupado = df.groupby('subcategoria', sort=False).agg(
+                faturamento=('faturamento', 'sum'), unidades=('unidades', 'sum'), registros=('faturamento', 'size'))
+            self._totais_subcategoria[cat] = {
+                sub: {'faturamento': float(fat), 'unidades': int(uni), 'registros': int(qtd)}
+                for sub, fat, uni, qtd in zip(agrupado.index, agrupado['faturamento'], agrupado['unidades'], agrupado['registros'])
+            }
+
+    def reconstruir_indices(self, categorias: List[str] = None):
+        """Reconstrói o índice de períodos e os totais das categorias (todas, se não informadas)"""
+        if not hasattr(self, '_indice_periodos'):
+            self._indice_periodos, self._totais_categoria, self.periodos_duplicados = {}, {}, []
+        if not hasattr(self, '_totais_mercado'):
+            self._totais_subcategoria, self._totais_mercado = {}, {'faturamento': 0.0, 'unidades': 0}
+        if not hasattr(self, '_registros_subcategoria'):
+            self._registros_subcategoria = {}
+            self._reconstruir_totais_subcategoria(list(self.mercado_subcategorias))
+        if categorias is None:
+            self._reconstruir_totais_subcategoria(list(self.mercado_subcategorias))
+        for cat in (list(self.mercado_categoria) if categorias is None else categorias):
+            registros = self.mercado_categoria.get(cat, [])
+            normalizados = {per: self.normalizar_periodo(per) for per in {r['periodo'] for r in registros}}
+            indice, unicos = {}, []
+            for registro in registros:
+                registro['periodo'] = normalizados[registro['periodo']]
+                pos = indice.get(registro['periodo'])
+                if pos is None:
+                    indice[registro['periodo']] = len(unicos)
+                    unicos.append(registro)
+                else:
+                    self.periodos_duplicados.append((cat, registro['periodo']))
+                    unicos[pos] = registro
+            anteriores = self._totais_categoria.get(cat, {'faturamento': 0.0, 'unidades': 0})
+            self._totais_mercado['faturamento'] -= anteriores['faturamento']
+            self._totais_mercado['unidades'] -= anteriores['unidades']
+            if not unicos:
+                # Categoria sem nenhum período deixa de existir (como em remover_periodo_categoria)
+                self._descartar_categoria(cat)
+                continue
+            self.mercado_categoria[cat] = unicos
+            self._indice_periodos[cat] = indice
+            self._totais_categoria[cat] = {'faturamento': 0.0, 'unidades': 0}
+            for registro in unicos:
+                self._somar_totais_categoria(cat, registro)
+
+    def _descartar_categoria(self, categoria: str):
+        """Retira uma categoria macro sem períodos da série, do índice e dos totais"""
+        self.mercado_categoria.pop(categoria, None)
+        self._indice_periodos.pop(categoria, None)
+        self._totais_categoria.pop(categoria, None)
+
+    def add_mercado_categoria(self, categoria: str, periodo: str, faturamento: float, unidades: int) -> bool:
+        """
+        Adiciona (ou atualiza) os dados de mercado de uma categoria em um período.
+        Se o período já existir, o registro é substituído e a duplicidade é registrada
+        em `periodos_duplicados`. Retorna True quando o período é novo.
+        """
+        periodo = self.normalizar_periodo(periodo)
+        indice = self._indice_periodos.setdefault(categoria, {})
+        registros = self.mercado_categoria.setdefault(categoria, [])
+        registro = self._registro_categoria(periodo, faturamento, unidades)
+
+        pos = indice.get(periodo)
+        if pos is not None:
+            self.periodos_duplicados.append((categoria, periodo))
+            self._somar_totais_categoria(categoria, registros[pos], -1)
+            registros[pos] = registro
+        else:
+            indice[periodo] = len(registros)
+            registros.append(registro)
+        self._somar_totais_categoria(categoria, registro)
+        self._invalidar_caches()
+        return pos is None
+
+    def editar_mercado_categoria(self, categoria: str, periodo: str, faturamento: float = None, unidades: int = None,
+                                 novo_periodo: str = None, nova_categoria: str = None) -> bool:
+        """
+        Edita um período de uma categoria. Valores não informados são mantidos.
+        Com `novo_periodo`/`nova_categoria` o registro é movido (substituindo um período já existente no destino).
+        """
+        periodo = self.normalizar_periodo(periodo)
+        pos = self._indice_periodos.get(categoria, {}).get(periodo)
+        if pos is None:
+            return False
+        atual = self.mercado_categoria[categoria][pos]
+        faturamento = atual['faturamento'] if faturamento is None else faturamento
+        unidades = atual['unidades'] if unidades is None else unidades
+        destino_cat = nova_categoria or categoria
+        destino_per = self.normalizar_periodo(novo_periodo) if novo_periodo else periodo
+
+        if (destino_cat, destino_per) == (categoria, periodo):
+            registro = self._registro_categoria(periodo, faturamento, unidades)
+            self._somar_totais_categoria(categoria, atual, -1)
+            self.mercado_categoria[categoria][pos] = registro
+            self._somar_totais_categoria(categoria, registro)
+            self._invalidar_caches()
+        else:
+            self.remover_periodo_categoria(categoria, periodo)
+            self.add_mercado_categoria(destino_cat, destino_per, faturamento, unidades)
+        return True
+
+    def remover_periodo_categoria(self, categoria: str, periodo: str) -> bool:
+        """Remove um período de uma categoria em O(1) (o último registro ocupa a posição liberada)"""
+        periodo = self.normalizar_periodo(periodo)
+        indice = self._indice_periodos.get(categoria, {})
+        pos = indice.pop(periodo, None)
+        if pos is None:
+            return False
+        registros = self.mercado_categoria[categoria]
+        self._somar_totais_categoria(categoria, registros[pos], -1)
+        ultimo = registros.pop()
+        if pos < len(registros):
+            registros[pos] = ultimo
+            indice[ultimo['periodo']] = pos
+        if not registros:
+            self._descartar_categoria(categoria)
+        self._invalidar_caches()
+        return True
+
+    def get_totais_categoria(self, categoria: str) -> Dict:
+        """Totais acumulados de uma categoria (faturamento, unidades, ticket médio e nº de períodos) sem varrer a série"""
+        totais = self._totais_categoria.get(categoria, {'faturamento': 0.0, 'unidades': 0})
+        return {
+            'faturamento': totais['faturamento'],
+            'unidades': totais['unidades'],
+            'ticket_medio': totais['faturamento'] / totais['unidades'] if totais['unidades'] > 0 else 0,
+            'periodos': len(self._indice_periodos.get(categoria, {}))
+        }
+
+    def get_totais_mercado(self) -> Dict:
+        """Totais do mercado (todas as categorias macro) e contagens, lidos dos agregados mantidos incrementalmente"""
+        totais = self._totais_mercado
+        return {
+            'faturamento': totais['faturamento'],
+            'unidades': totais['unidades'],
+            'ticket_medio': totais['faturamento'] / totais['unidades'] if totais['unidades'] > 0 else 0,
+            'categorias': len(self.mercado_categoria),
+            'subcategorias': sum(len(subs) for subs in self._totais_subcategoria.values())
+        }
         
     def add_mercado_subcategoria(self, categoria: str, subcategoria: str, faturamento: float, unidades: int, periodo: str = None):
         """Adiciona dados de mercado de subcategoria vinculada a uma categoria macro (suporta dados mensais)"""
@@ -67,47 +274,152 @@ class MarketAnalyzer:
         unidades = int(float(unidades)) if unidades else 0
             
         ticket_medio = faturamento / unidades if unidades > 0 else 0
-        self.mercado_subcategorias[categoria].append({
+        registro = {
             'subcategoria': subcategoria,
             'periodo': periodo,
             'faturamento': faturamento,
             'unidades': unidades,
             'ticket_medio': ticket_medio
-        })
+        }
+        self.mercado_subcategorias[categoria].append(registro)
+        self._registros_subcategoria.setdefault(categoria, {}).setdefault(subcategoria, []).append(registro)
+        self._somar_totais_subcategoria(categoria, registro)
+        self._invalidar_caches()
         
     def get_subcategorias_consolidadas(self, categoria: str = None) -> List[Dict]:
         """Consolida os dados mensais das subcategorias para análise de 6 meses (ou total disponível)"""
-        if not self.mercado_subcategorias:
-            return []
-            
-        categorias_para_processar = [categoria] if categoria else list(self.mercado_subcategorias.keys())
+        categorias_para_processar = [categoria] if categoria else list(self._totais_subcategoria.keys())
         consolidado = []
         
+        # Leitura direta dos totais mantidos a cada inclusão/edição/remoção (sem reagrupar os meses)
         for cat in categorias_para_processar:
-            if cat in self.mercado_subcategorias:
-                df_sub = pd.DataFrame(self.mercado_subcategorias[cat])
-                if df_sub.empty: continue
-                
-                # Agrupar por subcategoria e somar faturamento e unidades
-                df_grouped = df_sub.groupby('subcategoria').agg({
-                    'faturamento': 'sum',
-                    'unidades': 'sum'
-                }).reset_index()
-                
-                for _, row in df_grouped.iterrows():
-                    faturamento_total = row['faturamento']
-                    unidades_total = row['unidades']
-                    ticket_medio = faturamento_total / unidades_total if unidades_total > 0 else 0
-                    
-                    consolidado.append({
-                        'categoria': cat,
-                        'subcategoria': row['subcategoria'],
-                        'faturamento_6m': faturamento_total,
-                        'unidades_6m': unidades_total,
-                        'ticket_medio': ticket_medio
-                    })
+            for sub, totais in sorted(self._totais_subcategoria.get(cat, {}).items(), key=lambda item: str(item[0])):
+                consolidado.append({
+                    'categoria': cat,
+                    'subcategoria': sub,
+                    'faturamento_6m': totais['faturamento'],
+                    'unidades_6m': totais['unidades'],
+                    'ticket_medio': totais['faturamento'] / totais['unidades'] if totais['unidades'] > 0 else 0
+                })
         return consolidado
 
+    def get_cubo(self) -> CuboMercado:
+        """Cubo categoria × subcategoria × mês (agregados calculados sob demanda), um por versão dos dados"""
+        caches = self._cache()
+        if 'cubo' not in caches:
+            caches['cubo'] = CuboMercado(self.mercado_subcategorias, self.mercado_categoria, self.normalizar_periodo)
+        return caches['cubo']
+
+    def get_grade_mensal(self, categoria: str) -> Dict:
+        """
+        Matriz densa (subcategoria × mês) de faturamento e unidades de uma categoria, com os
+        meses sem dados preenchidos com 0. Construída uma vez por versão dos dados.
+        Retorna {'faturamento': DataFrame, 'unidades': DataFrame, 'inicio': Series, 'fim': Series},
+        onde inicio/fim são as posições do primeiro e do último mês com dados de cada subcategoria.
+        """
+        caches = self._cache()
+        chave = ('grade_mensal', categoria)
+        if chave in caches:
+            return caches[chave]
+
+        vazio = pd.DataFrame(dtype=float)
+        grade = {'faturamento': vazio, 'unidades': vazio, 'inicio': pd.Series(dtype=int), 'fim': pd.Series(dtype=int)}
+        celulas = self.get_cubo().fatia(categoria=categoria)
+        if not celulas.empty:
+            meses = pd.date_range(celulas['mes'].min(), celulas['mes'].max(), freq='MS')
+            pivot = celulas.pivot(index='subcategoria', columns='mes', values=['faturamento', 'unidades', 'registros'])
+            presenca = pivot['registros'].reindex(columns=meses).fillna(0).to_numpy() > 0
+            grade = {
+                'faturamento': pivot['faturamento'].reindex(columns=meses).fillna(0.0).astype(float),
+                'unidades': pivot['unidades'].reindex(columns=meses).fillna(0.0).astype(float),
+                'inicio': pd.Series(presenca.argmax(axis=1), index=pivot.index),
+                'fim': pd.Series(presenca.shape[1] - 1 - presenca[:, ::-1].argmax(axis=1), index=pivot.index)
+            }
+
+        caches[chave] = grade
+        return grade
+
+    def get_prefixos_mensais(self, categoria: str) -> Dict:
+        """
+        Somas acumuladas (prefixos) de faturamento e unidades de cada subcategoria ao longo do eixo
+        de meses da grade mensal, com uma coluna inicial de zeros: a soma dos meses [i, j) é
+        prefixo[:, j] - prefixo[:, i]. Construídas uma vez por versão dos dados.
+        """
+        caches = self._cache()
+        chave = ('prefixos_mensais', categoria)
+        if chave in caches:
+            return caches[chave]
+
+        grade = self.get_grade_mensal(categoria)
+        zeros = np.zeros((len(grade['faturamento'].index), 1))
+        prefixos = {
+            'subcategorias': grade['faturamento'].index,
+            'meses': pd.DatetimeIndex(grade['faturamento'].columns),
+            'faturamento': np.hstack([zeros, np.cumsum(grade['faturamento'].to_numpy(), axis=1)]),
+            'unidades': np.hstack([zeros, np.cumsum(grade['unidades'].to_numpy(), axis=1)])
+        }
+        caches[chave] = prefixos
+        return prefixos
+
+    def consolidar_janela(self, categoria: str = None, inicio=None, fim=None, ultimos_meses: int = None) -> List[Dict]:
+        """
+        Consolida faturamento, unidades e ticket das subcategorias em uma janela de meses
+        [inicio, fim] (inclusive) ou nos últimos N meses de cada categoria. Sem janela, considera
+        todos os meses. Cada consulta custa O(1) por subcategoria (diferença de prefixos).
+        Registros sem período não entram nas janelas (ver get_subcategorias_consolidadas).
+        """
+        categorias_para_processar = [categoria] if categoria else list(self.mercado_subcategorias.keys())
+        consolidado = []
+
+        for cat in categorias_para_processar:
+            prefixos = self.get_prefixos_mensais(cat)
+            meses = prefixos['meses']
+            if meses.empty:
+                continue
+
+            if ultimos_meses:
+                ini_mes, fim_mes = meses[-1] - pd.DateOffset(months=int(ultimos_meses) - 1), meses[-1]
+            else:
+                ini_mes = pd.Timestamp(inicio).to_period('M').to_timestamp() if inicio is not None else meses[0]
+                fim_mes = pd.Timestamp(fim).to_period('M').to_timestamp() if fim is not None else meses[-1]
+            i, j = meses.searchsorted(ini_mes, 'left'), meses.searchsorted(fim_mes, 'right')
+            if j <= i:
+                continue
+
+            faturamento = prefixos['faturamento'][:, j] - prefixos['faturamento'][:, i]
+            unidades = prefixos['unidades'][:, j] - prefixos['unidades'][:, i]
+            ticket = np.divide(faturamento, unidades, out=np.zeros_like(faturamento), where=unidades > 0)
+            rotulo_inicio, rotulo_fim = meses[i].strftime('%Y-%m'), meses[j - 1].strftime('%Y-%m')
+            for sub, fat, uni, tkt in zip(prefixos['subcategorias'], faturamento, unidades, ticket):
+                if fat == 0 and uni == 0:
+                    continue
+                consolidado.append({
+                    'categoria': cat,
+                    'subcategoria': sub,
+                    'faturamento': float(fat),
+                    'unidades': int(round(uni)),
+                    'ticket_medio': float(tkt),
+                    'inicio': rotulo_inicio,
+                    'fim': rotulo_fim,
+                    'meses': int(j - i)
+                })
+        return consolidado
+
+    def get_evolucao_subcategoria(self, categoria: str, subcategoria: str) -> pd.DataFrame:
+        """Série mensal contínua de uma subcategoria (fatia de linha da grade mensal, sem merge)"""
+        grade = self.get_grade_mensal(categoria)
+        if subcategoria not in grade['faturamento'].index:
+            return pd.DataFrame(columns=['periodo_dt', 'periodo_label', 'faturamento', 'unidades'])
+
+        inicio, fim = int(grade['inicio'][subcategoria]), int(grade['fim'][subcategoria]) + 1
+        meses = grade['faturamento'].columns[inicio:fim]
+        return pd.DataFrame({
+            'periodo_dt': meses,
+            'periodo_label': meses.strftime('%b %Y'),
+            'faturamento': grade['faturamento'].loc[subcategoria].to_numpy()[inicio:fim],
+            'unidades': grade['unidades'].loc[subcategoria].to_numpy()[inicio:fim]
+        })
+
     def calcular_fit_ticket(self, ticket_mercado: float) -> Tuple[str, str]:
         """Calcula fit do ticket cliente vs mercado"""
         ticket_cliente = self.cliente_data.get('ticket_custom') or self.cliente_data.get('ticket_medio', 0)
@@ -129,8 +441,8 @@ class MarketAnalyzer:
         motivos = []
         
         # 1. Histórico de Mercado
-        historico = self.mercado_categoria.get(categoria, [])
-        if len(historico) < 3:
+        meses_historico = len(self.get_cubo().detalhar(categoria, fonte='categoria'))
+        if meses_historico < 3:
             score -= 30
             motivos.append("Pouco histórico de mercado (menos de 3 meses)")
         
@@ -288,14 +600,11 @@ class MarketAnalyzer:
 
     def calcular_tendencia(self, categoria: str, subcategoria: str = None) -> Dict:
         """Calcula tendência de crescimento baseada no histórico da categoria ou subcategoria"""
+        # Série mensal (um ponto por mês com dados, em ordem cronológica) lida do cubo
         if subcategoria:
-            # Filtrar dados mensais apenas da subcategoria específica dentro da categoria macro
-            if categoria in self.mercado_subcategorias:
-                historico = [item for item in self.mercado_subcategorias[categoria] if item['subcategoria'] == subcategoria]
-            else:
-                historico = []
+            historico = self.get_cubo().detalhar(categoria, subcategoria)
         else:
-            historico = self.mercado_categoria.get(categoria, [])
+            historico = self.get_cubo().detalhar(categoria, fonte='categoria')
             
         if len(historico) < 2:
             return {
@@ -306,11 +615,7 @@ class MarketAnalyzer:
                 "confianca": 0.5
             }
             
-        df = pd.DataFrame(historico)
-        # Garantir ordenação cronológica para o cálculo da tendência
-        df['periodo_dt'] = pd.to_datetime(df['periodo'], errors='coerce')
-        df = df.dropna(subset=['periodo_dt']).sort_values('periodo_dt')
-        
+        df = historico.copy()
         df['faturamento'] = df['faturamento'].astype(float)
         
         # Cálculo de crescimento médio mensal
@@ -437,21 +742,206 @@ class MarketAnalyzer:
         self.cliente_data = {}
         self.mercado_categoria = {}
         self.mercado_subcategorias = {}
+        self._indice_periodos = {}
+        self._totais_categoria = {}
+        self._totais_subcategoria = {}
+        self._totais_mercado = {'faturamento': 0.0, 'unidades': 0}
+        self._registros_subcategoria = {}
+        self.periodos_duplicados = []
+        self._invalidar_caches()
+
+    def editar_mercado_subcategoria(self, categoria: str, sub_antiga: str, sub_nova: str, faturamento: float = None,
+                                    unidades: int = None, periodo: str = None):
+        """
+        Edita uma subcategoria (renomeia e, se informado, redistribui os novos totais entre os meses
+        na proporção atual). Com `periodo`, altera apenas o registro daquele mês, com os valores
+        informados. Altera os registros no lugar pelo índice da subcategoria e ajusta os totais
+        pela diferença: O(registros da subcategoria). Lotes usam aplicar_alteracoes.
+        """
+        if not hasattr(self, '_registros_subcategoria'):
+            self.reconstruir_indices()
+        por_sub = self._registros_subcategoria.get(categoria, {})
+        registros = por_sub.get(sub_antiga)
+        if registros and periodo is not None:
+            alvo = self.normalizar_periodo(periodo)
+            registros = [r for r in registros if self.normalizar_periodo(r['periodo']) == alvo]
+        if not registros:
+            return
+
+        for registro in registros:
+            self._somar_totais_subcategoria(categoria, registro, -1)
+        for campo, novo in (('faturamento', faturamento), ('unidades', unidades)):
+            if novo is None or pd.isna(novo):
+                continue
+            atual = sum(r[campo] for r in registros)
+            for registro in registros:
+                parte = registro[campo] / atual if atual > 0 else 1 / len(registros)
+                registro[campo] = float(novo) * parte if campo == 'faturamento' else int(round(float(novo) * parte))
+        for registro in registros:
+            registro['ticket_medio'] = registro['faturamento'] / registro['unidades'] if registro['unidades'] > 0 else 0
+
+        if sub_nova is not None and str(sub_nova).strip() != '' and sub_nova != sub_antiga:
+            movidos = {id(r) for r in registros}
+            restantes = [r for r in por_sub[sub_antiga] if id(r) not in movidos]
+            if restantes:
+                por_sub[sub_antiga] = restantes
+            else:
+                del por_sub[sub_antiga]
+            for registro in registros:
+                registro['subcategoria'] = sub_nova
+            por_sub.setdefault(sub_nova, []).extend(registros)
+        for registro in registros:
+            self._somar_totais_subcategoria(categoria, registro)
+        self._invalidar_caches()
 
-    def editar_mercado_subcategoria(self, categoria: str, sub_antiga: str, sub_nova: str, faturamento: float, unidades: int):
-        """Edita uma subcategoria (atualiza todos os registros mensais dela)"""
-        if categoria in self.mercado_subcategorias:
-            for item in self.mercado_subcategorias[categoria]:
-                if item['subcategoria'] == sub_antiga:
-                    item['subcategoria'] = sub_nova
-                    # Nota: A edição manual via interface substitui o valor total, 
-                    # o que pode ser complexo com dados mensais. 
-                    # Por simplicidade, mantemos a lógica de atualização do nome.
-            
     def remover_mercado_subcategoria(self, categoria: str, subcategoria: str):
-        """Remove todos os registros de uma subcategoria"""
-        if categoria in self.mercado_subcategorias:
-            self.mercado_subcategorias[categoria] = [
-                item for item in self.mercado_subcategorias[categoria] 
-                if item['subcategoria'] != subcategoria
-            ]
+        """
+        Remove todos os registros de uma subcategoria: os totais e o índice saem em O(1) e a lista
+        da categoria é compactada no lugar, sem reconstrução via DataFrame.
+        """
+        if not hasattr(self, '_registros_subcategoria'):
+            self.reconstruir_indices()
+        por_sub = self._registros_subcategoria.get(categoria, {})
+        registros = por_sub.pop(subcategoria, None)
+        if not registros:
+            return
+        self._totais_subcategoria.get(categoria, {}).pop(subcategoria, None)
+        removidos = {id(r) for r in registros}
+        lista = self.mercado_subcategorias[categoria]
+        lista[:] = [r for r in lista if id(r) not in removidos]
+        if not por_sub:
+            self._registros_subcategoria.pop(categoria, None)
+            self._totais_subcategoria.pop(categoria, None)
+        self._invalidar_caches()
+
+    def aplicar_alteracoes(self, alteracoes) -> Dict:
+        """
+        Aplica um lote de alterações e invalida os caches uma única vez.
+        Aceita uma lista de dicts ou um DataFrame com as colunas 'acao' ('inserir', 'atualizar',
+        'renomear', 'remover'), 'nivel' ('categoria' ou 'subcategoria'), 'categoria' e, conforme o caso,
+        'subcategoria', 'periodo', 'novo_nome', 'novo_periodo', 'faturamento' e 'unidades'.
+        Valores ausentes (None/NaN) em 'faturamento' e 'unidades' mantêm os atuais. Em subcategorias,
+        'atualizar' com 'periodo' altera só o registro (subcategoria, período) com os valores do mês;
+        sem 'periodo', redistribui os novos totais entre os meses da subcategoria.
+        Cada categoria afetada é processada em uma única operação vetorizada, na ordem:
+        atualizações/renomeações, remoções e, por fim, inserções.
+        """
+        contagem = {'inserir': 0, 'atualizar': 0, 'renomear': 0, 'remover': 0}
+        df_alt = alteracoes if isinstance(alteracoes, pd.DataFrame) else pd.DataFrame(list(alteracoes))
+        if df_alt.empty or 'acao' not in df_alt.columns:
+            return contagem
+
+        df_alt = df_alt.reindex(columns=self.COLUNAS_ALTERACAO)
+        df_alt['nivel'] = df_alt['nivel'].fillna('subcategoria')
+        df_alt = df_alt[df_alt['acao'].isin(list(contagem)) & df_alt['categoria'].notna()].copy()
+        if df_alt.empty:
+            return contagem
+        contagem.update(df_alt['acao'].value_counts().to_dict())
+        df_alt['faturamento'] = pd.to_numeric(df_alt['faturamento'], errors='coerce')
+        df_alt['unidades'] = pd.to_numeric(df_alt['unidades'], errors='coerce')
+
+        # Períodos das categorias macro seguem a mesma normalização do índice (uma vez por valor distinto)
+        eh_categoria = df_alt['nivel'] == 'categoria'
+        for col in ('periodo', 'novo_periodo'):
+            valores = df_alt.loc[eh_categoria, col]
+            normalizados = {v: self.normalizar_periodo(v) for v in valores.dropna().unique()}
+            df_alt.loc[eh_categoria, col] = valores.map(normalizados)
+
+        for nivel, armazenamento in (('categoria', self.mercado_categoria), ('subcategoria', self.mercado_subcategorias)):
+            colunas = self.COLUNAS_NIVEL[nivel][0]
+            for cat, alts_cat in df_alt[df_alt['nivel'] == nivel].groupby('categoria', sort=False):
+                df = pd.DataFrame(armazenamento.get(cat, []), columns=colunas)
+                df = self._aplicar_alteracoes_df(df, alts_cat, nivel)
+                df['periodo'] = df['periodo'].astype(object).where(df['periodo'].notna(), None)
+                armazenamento[cat] = df[colunas].to_dict('records')
+            if nivel == 'categoria':
+                self.reconstruir_indices(list(df_alt.loc[eh_categoria, 'categoria'].unique()))
+            else:
+                self._reconstruir_totais_subcategoria(list(df_alt.loc[~eh_categoria, 'categoria'].unique()))
+
+        self._invalidar_caches()
+        return {acao: int(qtd) for acao, qtd in contagem.items()}
+
+    def _atualizar_meses_subcategoria(self, df: pd.DataFrame, alts: pd.DataFrame) -> pd.DataFrame:
+        """Aplica atualizações por (subcategoria, período) com os valores do mês, sem redistribuir"""
+        if df.empty:
+            return df
+        periodos = pd.concat([df['periodo'].dropna(), alts['periodo']]).unique()
+        normalizados = {per: self.normalizar_periodo(per) for per in periodos}
+        chaves = pd.MultiIndex.from_arrays([df['subcategoria'], df['periodo'].map(normalizados)])
+        alts = (alts.assign(periodo=alts['periodo'].map(normalizados))
+                .drop_duplicates(['subcategoria', 'periodo'], keep='last').set_index(['subcategoria', 'periodo']))
+        for campo in ('faturamento', 'unidades'):
+            novos = alts[campo].reindex(chaves).to_numpy()
+            definidos = pd.notna(novos)
+            df.loc[definidos, campo] = novos[definidos].astype(float)
+        renomes = alts['novo_nome'].reindex(chaves)
+        validos = (renomes.notna() & (renomes.astype(str).str.strip() != '')).to_numpy()
+        df.loc[validos, 'subcategoria'] = renomes.to_numpy()[validos]
+        return df
+
+    def _aplicar_alteracoes_df(self, df: pd.DataFrame, alts: pd.DataFrame, nivel: str) -> pd.DataFrame:
+        """Aplica as alterações de uma categoria sobre o DataFrame de registros (vetorizado)"""
+        colunas, chave, nova_chave = self.COLUNAS_NIVEL[nivel]
+        df['faturamento'] = df['faturamento'].astype(float)
+        df['unidades'] = df['unidades'].astype(float)
+
+        # 1. Atualizações/renomeações (a última alteração de cada chave prevalece). Nas subcategorias,
+        # alterações com 'periodo' valem só para aquele mês; sem período, para a subcategoria inteira
+        upd = alts[alts['acao'].isin(['atualizar', 'renomear'])]
+        if nivel == 'subcategoria' and upd['periodo'].notna().any():
+            df = self._atualizar_meses_subcategoria(df, upd[upd['periodo'].notna()])
+            upd = upd[upd['periodo'].isna()]
+        upd = upd.drop_duplicates(chave, keep='last').set_index(chave)
+        if not upd.empty and not df.empty:
+            alvo = df[chave].isin(upd.index)
+            for campo in ('faturamento', 'unidades'):
+                novos = df.loc[alvo, chave].map(upd[campo])
+                definidos = novos.notna()
+                if not definidos.any():
+                    continue
+                idx = novos[definidos].index
+                if nivel == 'categoria':
+                    df.loc[idx, campo] = novos[definidos]
+                else:
+                    # Redistribui o novo total entre os meses, mantendo a proporção atual
+                    grupos = df.loc[idx, chave]
+                    atual = df.loc[idx, campo].astype(float).groupby(grupos).transform('sum')
+                    qtd = grupos.groupby(grupos).transform('size')
+                    parte = np.where(atual > 0, df.loc[idx, campo].astype(float) / atual.where(atual > 0, 1), 1 / qtd)
+                    novo = novos[definidos].values * parte
+                    df.loc[idx, campo] = novo if campo == 'faturamento' else np.round(novo)
+            renomes = upd[nova_chave].dropna()
+            renomes = renomes[renomes.astype(str).str.strip() != '']
+            if not renomes.empty:
+                df[chave] = df[chave].map(renomes).fillna(df[chave])
+
+        # 2. Remoções
+        rem = alts.loc[alts['acao'] == 'remover', chave]
+        if not rem.empty:
+            df = df[~df[chave].isin(rem)]
+
+        # 3. Inserções
+        ins = alts[alts['acao'] == 'inserir']
+        if not ins.empty:
+            df = pd.concat([df, ins[[c for c in colunas if c != 'ticket_medio']]], ignore_index=True) if not df.empty \
+                else ins[[c for c in colunas if c != 'ticket_medio']].reset_index(drop=True)
+
+        # Um único registro por período na série da categoria macro (o último prevalece)
+        if nivel == 'categoria':
+            duplicados = df['periodo'].duplicated(keep='last')
+            if duplicados.any():
+                self.periodos_duplicados.extend((alts['categoria'].iloc[0], per) for per in df.loc[duplicados, 'periodo'])
+                df = df[~duplicados]
+
+        df = df.reset_index(drop=True)
+        df['faturamento'] = pd.to_numeric(df['faturamento'], errors='coerce').fillna(0.0).astype(float)
+        df['unidades'] = pd.to_numeric(df['unidades'], errors='coerce').fillna(0).astype(int)
+        df['ticket_medio'] = np.where(df['unidades'] > 0, df['faturamento'] / df['unidades'].where(df['unidades'] > 0, 1), 0.0)
+        return df
+
+
+# Instrumentação opcional (MERCADO_INSTRUMENTACAO=1); métricas em utils.instrumentacao.snapshot()
+if os.environ.get('MERCADO_INSTRUMENTACAO', '').strip().lower() in ('1', 'true', 'sim'):
+    from utils import instrumentacao
+    instrumentacao.ativar(MarketAnalyzer)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cubo de mercado em memória (categoria × subcategoria × mês) com agregações pré-calculadas
+"""
+
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+DIMENSOES = {
+    'subcategoria': ('categoria', 'subcategoria', 'mes'),
+    'categoria': ('categoria', 'mes'),
+}
+
+
+class CuboMercado:
+    """
+    Cubo OLAP simples sobre os dados do MarketAnalyzer, com duas fontes de fatos:
+    - 'subcategoria': registros de Mercado_Subcategoria (categoria × subcategoria × mês)
+    - 'categoria': série macro de Mercado_Categoria (categoria × mês)
+    Medidas: faturamento, unidades e registros (quantidade de linhas de origem). Cada agregação
+    é calculada no primeiro acesso e guardada: consultas que fixam uma categoria agregam só os
+    registros dessa categoria, e os rollups do conjunto todo só são montados quando pedidos.
+    Registros sem período entram nos agregados que não usam o mês.
+    O cubo lê os dados do analyzer sob demanda e vale para a versão dos dados em que foi criado
+    (o MarketAnalyzer o descarta a cada alteração).
+    """
+
+    def __init__(self, mercado_subcategorias: Dict, mercado_categoria: Dict, normalizar_periodo: Callable):
+        self._normalizar_periodo = normalizar_periodo
+        self._fontes = {
+            'subcategoria': (mercado_subcategorias, ['subcategoria', 'periodo', 'faturamento', 'unidades']),
+            'categoria': (mercado_categoria, ['periodo', 'faturamento', 'unidades']),
+        }
+        # { (fonte, categoria ou None): fatos } e { (fonte, dims, categoria ou None): agregado }
+        self._fatos_cache = {}
+        self._agregados_cache = {}
+
+    def _fatos(self, fonte: str, categoria: str = None) -> pd.DataFrame:
+        """Tabela de fatos de uma fonte: de todas as categorias (None) ou de uma só"""
+        chave = (fonte, categoria)
+        if chave not in self._fatos_cache:
+            armazenamento, colunas = self._fontes[fonte]
+            if categoria is not None:
+                armazenamento = {categoria: armazenamento.get(categoria, [])}
+            self._fatos_cache[chave] = self._montar_fatos(armazenamento, colunas)
+        return self._fatos_cache[chave]
+
+    def _agregado(self, fonte: str, dims: tuple, categoria: str = None) -> pd.DataFrame:
+        """Agregado pelas dimensões `dims`, restrito a uma categoria quando informada (lazy)"""
+        chave = (fonte, dims, categoria)
+        if chave not in self._agregados_cache:
+            self._agregados_cache[chave] = self._agregar(self._fatos(fonte, categoria), list(dims))
+        return self._agregados_cache[chave]
+
+    def _montar_fatos(self, armazenamento: Dict, colunas: List[str]) -> pd.DataFrame:
+        """Empilha os registros das categorias em uma tabela de fatos com o mês normalizado"""
+        partes = [pd.DataFrame(registros, columns=colunas).assign(categoria=cat)
+                  for cat, registros in armazenamento.items() if registros]
+        if not partes:
+            return pd.DataFrame(columns=['categoria'] + colunas + ['mes'])
+        df = pd.concat(partes, ignore_index=True)
+        normalizados = {per: self._normalizar_periodo(per) for per in df['periodo'].dropna().unique()}
+        df['mes'] = pd.to_datetime(df['periodo'].map(normalizados), format='%Y-%m', errors='coerce')
+        df['faturamento'] = pd.to_numeric(df['faturamento'], errors='coerce').fillna(0.0)
+        df['unidades'] = pd.to_numeric(df['unidades'], errors='coerce').fillna(0)
+        return df
+
+    @staticmethod
+    def _agregar(df: pd.DataFrame, dims: List[str]) -> pd.DataFrame:
+        """Soma as medidas por um conjunto de dimensões (conjunto vazio = total geral)"""
+        if dims:
+            agregado = df.groupby(dims, sort=True).agg(
+                faturamento=('faturamento', 'sum'), unidades=('unidades', 'sum'), registros=('faturamento', 'size'))
+        else:
+            agregado = pd.DataFrame({'faturamento': [df['faturamento'].sum()], 'unidades': [df['unidades'].sum()],
+                                     'registros': [len(df)]})
+        agregado['unidades'] = agregado['unidades'].astype(int)
+        agregado['ticket_medio'] = np.where(agregado['unidades'] > 0,
+                                            agregado['faturamento'] / agregado['unidades'].where(agregado['unidades'] > 0, 1), 0.0)
+        return agregado
+
+    def _dimensoes(self, fonte: str, coordenadas: Dict) -> tuple:
+        """Ordena as dimensões informadas conforme a hierarquia da fonte"""
+        desconhecidas = set(coordenadas) - set(DIMENSOES[fonte])
+        if desconhecidas:
+            raise ValueError(f"Dimensões inválidas para a fonte '{fonte}': {sorted(desconhecidas)}")
+        return tuple(d for d in DIMENSOES[fonte] if d in coordenadas)
+
+    def _mes(self, valor) -> pd.Timestamp:
+        return pd.Timestamp(valor).to_period('M').to_timestamp()
+
+    def rollup(self, dimensoes=(), fonte: str = 'subcategoria') -> pd.DataFrame:
+        """Agregado do conjunto todo pelas dimensões informadas (ex.: ('categoria',), ('categoria', 'mes'))"""
+        return self._agregado(fonte, self._dimensoes(fonte, dict.fromkeys(dimensoes)))
+
+    def valor(self, fonte: str = 'subcategoria', **coordenadas) -> Dict:
+        """Medidas de uma célula do cubo, ex.: valor(categoria='X', mes='2024-01'); sem coordenadas, o total geral"""
+        dims = self._dimensoes(fonte, coordenadas)
+        if 'mes' in coordenadas:
+            coordenadas['mes'] = self._mes(coordenadas['mes'])
+        agregado = self._agregado(fonte, dims, coordenadas.get('categoria'))
+        chave = tuple(coordenadas[d] for d in dims)
+        chave = chave[0] if len(chave) == 1 else (chave or 0)
+        if chave not in agregado.index:
+            return {'faturamento': 0.0, 'unidades': 0, 'registros': 0, 'ticket_medio': 0.0}
+        linha = agregado.loc[chave]
+        return {'faturamento': float(linha['faturamento']), 'unidades': int(linha['unidades']),
+                'registros': int(linha['registros']), 'ticket_medio': float(linha['ticket_medio'])}
+
+    def fatia(self, fonte: str = 'subcategoria', **coordenadas) -> pd.DataFrame:
+        """Slice: células do nível mais detalhado com as dimensões informadas fixadas em um valor"""
+        self._dimensoes(fonte, coordenadas)
+        return self.recorte(fonte, **{d: [v] for d, v in coordenadas.items() if d != 'mes'},
+                            inicio=coordenadas.get('mes'), fim=coordenadas.get('mes'))
+
+    def recorte(self, fonte: str = 'subcategoria', categoria: List = None, subcategoria: List = None,
+                inicio=None, fim=None) -> pd.DataFrame:
+        """Dice: células do nível mais detalhado restritas a conjuntos de membros e a um intervalo de meses"""
+        if categoria is not None:
+            # Só as categorias pedidas são agregadas (e guardadas) no nível mais detalhado
+            partes = [self._agregado(fonte, DIMENSOES[fonte], cat).reset_index() for cat in dict.fromkeys(categoria)]
+            df = pd.concat(partes, ignore_index=True) if partes else self._agregado(fonte, DIMENSOES[fonte]).reset_index().iloc[0:0]
+        else:
+            df = self._agregado(fonte, DIMENSOES[fonte]).reset_index()
+        filtro = pd.Series(True, index=df.index)
+        if subcategoria is not None:
+            filtro &= df['subcategoria'].isin(subcategoria)
+        if inicio is not None:
+            filtro &= df['mes'] >= self._mes(inicio)
+        if fim is not None:
+            filtro &= df['mes'] <= self._mes(fim)
+        return df[filtro].reset_index(drop=True)
+
+    def detalhar(self, categoria: str = None, subcategoria: str = None, fonte: str = 'subcategoria') -> pd.DataFrame:
+        """
+        Drill-down um nível abaixo do membro informado: sem membro → categorias;
+        categoria → subcategorias (ou meses, na fonte 'categoria'); subcategoria → meses.
+        """
+        coordenadas = {d: v for d, v in (('categoria', categoria), ('subcategoria', subcategoria)) if v is not None}
+        dims = self._dimensoes(fonte, coordenadas)
+        proximo = next(d for d in DIMENSOES[fonte] if d not in dims)
+        agregado = self._agregado(fonte, self._dimensoes(fonte, dict.fromkeys(dims + (proximo,))), categoria).reset_index()
+        for d, v in coordenadas.items():
+            agregado = agregado[agregado[d] == v]
+        return agregado.drop(columns=list(dims)).reset_index(drop=True)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistência opcional dos dados de mercado em SQLite (módulo sqlite3 da biblioteca padrão)
+"""
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+from utils.market_analyzer import MarketAnalyzer
+
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS clientes (
+    cliente TEXT PRIMARY KEY,
+    dados TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mercado_categoria (
+    cliente TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    faturamento REAL NOT NULL,
+    unidades INTEGER NOT NULL,
+    PRIMARY KEY (cliente, categoria, periodo)
+);
+CREATE TABLE IF NOT EXISTS mercado_subcategoria (
+    cliente TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    subcategoria TEXT NOT NULL,
+    periodo TEXT,
+    faturamento REAL NOT NULL,
+    unidades INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subcategoria_chave
+    ON mercado_subcategoria (cliente, categoria, subcategoria, periodo);
+"""
+
+
+class ArmazemMercado:
+    """
+    Base SQLite (modo WAL) com perfis de clientes e séries de mercado por categoria e subcategoria.
+    As cargas usam executemany em uma única transação; as consolidações rodam como agregações SQL
+    e o analyzer pode ser carregado apenas com as categorias necessárias.
+
+    Pode ser compartilhada entre threads (ex.: sessões do Streamlit via st.cache_resource): cada
+    operação abre e fecha a sua própria conexão, então as transações de uma sessão não se misturam
+    com as de outra e nenhuma conexão fica presa a threads que já terminaram (o Streamlit usa uma
+    thread nova a cada rerun). O WAL permite leituras concorrentes e o SQLite serializa as escritas.
+    """
+
+    def __init__(self, caminho: str = "mercado.db"):
+        self.caminho = caminho
+        with self._conexao() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(ESQUEMA)
+
+    @contextmanager
+    def _conexao(self):
+        """Conexão de uma operação, fechada ao sair do bloco"""
+        conn = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def fechar(self):
+        """Mantido por compatibilidade: as conexões já são fechadas ao fim de cada operação"""
+
+    # --- Escrita ---
+
+    def salvar_analyzer(self, analyzer: MarketAnalyzer, cliente: str = None) -> str:
+        """Grava (substituindo) o perfil e os dados de mercado de um cliente; retorna a chave usada"""
+        cliente = cliente or analyzer.cliente_data.get('empresa') or 'Cliente'
+        periodos = {}
+
+        def periodo_normalizado(periodo):
+            if periodo not in periodos:
+                periodos[periodo] = analyzer.normalizar_periodo(periodo)
+            return periodos[periodo]
+
+        linhas_cat = [(cliente, cat, periodo_normalizado(r['periodo']), float(r['faturamento']), int(r['unidades']))
+                      for cat, registros in analyzer.mercado_categoria.items() for r in registros]
+        linhas_sub = [(cliente, cat, r['subcategoria'], periodo_normalizado(r['periodo']), float(r['faturamento']), int(r['unidades']))
+                      for cat, registros in analyzer.mercado_subcategorias.items() for r in registros]
+
+        with self._conexao() as conn, conn:
+            for tabela in ('clientes', 'mercado_categoria', 'mercado_subcategoria'):
+                conn.execute(f"DELETE FROM {tabela} WHERE cliente = ?", (cliente,))
+            conn.execute("INSERT INTO clientes (cliente, dados, atualizado_em) VALUES (?, ?, ?)",
+                         (cliente, json.dumps(analyzer.cliente_data, default=float), datetime.now().isoformat(timespec='seconds')))
+            conn.executemany("INSERT OR REPLACE INTO mercado_categoria VALUES (?, ?, ?, ?, ?)", linhas_cat)
+            conn.executemany("INSERT INTO mercado_subcategoria VALUES (?, ?, ?, ?, ?, ?)", linhas_sub)
+        return cliente
+
+    def remover_cliente(self, cliente: str):
+        with self._conexao() as conn, conn:
+            for tabela in ('clientes', 'mercado_categoria', 'mercado_subcategoria'):
+                conn.execute(f"DELETE FROM {tabela} WHERE cliente = ?", (cliente,))
+
+    # --- Leitura ---
+
+    def listar_clientes(self) -> List[Dict]:
+        """Clientes gravados, do mais recente para o mais antigo"""
+        with self._conexao() as conn:
+            cursor = conn.execute("SELECT cliente, atualizado_em FROM clientes ORDER BY atualizado_em DESC")
+            return [{'cliente': cliente, 'atualizado_em': atualizado_em} for cliente, atualizado_em in cursor]
+
+    def listar_categorias(self, cliente: str) -> List[str]:
+        with self._conexao() as conn:
+            cursor = conn.execute(
+                "SELECT categoria FROM mercado_categoria WHERE cliente = ? "
+                "UNION SELECT categoria FROM mercado_subcategoria WHERE cliente = ? ORDER BY categoria", (cliente, cliente))
+            return [linha[0] for linha in cursor]
+
+    def carregar_analyzer(self, cliente: str, categorias: List[str] = None) -> MarketAnalyzer:
+        """
+        Reconstrói um MarketAnalyzer a partir da base. Com `categorias`, carrega apenas as
+        séries dessas categorias (carga sob demanda para bases maiores que a memória da sessão).
+        """
+        filtro, parametros = self._filtro_categorias(cliente, categorias)
+        with self._conexao() as conn:
+            linha = conn.execute("SELECT dados FROM clientes WHERE cliente = ?", (cliente,)).fetchone()
+            if linha is None:
+                raise KeyError(f"Cliente '{cliente}' não encontrado na base")
+            df_cat = pd.read_sql_query(
+                f"SELECT categoria, periodo, faturamento, unidades FROM mercado_categoria WHERE {filtro}", conn, params=parametros)
+            df_sub = pd.read_sql_query(
+                f"SELECT categoria, subcategoria, periodo, faturamento, unidades FROM mercado_subcategoria WHERE {filtro} ORDER BY rowid",
+                conn, params=parametros)
+
+        analyzer = MarketAnalyzer()
+        analyzer.cliente_data = json.loads(linha[0])
+        analyzer.aplicar_alteracoes(pd.concat([
+            df_cat.assign(acao='inserir', nivel='categoria'),
+            df_sub.assign(acao='inserir', nivel='subcategoria')
+        ], ignore_index=True))
+        return analyzer
+
+    def consolidar_subcategorias(self, cliente: str, categoria: str = None, inicio: str = None, fim: str = None) -> List[Dict]:
+        """
+        Totais por subcategoria calculados no SQLite (mesmo formato de get_subcategorias_consolidadas),
+        opcionalmente restritos ao intervalo de períodos 'AAAA-MM' [inicio, fim].
+        """
+        filtro, parametros = self._filtro_categorias(cliente, [categoria] if categoria else None)
+        if inicio:
+            filtro += " AND periodo >= ?"
+            parametros.append(inicio)
+        if fim:
+            filtro += " AND periodo <= ?"
+            parametros.append(fim)
+        with self._conexao() as conn:
+            linhas = conn.execute(
+                "SELECT categoria, subcategoria, SUM(faturamento), SUM(unidades) FROM mercado_subcategoria "
+                f"WHERE {filtro} GROUP BY categoria, subcategoria ORDER BY categoria, subcategoria", parametros).fetchall()
+        return [{
+            'categoria': cat,
+            'subcategoria': sub,
+            'faturamento_6m': faturamento,
+            'unidades_6m': unidades,
+            'ticket_medio': faturamento / unidades if unidades > 0 else 0
+        } for cat, sub, faturamento, unidades in linhas]
+
+    def totais_categorias(self, cliente: str) -> List[Dict]:
+        """Faturamento, unidades, ticket e nº de períodos de cada categoria macro (agregação SQL)"""
+        with self._conexao() as conn:
+            linhas = conn.execute(
+                "SELECT categoria, SUM(faturamento), SUM(unidades), COUNT(*) FROM mercado_categoria "
+                "WHERE cliente = ? GROUP BY categoria ORDER BY categoria", (cliente,)).fetchall()
+        return [{
+            'categoria': cat,
+            'faturamento': faturamento,
+            'unidades': unidades,
+            'ticket_medio': faturamento / unidades if unidades > 0 else 0,
+            'periodos': periodos
+        } for cat, faturamento, unidades, periodos in linhas]
+
+    @staticmethod
+    def _filtro_categorias(cliente: str, categorias: List[str] = None):
+        filtro, parametros = "cliente = ?", [cliente]
+        if categorias:
+            filtro += f" AND categoria IN ({', '.join('?' * len(categorias))})"
+            parametros.extend(categorias)
+        return filtro, parametros
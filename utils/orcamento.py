@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Alocação do orçamento de marketing do cliente entre subcategorias (usa CAC e investimento_mkt)
+"""
+
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.market_analyzer import MarketAnalyzer
+from utils.portfolio import analisar_portfolio
+
+
+COLUNAS_ALOCACAO = ['Categoria Macro', 'Subcategoria', 'Score', 'Mercado (R$)', 'Investimento',
+                    'Clientes Estimados', 'Receita Incremental', 'Lucro Incremental', 'ROI (%)']
+
+
+def _limites(valor: Union[float, Dict, None], subcategorias: pd.Series, padrao: float) -> np.ndarray:
+    """Converte um limite único ou um dict {subcategoria: valor} em um vetor por subcategoria"""
+    if isinstance(valor, dict):
+        return subcategorias.map(valor).fillna(padrao).to_numpy(dtype=float)
+    return np.full(len(subcategorias), padrao if valor is None else float(valor))
+
+
+def alocar_orcamento_marketing(analyzer: MarketAnalyzer, orcamento: float = None, categoria: str = None,
+                               minimo: Union[float, Dict] = 0.0, maximo: Union[float, Dict] = None,
+                               share_maximo: float = 0.01, usar_orcamento_total: bool = False,
+                               iteracoes: int = 60) -> Dict:
+    """
+    Distribui até o orçamento (padrão: investimento_mkt do cliente) entre as subcategorias para
+    maximizar o lucro projetado, respeitando mínimos/máximos por subcategoria. O orçamento é um
+    teto: só se investe enquanto R$ 1 adicional retorna ao menos R$ 1 e a sobra fica em
+    'nao_alocado'.
+
+    Modelo por subcategoria i, com investimento b:
+    - cada R$ compra 1/CAC clientes, que gastam o ticket do cliente, com eficiência = score;
+    - a receita satura no teto share_maximo × mercado (retornos decrescentes):
+      receita(b) = teto × (1 − exp(−k·b / teto)), com k = ticket × score / CAC;
+    - lucro(b) = margem × receita(b) − b.
+    O ótimo (condições KKT) iguala o retorno marginal μ = margem × receita'(b) de todas as
+    subcategorias: b_i(μ) = teto/k · ln(margem·k / μ), limitado a [mínimo, máximo], com μ ≥ 1
+    achado por bisseção vetorizada (em ln μ) quando o orçamento não cobre todo o investimento
+    lucrativo. Com usar_orcamento_total=True o orçamento inteiro é gasto mesmo com μ < 1 (lucro
+    marginal negativo), para quando a verba já está comprometida.
+    """
+    cliente = analyzer.cliente_data
+    cac = float(cliente.get('cac') or 0)
+    orcamento = float(cliente.get('investimento_mkt') or 0) if orcamento is None else float(orcamento)
+    margem = float(cliente.get('margem') or 0)
+    resultado = {'alocacao': pd.DataFrame(columns=COLUNAS_ALOCACAO), 'orcamento': orcamento, 'alocado': 0.0,
+                 'nao_alocado': orcamento, 'receita': 0.0, 'lucro': 0.0, 'roi': 0.0, 'motivo': None}
+
+    if cac <= 0:
+        resultado['motivo'] = "Informe o CAC do cliente para alocar o orçamento."
+        return resultado
+    if orcamento <= 0:
+        resultado['motivo'] = "Informe o investimento em marketing (orçamento) do cliente."
+        return resultado
+    if margem <= 0:
+        resultado['motivo'] = "Informe a margem do cliente: sem margem nenhum investimento gera lucro."
+        return resultado
+
+    portfolio = analisar_portfolio(analyzer, [{**cliente, 'cliente': 'cliente'}], top_k=1, categoria=categoria)
+    scores = portfolio['score']
+    if scores.empty or scores.shape[1] == 0:
+        resultado['motivo'] = "Nenhuma subcategoria cadastrada."
+        return resultado
+
+    subcats = pd.DataFrame(analyzer.get_subcategorias_consolidadas(categoria))
+    score = scores.iloc[0].to_numpy(dtype=float)
+    ticket_cliente = cliente.get('ticket_custom') or cliente.get('ticket_medio') or 0
+    ticket = np.where(ticket_cliente > 0, ticket_cliente, subcats['ticket_medio'].to_numpy(dtype=float))
+    teto = subcats['faturamento_6m'].to_numpy(dtype=float) * share_maximo
+    k = ticket * score / cac
+    ativo = (k > 0) & (teto > 0)
+    if not ativo.any():
+        resultado['motivo'] = "Nenhuma subcategoria com retorno projetado (score, ticket ou mercado zerados)."
+        return resultado
+
+    inferior = np.minimum(_limites(minimo, subcats['subcategoria'], 0.0), orcamento)
+    superior = np.maximum(_limites(maximo, subcats['subcategoria'], np.inf), inferior)
+    if inferior.sum() > orcamento:
+        resultado['motivo'] = "A soma dos investimentos mínimos ultrapassa o orçamento."
+        return resultado
+
+    k_seguro = np.where(ativo, k, 1.0)
+    escala = np.where(ativo, teto / k_seguro, 0.0)
+    log_ganho = np.log(np.where(ativo, margem * k_seguro, 1.0))
+
+    def investimento(log_mu):
+        return np.clip(escala * np.maximum(log_ganho - log_mu, 0.0), inferior, superior)
+
+    # A soma investida decresce com μ: bisseção em ln μ dentro de [mínimo, máximo] possíveis
+    baixo = 0.0 if not usar_orcamento_total else float(log_ganho.min()) - np.log(orcamento + 1) - 50
+    alto = max(float(log_ganho.max()), baixo) + 1
+    if investimento(baixo).sum() <= orcamento:
+        alocacao = investimento(baixo)
+    else:
+        for _ in range(iteracoes):
+            meio = (baixo + alto) / 2
+            if investimento(meio).sum() > orcamento:
+                baixo = meio
+            else:
+                alto = meio
+        alocacao = investimento(alto)
+
+    receita = np.where(ativo, teto * (1 - np.exp(-k_seguro * alocacao / np.where(ativo, teto, 1.0))), 0.0)
+    lucro = margem * receita - alocacao
+    df = pd.DataFrame({
+        'Categoria Macro': subcats['categoria'],
+        'Subcategoria': subcats['subcategoria'],
+        'Score': score,
+        'Mercado (R$)': subcats['faturamento_6m'].to_numpy(dtype=float),
+        'Investimento': alocacao,
+        'Clientes Estimados': np.divide(receita, ticket, out=np.zeros_like(receita), where=ticket > 0),
+        'Receita Incremental': receita,
+        'Lucro Incremental': lucro,
+        'ROI (%)': np.divide(lucro, alocacao, out=np.zeros_like(lucro), where=alocacao > 0) * 100
+    }).sort_values('Investimento', ascending=False, ignore_index=True)
+
+    alocado = float(alocacao.sum())
+    resultado.update({
+        'alocacao': df,
+        'alocado': alocado,
+        'nao_alocado': orcamento - alocado,
+        'receita': float(receita.sum()),
+        'lucro': float(lucro.sum()),
+        'roi': float(lucro.sum() / alocado * 100) if alocado > 0 else 0.0
+    })
+    return resultado
@@ -1,5 +1,6 @@
 from fpdf import FPDF # fpdf2
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 class PDFReportGenerator(FPDF):
@@ -83,6 +84,85 @@ class PDFReportGenerator(FPDF):
         self.set_text_color(self.primary_color[0], self.primary_color[1], self.primary_color[2])
         self.cell(w-4, 7, self.clean_text(value), 0, 1, "L")
 
+    def draw_table_header(self, colunas, header_color, altura=8):
+        """Desenha o cabeçalho de uma tabela (repetido a cada quebra de página)"""
+        self.set_fill_color(header_color[0], header_color[1], header_color[2])
+        self.set_text_color(255, 255, 255)
+        self.set_font("Helvetica", "B", 9)
+        for i, col in enumerate(colunas):
+            ultima = i == len(colunas) - 1
+            self.cell(col['largura'], altura, self.clean_text(col['titulo']), 0, 1 if ultima else 0, col.get('alinhamento', 'C'), True)
+        self.set_text_color(self.text_color[0], self.text_color[1], self.text_color[2])
+        self.set_font("Helvetica", "", 8)
+
+    def draw_table(self, df, colunas, header_color=None, top_n=None, max_rows=None,
+                   outros_label="Outros", row_height=7):
+        """
+        Renderiza uma tabela a partir de um DataFrame.
+
+        As colunas são pré-formatadas de forma vetorizada (uma vez por coluna) e as
+        linhas são percorridas como tuplas, sem criar um dict por linha.
+        - top_n: mantém as N primeiras linhas e agrega o restante em uma linha "Outros"
+          (colunas com 'agregacao' = 'sum' ou 'mean'; as demais ficam em branco).
+        - max_rows: limite rígido de linhas exibidas; o excedente é apenas informado.
+        - Quebras de página são feitas automaticamente, repetindo o cabeçalho.
+
+        Cada coluna é um dict com: titulo, campo, largura, alinhamento ('L'/'C'/'R'),
+        formato ('texto', 'moeda', 'decimal', 'percentual'), limite (caracteres),
+        agregacao ('sum'/'mean') e cores ({valor: (r, g, b)}) para colorir o texto.
+        """
+        if not header_color: header_color = self.primary_color
+        if df is None or df.empty: return
+
+        campos = [col['campo'] for col in colunas]
+        df_tab = df[campos]
+        n_outros = 0
+        if top_n is not None and len(df_tab) > top_n:
+            df_cauda = df_tab.iloc[top_n:]
+            n_outros = len(df_cauda)
+            linha_outros = {}
+            for col in colunas:
+                agregacao = col.get('agregacao')
+                if agregacao in ('sum', 'mean'):
+                    linha_outros[col['campo']] = getattr(pd.to_numeric(df_cauda[col['campo']], errors='coerce'), agregacao)()
+                else:
+                    linha_outros[col['campo']] = np.nan
+            linha_outros[campos[0]] = f"{outros_label} ({n_outros})"
+            df_tab = pd.concat([df_tab.iloc[:top_n], pd.DataFrame([linha_outros], columns=campos)], ignore_index=True)
+
+        omitidas = 0
+        if max_rows is not None and len(df_tab) > max_rows:
+            omitidas = len(df_tab) - max_rows
+            df_tab = df_tab.iloc[:max_rows]
+
+        # Pré-formatação vetorizada de cada coluna
+        textos = [self.format_column(df_tab[col['campo']], col) for col in colunas]
+        cores = [col.get('cores') for col in colunas]
+        brutos = [df_tab[col['campo']].to_numpy() if cores[i] else None for i, col in enumerate(colunas)]
+
+        if self.get_y() + 8 + row_height > self.page_break_trigger:
+            self.add_page()
+        self.draw_table_header(colunas, header_color)
+        ultima = len(colunas) - 1
+        fill = False
+        for idx, linha in enumerate(zip(*textos)):
+            if self.get_y() + row_height > self.page_break_trigger:
+                self.add_page()
+                self.draw_table_header(colunas, header_color)
+            self.set_fill_color(self.secondary_color[0], self.secondary_color[1], self.secondary_color[2])
+            for i, texto in enumerate(linha):
+                cor = cores[i].get(brutos[i][idx]) if cores[i] else None
+                if cor: self.set_text_color(cor[0], cor[1], cor[2])
+                self.cell(colunas[i]['largura'], row_height, texto, 0, 1 if i == ultima else 0, colunas[i].get('alinhamento', 'C'), fill)
+                if cor: self.set_text_color(self.text_color[0], self.text_color[1], self.text_color[2])
+            fill = not fill
+
+        if omitidas:
+            self.set_font("Helvetica", "I", 8)
+            self.set_text_color(self.light_text[0], self.light_text[1], self.light_text[2])
+            self.cell(0, 6, f"... e mais {omitidas} linhas não exibidas.", 0, 1, "L")
+            self.set_text_color(self.text_color[0], self.text_color[1], self.text_color[2])
+
     def add_summary(self):
         self.section_title("1. Visão Geral")
         empresa = self.cliente_data.get("empresa", "Empresa")
@@ -215,38 +295,24 @@ class PDFReportGenerator(FPDF):
         df_ranking = self.analyzer.gerar_ranking()
         if df_ranking.empty: return
 
+        colunas = [
+            {'titulo': " SUBCATEGORIA", 'campo': 'Subcategoria', 'largura': 80, 'alinhamento': 'L', 'formato': 'texto', 'limite': 40},
+            {'titulo': " MERCADO (6M)", 'campo': 'Mercado (R$)', 'largura': 40, 'alinhamento': 'C', 'formato': 'moeda', 'agregacao': 'sum'},
+            {'titulo': " SCORE", 'campo': 'Score', 'largura': 30, 'alinhamento': 'C', 'formato': 'decimal', 'agregacao': 'mean'},
+            {'titulo': " STATUS", 'campo': 'Status', 'largura': 40, 'alinhamento': 'C', 'formato': 'texto',
+             'cores': {"FOCO": (220, 38, 38), "OK": (5, 150, 105)}},
+        ]
+
         # 2.1. Melhores Oportunidades
         self.set_font("Helvetica", "B", 11)
         self.set_text_color(self.primary_color[0], self.primary_color[1], self.primary_color[2])
         self.cell(0, 8, "2.1. Melhores Oportunidades (Foco e OK)", 0, 1, "L")
         self.ln(2)
 
-        df_foco_ok = df_ranking[df_ranking["Status"].isin(["FOCO", "OK"])].sort_values(by="Score", ascending=False).head(5)
+        df_foco_ok = df_ranking[df_ranking["Status"].isin(["FOCO", "OK"])].sort_values(by="Score", ascending=False)
         
         if not df_foco_ok.empty:
-            # Cabeçalho da Tabela
-            self.set_fill_color(self.primary_color[0], self.primary_color[1], self.primary_color[2])
-            self.set_text_color(255, 255, 255)
-            self.set_font("Helvetica", "B", 9)
-            self.cell(80, 8, " SUBCATEGORIA", 0, 0, 'L', True)
-            self.cell(40, 8, " MERCADO (6M)", 0, 0, 'C', True)
-            self.cell(30, 8, " SCORE", 0, 0, 'C', True)
-            self.cell(40, 8, " STATUS", 0, 1, 'C', True)
-            
-            self.set_text_color(self.text_color[0], self.text_color[1], self.text_color[2])
-            self.set_font("Helvetica", "", 8)
-            fill = False
-            for _, row in df_foco_ok.iterrows():
-                self.set_fill_color(self.secondary_color[0], self.secondary_color[1], self.secondary_color[2])
-                self.cell(80, 7, f" {self.clean_text(str(row['Subcategoria'])[:40])}", 0, 0, 'L', fill)
-                self.cell(40, 7, f"R$ {self.format_br(row['Mercado (R$)'])}", 0, 0, 'C', fill)
-                self.cell(30, 7, f"{row['Score']:.2f}", 0, 0, 'C', fill)
-                status = row['Status']
-                if status == "FOCO": self.set_text_color(220, 38, 38)
-                elif status == "OK": self.set_text_color(5, 150, 105)
-                self.cell(40, 7, status, 0, 1, 'C', fill)
-                self.set_text_color(self.text_color[0], self.text_color[1], self.text_color[2])
-                fill = not fill
+            self.draw_table(df_foco_ok, colunas, header_color=self.primary_color, top_n=5)
         else:
             self.set_font("Helvetica", "I", 9)
             self.cell(0, 8, "Nenhuma oportunidade de alto impacto identificada.", 0, 1)
@@ -259,30 +325,11 @@ class PDFReportGenerator(FPDF):
         self.cell(0, 8, "2.2. Categorias a Monitorar/Evitar", 0, 1, "L")
         self.ln(2)
 
-        df_evitar = df_ranking[df_ranking["Status"] == "EVITAR"].sort_values(by="Score", ascending=True).head(5)
+        df_evitar = df_ranking[df_ranking["Status"] == "EVITAR"].sort_values(by="Score", ascending=True)
         
         if not df_evitar.empty:
-            # Cabeçalho da Tabela
-            self.set_fill_color(107, 114, 128) # Cinza para evitar
-            self.set_text_color(255, 255, 255)
-            self.set_font("Helvetica", "B", 9)
-            self.cell(80, 8, " SUBCATEGORIA", 0, 0, 'L', True)
-            self.cell(40, 8, " MERCADO (6M)", 0, 0, 'C', True)
-            self.cell(30, 8, " SCORE", 0, 0, 'C', True)
-            self.cell(40, 8, " STATUS", 0, 1, 'C', True)
-            
-            self.set_text_color(self.text_color[0], self.text_color[1], self.text_color[2])
-            self.set_font("Helvetica", "", 8)
-            fill = False
-            for _, row in df_evitar.iterrows():
-                self.set_fill_color(self.secondary_color[0], self.secondary_color[1], self.secondary_color[2])
-                self.cell(80, 7, f" {self.clean_text(str(row['Subcategoria'])[:40])}", 0, 0, 'L', fill)
-                self.cell(40, 7, f"R$ {self.format_br(row['Mercado (R$)'])}", 0, 0, 'C', fill)
-                self.cell(30, 7, f"{row['Score']:.2f}", 0, 0, 'C', fill)
-                self.set_text_color(156, 163, 175) # Cinza claro para status evitar
-                self.cell(40, 7, row['Status'], 0, 1, 'C', fill)
-                self.set_text_color(self.text_color[0], self.text_color[1], self.text_color[2])
-                fill = not fill
+            colunas[-1] = dict(colunas[-1], cores={"EVITAR": (156, 163, 175)}) # Cinza claro para status evitar
+            self.draw_table(df_evitar, colunas, header_color=(107, 114, 128), top_n=5)
         else:
             self.set_font("Helvetica", "I", 9)
             self.cell(0, 8, "Nenhuma categoria crítica identificada no momento.", 0, 1)
@@ -466,6 +513,34 @@ class PDFReportGenerator(FPDF):
         else:
             return f"{value:,.2f}".replace(".", "X").replace(",", ".").replace("X", ",")
 
+    def format_br_column(self, values):
+        """Versão vetorizada de format_br para uma coluna inteira"""
+        valores = pd.to_numeric(pd.Series(values), errors='coerce').fillna(0.0).to_numpy(dtype=float)
+        escala = np.select([valores >= 1_000_000, valores >= 1_000], [1_000_000.0, 1_000.0], 1.0)
+        sufixo = np.select([valores >= 1_000_000, valores >= 1_000], ["M", "K"], "")
+        escalados = valores / escala
+        textos = [f"{v:,.1f}" if e > 1 else f"{v:,.2f}" for v, e in zip(escalados, escala)]
+        return (pd.Series(textos).str.translate(str.maketrans(".,", ",.")) + sufixo).tolist()
+
+    def format_column(self, serie, coluna):
+        """Pré-formata uma coluna de tabela conforme o formato declarado"""
+        formato = coluna.get('formato', 'texto')
+        vazios = serie.isna().to_numpy()
+        if formato == 'moeda':
+            textos = ["R$ " + t for t in self.format_br_column(serie)]
+        elif formato == 'decimal':
+            textos = pd.to_numeric(serie, errors='coerce').map("{:.2f}".format).tolist()
+        elif formato == 'percentual':
+            textos = pd.to_numeric(serie, errors='coerce').map("{:+.1f}%".format).tolist()
+        else:
+            # clean_text roda apenas uma vez por valor distinto
+            limite = coluna.get('limite')
+            unicos = pd.unique(serie.dropna().astype(str))
+            limpos = {u: self.clean_text(u[:limite] if limite else u) for u in unicos}
+            prefixo = " " if coluna.get('alinhamento', 'C') == 'L' else ""
+            textos = [prefixo + limpos.get(str(v), "") for v in serie.tolist()]
+        return [("" if vazio else t) for t, vazio in zip(textos, vazios)]
+
     def generate_report(self, filename="relatorio_executivo.pdf"):
         self.add_page()
         self.alias_nb_pages()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Análise de portfólio: vários perfis de cliente contra um mesmo conjunto de dados de mercado
+"""
+
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from utils.market_analyzer import MarketAnalyzer
+
+
+COLUNAS_CLIENTE = ['cliente', 'ticket_medio', 'ticket_custom', 'margem', 'range_permitido', 'faturamento_3m', 'unidades_3m']
+
+
+def normalizar_clientes(clientes: Union[pd.DataFrame, List[Dict]]) -> pd.DataFrame:
+    """
+    Padroniza a tabela de perfis com as mesmas regras de MarketAnalyzer.set_cliente_data:
+    margem e range em % viram fração, ticket custom tem prioridade e, sem ticket,
+    usa-se faturamento_3m / unidades_3m. Aceita 'empresa' como nome da coluna do cliente.
+    """
+    df = clientes.copy() if isinstance(clientes, pd.DataFrame) else pd.DataFrame(list(clientes))
+    if 'cliente' not in df.columns:
+        df['cliente'] = df['empresa'] if 'empresa' in df.columns else [f"Cliente {i + 1}" for i in range(len(df))]
+    df = df.reindex(columns=COLUNAS_CLIENTE)
+    for col in COLUNAS_CLIENTE[1:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    df['margem'] = df['margem'].fillna(0.0)
+    df['margem'] = np.where(df['margem'] > 1, df['margem'] / 100, df['margem'])
+    df['range_permitido'] = df['range_permitido'].fillna(0.20)
+    df['range_permitido'] = np.where(df['range_permitido'] > 1, df['range_permitido'] / 100, df['range_permitido'])
+    df['faturamento_3m'] = df['faturamento_3m'].fillna(0.0)
+    ticket_calculado = df['faturamento_3m'] / df['unidades_3m'].where(df['unidades_3m'] > 0)
+    df['ticket_medio'] = df['ticket_medio'].where(df['ticket_medio'] > 0, ticket_calculado).fillna(0.0)
+    df['ticket_cliente'] = df['ticket_custom'].where(df['ticket_custom'] > 0, df['ticket_medio'])
+    return df.set_index('cliente')
+
+
+def analisar_portfolio(analyzer: MarketAnalyzer, clientes: Union[pd.DataFrame, List[Dict]],
+                       top_k: int = 5, categoria: str = None) -> Dict:
+    """
+    Calcula de uma vez (broadcast clientes × subcategorias) o score, o fit de ticket e o status
+    de cada cliente em cada subcategoria, com as mesmas regras de calcular_score,
+    calcular_fit_ticket e calcular_status. Retorna:
+    - 'score', 'fit', 'status': DataFrames (linhas = clientes, colunas = (categoria, subcategoria))
+    - 'top': DataFrame longo com as top_k subcategorias de cada cliente (seleção por argpartition)
+    """
+    perfis = normalizar_clientes(clientes)
+    subcats = pd.DataFrame(analyzer.get_subcategorias_consolidadas(categoria))
+    colunas = pd.MultiIndex.from_frame(subcats[['categoria', 'subcategoria']]) if not subcats.empty \
+        else pd.MultiIndex.from_tuples([], names=['categoria', 'subcategoria'])
+    if subcats.empty or perfis.empty:
+        vazio = pd.DataFrame(index=perfis.index, columns=colunas, dtype=float)
+        return {'score': vazio, 'fit': vazio.astype(object), 'status': vazio.astype(object),
+                'top': pd.DataFrame(columns=['cliente', 'posicao', 'categoria', 'subcategoria', 'score', 'status'])}
+
+    # Vetores por subcategoria (1 × S) e por cliente (N × 1)
+    faturamento = subcats['faturamento_6m'].to_numpy(dtype=float)
+    max_categoria = subcats.groupby('categoria')['faturamento_6m'].transform('max').to_numpy(dtype=float)
+    gravidade = np.divide(faturamento, max_categoria, out=np.zeros_like(faturamento), where=max_categoria > 0)[None, :]
+    ticket_mercado = subcats['ticket_medio'].to_numpy(dtype=float)[None, :]
+
+    ticket_cliente = perfis['ticket_cliente'].to_numpy(dtype=float)[:, None]
+    faixa = perfis['range_permitido'].to_numpy(dtype=float)[:, None]
+    margem = perfis['margem'].to_numpy(dtype=float)[:, None]
+
+    # U - Urgência (fit de ticket) e score final
+    diff_pct = np.divide(np.abs(ticket_cliente - ticket_mercado), ticket_mercado,
+                         out=np.ones((len(perfis), len(subcats))), where=ticket_mercado > 0)
+    urgencia = np.select([diff_pct <= faixa, ticket_cliente < ticket_mercado], [1.0, 0.7], 0.3)
+    score = np.minimum(1.0, gravidade * 0.4 + urgencia * 0.4 + margem * 0.2)
+
+    # Fit e status
+    inferior, superior = ticket_mercado * (1 - faixa), ticket_mercado * (1 + faixa)
+    dentro = (inferior <= ticket_cliente) & (ticket_cliente <= superior)
+    fit = np.where(dentro, "DENTRO", np.where(ticket_cliente < inferior, "ABAIXO", "ACIMA"))
+    status = np.where((score >= 0.7) & dentro, "FOCO", np.where((score >= 0.4) | dentro, "OK", "EVITAR"))
+
+    # Top-K por cliente: argpartition (O(S)) e ordenação apenas dos K selecionados
+    k = min(max(int(top_k), 1), score.shape[1])
+    linhas = np.arange(score.shape[0])[:, None]
+    candidatos = np.argpartition(-score, k - 1, axis=1)[:, :k]
+    ordem = np.argsort(-score[linhas, candidatos], axis=1, kind='stable')
+    top_idx = candidatos[linhas, ordem]
+    top = pd.DataFrame({
+        'cliente': np.repeat(perfis.index.to_numpy(), k),
+        'posicao': np.tile(np.arange(1, k + 1), len(perfis)),
+        'categoria': subcats['categoria'].to_numpy()[top_idx].ravel(),
+        'subcategoria': subcats['subcategoria'].to_numpy()[top_idx].ravel(),
+        'score': score[linhas, top_idx].ravel(),
+        'status': status[linhas, top_idx].ravel()
+    })
+
+    return {
+        'score': pd.DataFrame(score, index=perfis.index, columns=colunas),
+        'fit': pd.DataFrame(fit.astype(object), index=perfis.index, columns=colunas, dtype=object),
+        'status': pd.DataFrame(status.astype(object), index=perfis.index, columns=colunas, dtype=object),
+        'top': top
+    }
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rastreamento por etapas da importação de planilhas: cada etapa (leitura das abas, detecção de
+colunas, conversão das linhas, carga no analyzer) vira uma linha JSON no log local, com duração,
+linhas lidas/rejeitadas e o erro, se houver. O log só é gravado quando MERCADO_LOG_IMPORTACAO
+aponta o arquivo; sem ela as etapas ficam apenas em memória (RastreioImportacao.etapas).
+"""
+
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+_trava = threading.Lock()
+
+
+def caminho_log() -> Optional[str]:
+    """Arquivo de log (JSON Lines) configurado em MERCADO_LOG_IMPORTACAO; None desativa a gravação"""
+    caminho = os.environ.get("MERCADO_LOG_IMPORTACAO", "").strip()
+    return caminho or None
+
+
+def nome_arquivo(file) -> str:
+    """Nome legível da origem: caminho, UploadedFile do Streamlit ou buffer"""
+    if isinstance(file, (str, os.PathLike)):
+        return Path(file).name
+    return getattr(file, 'name', None) or type(file).__name__
+
+
+def tamanho_arquivo(file) -> Optional[int]:
+    if isinstance(file, (str, os.PathLike)):
+        try:
+            return os.path.getsize(file)
+        except OSError:
+            return None
+    tamanho = getattr(file, 'size', None)
+    if tamanho is None and hasattr(file, 'getbuffer'):
+        tamanho = file.getbuffer().nbytes
+    return tamanho
+
+
+class RastreioImportacao:
+    """
+    Rastreio de uma importação. Usado como gerenciador de contexto: cada `with rastreio.etapa(nome)`
+    grava uma linha ao terminar, e a saída do bloco principal grava o resumo da importação.
+
+        with RastreioImportacao(arquivo) as rastreio:
+            with rastreio.etapa('ler_cliente') as etapa:
+                etapa['linhas'] = len(df)
+    """
+
+    def __init__(self, arquivo=None, destino: Optional[str] = None, **contexto):
+        self.id = uuid.uuid4().hex[:12]
+        self.destino = caminho_log() if destino is None else (destino or None)
+        self.contexto = {'arquivo': nome_arquivo(arquivo) if arquivo is not None else None,
+                         'bytes': tamanho_arquivo(arquivo) if arquivo is not None else None, **contexto}
+        self.etapas = []
+        self.etapa_atual = None
+        self.inicio = None
+
+    def _gravar(self, registro: Dict):
+        if not self.destino:
+            return
+        linha = json.dumps(registro, ensure_ascii=False, default=str)
+        try:
+            Path(self.destino).parent.mkdir(parents=True, exist_ok=True)
+            with _trava, open(self.destino, 'a', encoding='utf-8') as f:
+                f.write(linha + "\n")
+        except OSError:
+            # O log nunca deve derrubar a importação
+            pass
+
+    def _registro(self, evento: str, **campos) -> Dict:
+        return {'data': datetime.now().isoformat(timespec='milliseconds'), 'importacao': self.id,
+                'evento': evento, **campos}
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, tb):
+        resumo = {
+            **self.contexto,
+            'status': 'erro' if erro else 'ok',
+            'duracao_s': round(time.perf_counter() - self.inicio, 6),
+            'etapas': {e['etapa']: e['duracao_s'] for e in self.etapas},
+            'linhas': sum(e.get('linhas', 0) for e in self.etapas if e['etapa'].startswith('ler_')),
+            'rejeitadas': sum(e.get('rejeitadas', 0) for e in self.etapas),
+        }
+        if erro:
+            resumo.update({'etapa_erro': self.etapa_atual, 'erro': f"{tipo.__name__}: {erro}"})
+        self._gravar(self._registro('importacao', **resumo))
+        return False
+
+    @contextmanager
+    def etapa(self, nome: str, **campos):
+        """
+        Mede uma etapa. O dicionário entregue ao bloco recebe contagens (linhas, rejeitadas, ...)
+        que vão para o log junto da duração; uma exceção marca a etapa como erro e é propagada.
+        """
+        self.etapa_atual = nome
+        dados = dict(campos)
+        inicio = time.perf_counter()
+        status, erro = 'ok', None
+        try:
+            yield dados
+        except Exception as e:
+            status = 'erro'
+            erro = {'tipo': type(e).__name__, 'mensagem': str(e),
+                    'origem': traceback.format_exception(type(e), e, e.__traceback__)[-2].strip()
+                    if e.__traceback__ else None}
+            raise
+        finally:
+            registro = {'etapa': nome, 'status': status, 'duracao_s': round(time.perf_counter() - inicio, 6), **dados}
+            if erro:
+                registro['erro'] = erro
+            self.etapas.append(registro)
+            self._gravar(self._registro('etapa', arquivo=self.contexto['arquivo'], **registro))
+            if status == 'ok':
+                self.etapa_atual = None
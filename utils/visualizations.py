@@ -5,15 +5,278 @@ Módulo de visualizações com Plotly
 """
 
 import plotly.graph_objects as go
+import plotly.io as pio
 import plotly.express as px
+from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
 from typing import Dict, List
 
 
-def criar_grafico_evolucao_categoria(df: pd.DataFrame) -> go.Figure:
-    """Cria gráfico de evolução da categoria ao longo do tempo"""
+# --- TEMA ESCURO ---
+# Template único registrado no Plotly e aplicado por nome. Por ser enxuto, também
+# substitui o template padrão "plotly" (~6 KB) que seria embutido em cada figura.
+
+TEMA_ESCURO = 'mercado_dark'
+
+_EIXO_ESCURO = dict(
+    gridcolor='rgba(255,255,255,0.1)',
+    zerolinecolor='rgba(255,255,255,0.2)',
+    linecolor='#333333',
+    automargin=True
+)
+
+pio.templates[TEMA_ESCURO] = go.layout.Template(layout=dict(
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    font=dict(color='#FFFFFF'),
+    colorway=['#1E3A8A', '#2ecc71', '#f39c12', '#e74c3c', '#3498db', '#9b59b6'],
+    xaxis=_EIXO_ESCURO,
+    yaxis=_EIXO_ESCURO,
+    legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+    margin=dict(l=40, r=20, t=60, b=40)
+))
+
+
+# --- CACHE DE FIGURAS ---
+# As figuras são memoizadas por uma assinatura barata dos DataFrames de entrada
+# mais os demais argumentos. O cache guarda a especificação congelada (fig.to_dict()) e
+# cada chamada recebe uma figura nova, que pode ser alterada sem afetar outras sessões.
+# O cache é do processo inteiro (compartilhado pelas threads das sessões do Streamlit),
+# por isso todo acesso passa por _trava_cache.
+
+TAMANHO_CACHE_FIGURAS = 64
+
+_cache_figuras = OrderedDict()
+_trava_cache = threading.Lock()
+_estatisticas_cache = {'hits': 0, 'misses': 0, 'segundos': 0.0}
+
+
+def _assinatura(valor):
+    """Gera uma chave hashable e barata para os argumentos de um gráfico"""
+    if isinstance(valor, pd.DataFrame):
+        hashes = pd.util.hash_pandas_object(valor, index=True).to_numpy()
+        digest = hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+        return ('df', valor.shape, tuple(map(str, valor.columns)), digest)
+    if isinstance(valor, pd.Series):
+        hashes = pd.util.hash_pandas_object(valor, index=True).to_numpy()
+        return ('serie', str(valor.name), hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest())
+    if isinstance(valor, dict):
+        return ('dict', tuple(sorted((str(k), _assinatura(v)) for k, v in valor.items())))
+    if isinstance(valor, (list, tuple)):
+        return ('seq', tuple(_assinatura(v) for v in valor))
+    hash(valor)
+    return valor
+
+
+def cache_figura(func):
+    """Memoiza o construtor de gráfico com despejo LRU limitado a TAMANHO_CACHE_FIGURAS"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            chave = (func.__name__, _assinatura(args), _assinatura(kwargs))
+        except (TypeError, ValueError):
+            # Argumentos não hashable: constrói sem cache
+            return func(*args, **kwargs)
+
+        with _trava_cache:
+            spec = _cache_figuras.get(chave)
+            if spec is not None:
+                _cache_figuras.move_to_end(chave)
+                _estatisticas_cache['hits'] += 1
+        if spec is not None:
+            # A especificação já foi validada ao construir: recriar sem validar custa < 1 ms
+            return go.Figure(spec, _validate=False)
+
+        # Construída fora da trava: sessões diferentes não esperam umas pelas outras
+        inicio = time.perf_counter()
+        fig = func(*args, **kwargs)
+        duracao = time.perf_counter() - inicio
+        spec = fig.to_dict()
+        with _trava_cache:
+            _estatisticas_cache['misses'] += 1
+            _estatisticas_cache['segundos'] += duracao
+            _cache_figuras[chave] = spec
+            _cache_figuras.move_to_end(chave)
+            while len(_cache_figuras) > TAMANHO_CACHE_FIGURAS:
+                _cache_figuras.popitem(last=False)
+        return fig
+    return wrapper
+
+
+def limpar_cache_figuras():
+    """Esvazia o cache de figuras e zera as estatísticas"""
+    with _trava_cache:
+        _cache_figuras.clear()
+        _estatisticas_cache.update({'hits': 0, 'misses': 0, 'segundos': 0.0})
+
+
+def estatisticas_cache_figuras() -> Dict:
+    """Retorna hits, misses, taxa de acerto, ocupação do cache de figuras e tempo gasto construindo figuras"""
+    with _trava_cache:
+        estatisticas = dict(_estatisticas_cache)
+        tamanho = len(_cache_figuras)
+    total = estatisticas['hits'] + estatisticas['misses']
+    return {
+        'hits': estatisticas['hits'],
+        'misses': estatisticas['misses'],
+        'taxa_acerto': estatisticas['hits'] / total if total else 0.0,
+        'tamanho': tamanho,
+        'capacidade': TAMANHO_CACHE_FIGURAS,
+        'segundos_construcao': estatisticas['segundos']
+    }
+
+
+# --- SÉRIES LONGAS ---
+# Acima de LIMITE_PONTOS_SERIE pontos os gráficos de evolução passam a usar Scattergl
+# (WebGL) e a série é reduzida no servidor, preservando picos e vales.
+
+LIMITE_PONTOS_SERIE = 500
+
+
+def _indices_lttb(y: np.ndarray, n_alvo: int) -> np.ndarray:
+    """Seleciona n_alvo índices pelo algoritmo Largest-Triangle-Three-Buckets"""
+    n = len(y)
+    if n_alvo >= n or n_alvo < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float)
+    limites = np.linspace(1, n - 1, n_alvo - 1).astype(int)
+    indices = np.empty(n_alvo, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(n_alvo - 2):
+        inicio, fim = limites[i], limites[i + 1]
+        # Média do próximo balde (ou o último ponto)
+        prox_fim = limites[i + 2] if i + 2 < len(limites) else n
+        media_x = x[fim:prox_fim].mean() if prox_fim > fim else x[-1]
+        media_y = y[fim:prox_fim].mean() if prox_fim > fim else y[-1]
+        area = np.abs(
+            (x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+            - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior])
+        )
+        anterior = inicio + int(np.argmax(area))
+        indices[i + 1] = anterior
+    return indices
+
+
+def _indices_minmax(y: np.ndarray, n_alvo: int) -> np.ndarray:
+    """Seleciona o mínimo e o máximo de cada balde (n_alvo / 2 baldes)"""
+    n = len(y)
+    if n_alvo >= n or n_alvo < 4:
+        return np.arange(n)
+    limites = np.linspace(0, n, n_alvo // 2 + 1).astype(int)
+    indices = [0, n - 1]
+    for inicio, fim in zip(limites[:-1], limites[1:]):
+        if fim > inicio:
+            trecho = y[inicio:fim]
+            indices.extend((inicio + int(np.argmin(trecho)), inicio + int(np.argmax(trecho))))
+    return np.unique(indices)
+
+
+def _adicionar_series_evolucao(fig: go.Figure, df: pd.DataFrame, cores: Dict,
+                               fidelidade_total: bool = False, metodo: str = 'lttb'):
+    """Adiciona as séries de Faturamento (y1) e Unidades (y2), reduzindo séries longas"""
+    grande = len(df) > LIMITE_PONTOS_SERIE
+    if grande and 'periodo_dt' in df.columns:
+        # Eixo temporal real: os pontos descartados não distorcem o espaçamento
+        x = df['periodo_dt']
+    else:
+        x = df['periodo_label'] if 'periodo_label' in df.columns else df['periodo']
+
+    faturamento = pd.to_numeric(df['faturamento'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    unidades = pd.to_numeric(df['unidades'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    x = x.to_numpy()
+
+    if grande and not fidelidade_total:
+        reduzir = _indices_minmax if metodo == 'minmax' else _indices_lttb
+        indices = np.union1d(reduzir(faturamento, LIMITE_PONTOS_SERIE // 2),
+                             reduzir(unidades, LIMITE_PONTOS_SERIE // 2))
+        x, faturamento, unidades = x[indices], faturamento[indices], unidades[indices]
+
+    Trace = go.Scattergl if grande else go.Scatter
+    modo = 'lines' if grande else 'lines+markers'
+
+    # Faturamento
+    fig.add_trace(Trace(
+        x=x,
+        y=faturamento,
+        name='Faturamento',
+        mode=modo,
+        line=dict(color=cores['faturamento'], width=3),
+        marker=dict(size=8),
+        yaxis='y1'
+    ))
+
+    # Unidades
+    fig.add_trace(Trace(
+        x=x,
+        y=unidades,
+        name='Unidades',
+        mode=modo,
+        line=dict(color=cores['unidades'], width=3),
+        marker=dict(size=8),
+        yaxis='y2'
+    ))
+
+
+# --- TOP-N COM "OUTROS" ---
+
+def _top_n_com_outros(df: pd.DataFrame, coluna_ordem: str, top_n: int = None,
+                      participacao_minima: float = None) -> pd.DataFrame:
+    """
+    Mantém as top_n linhas por coluna_ordem (seleção parcial via argpartition) e,
+    opcionalmente, só as com participação em 'Mercado (R$)' >= participacao_minima.
+    O restante é agregado em um único nó "Outros" com o faturamento somado e o
+    score ponderado pelo tamanho de mercado.
+    """
+    n = len(df)
+    manter = np.ones(n, dtype=bool)
+
+    if participacao_minima is not None and 'Mercado (R$)' in df.columns:
+        mercado = pd.to_numeric(df['Mercado (R$)'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        total = mercado.sum()
+        if total > 0:
+            manter &= (mercado / total) >= participacao_minima
+
+    valores = pd.to_numeric(df[coluna_ordem], errors='coerce').fillna(-np.inf).to_numpy(dtype=float)
+    candidatos = np.flatnonzero(manter)
+    if top_n is not None and len(candidatos) > top_n:
+        escolhidos = candidatos[np.argpartition(-valores[candidatos], top_n - 1)[:top_n]]
+        manter = np.zeros(n, dtype=bool)
+        manter[escolhidos] = True
+
+    if manter.all():
+        return df
+
+    topo = df.iloc[np.flatnonzero(manter)]
+    topo = topo.iloc[np.argsort(-valores[manter], kind='stable')]
+    cauda = df.iloc[np.flatnonzero(~manter)]
+
+    mercado_cauda = pd.to_numeric(cauda['Mercado (R$)'], errors='coerce').fillna(0) if 'Mercado (R$)' in cauda.columns else None
+    linha_outros = {'Subcategoria': f'Outros ({len(cauda)})', 'Status': 'OUTROS'}
+    if mercado_cauda is not None:
+        linha_outros['Mercado (R$)'] = mercado_cauda.sum()
+    if 'Unidades 6M' in cauda.columns:
+        linha_outros['Unidades 6M'] = pd.to_numeric(cauda['Unidades 6M'], errors='coerce').sum()
+    if 'Score' in cauda.columns:
+        scores = pd.to_numeric(cauda['Score'], errors='coerce').fillna(0)
+        peso = mercado_cauda.sum() if mercado_cauda is not None else 0
+        linha_outros['Score'] = float((scores * mercado_cauda).sum() / peso) if peso > 0 else float(scores.mean())
+
+    return pd.concat([topo, pd.DataFrame([linha_outros])], ignore_index=True)
+
+
+@cache_figura
+def criar_grafico_evolucao_categoria(df: pd.DataFrame, fidelidade_total: bool = False) -> go.Figure:
+    """Cria gráfico de evolução da categoria ao longo do tempo (fidelidade_total desativa a redução de séries longas)"""
     if df.empty:
-        return go.Figure()
+        return go.Figure(layout_template=TEMA_ESCURO)
     
     # Garantir ordenação cronológica e continuidade
     try:
@@ -45,30 +308,10 @@ def criar_grafico_evolucao_categoria(df: pd.DataFrame) -> go.Figure:
         pass
     
     fig = go.Figure()
-    
-    # Faturamento
-    fig.add_trace(go.Scatter(
-        x=df['periodo_label'] if 'periodo_label' in df.columns else df['periodo'],
-        y=df['faturamento'],
-        name='Faturamento',
-        mode='lines+markers',
-        line=dict(color='#1f77b4', width=3),
-        marker=dict(size=8),
-        yaxis='y1'
-    ))
-    
-    # Unidades
-    fig.add_trace(go.Scatter(
-        x=df['periodo_label'] if 'periodo_label' in df.columns else df['periodo'],
-        y=df['unidades'],
-        name='Unidades',
-        mode='lines+markers',
-        line=dict(color='#ff7f0e', width=3),
-        marker=dict(size=8),
-        yaxis='y2'
-    ))
+    _adicionar_series_evolucao(fig, df, {'faturamento': '#1f77b4', 'unidades': '#ff7f0e'}, fidelidade_total)
     
     fig.update_layout(
+        template=TEMA_ESCURO,
         title='Evolução da Categoria (Macro)',
         xaxis=dict(title='Período'),
         yaxis=dict(
@@ -83,17 +326,17 @@ def criar_grafico_evolucao_categoria(df: pd.DataFrame) -> go.Figure:
             showgrid=False
         ),
         hovermode='x unified',
-        height=400,
-        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+        height=400
     )
     
     return fig
 
 
+@cache_figura
 def criar_grafico_ticket_medio(df: pd.DataFrame) -> go.Figure:
     """Cria gráfico de evolução do ticket médio"""
     if df.empty:
-        return go.Figure()
+        return go.Figure(layout_template=TEMA_ESCURO)
     
     # Garantir ordenação cronológica
     try:
@@ -117,6 +360,7 @@ def criar_grafico_ticket_medio(df: pd.DataFrame) -> go.Figure:
     ))
     
     fig.update_layout(
+        template=TEMA_ESCURO,
         title='Evolução do Ticket Médio da Categoria',
         xaxis=dict(title='Período'),
         yaxis=dict(title='Ticket Médio (R$)'),
@@ -127,10 +371,14 @@ def criar_grafico_ticket_medio(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def criar_grafico_ranking_subcategorias(df: pd.DataFrame) -> go.Figure:
-    """Cria gráfico de barras horizontal com ranking de subcategorias"""
+@cache_figura
+def criar_grafico_ranking_subcategorias(df: pd.DataFrame, top_n: int = 30,
+                                        participacao_minima: float = None) -> go.Figure:
+    """Cria gráfico de barras horizontal com ranking de subcategorias (cauda agregada em "Outros")"""
     if df.empty:
-        return go.Figure()
+        return go.Figure(layout_template=TEMA_ESCURO)
+    
+    df = _top_n_com_outros(df, 'Score', top_n, participacao_minima)
     
     # Definir cores por status
     color_map = {
@@ -157,6 +405,7 @@ def criar_grafico_ranking_subcategorias(df: pd.DataFrame) -> go.Figure:
     ))
     
     fig.update_layout(
+        template=TEMA_ESCURO,
         title='Ranking de Subcategorias por Score',
         xaxis=dict(title='Score', range=[0, 1.1]),
         yaxis=dict(title='', autorange='reversed'),
@@ -167,13 +416,15 @@ def criar_grafico_ranking_subcategorias(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def criar_grafico_mercado_subcategorias(df: pd.DataFrame) -> go.Figure:
-    """Cria gráfico de pizza/treemap com tamanho de mercado"""
+@cache_figura
+def criar_grafico_mercado_subcategorias(df: pd.DataFrame, top_n: int = 10,
+                                        participacao_minima: float = None) -> go.Figure:
+    """Cria gráfico de pizza/treemap com tamanho de mercado (cauda agregada em "Outros")"""
     if df.empty:
-        return go.Figure()
+        return go.Figure(layout_template=TEMA_ESCURO)
     
-    # Usar apenas top 10 para visualização
-    df_top = df.head(10).copy()
+    # Top N por tamanho de mercado; o restante vira um único nó "Outros"
+    df_top = _top_n_com_outros(df, 'Mercado (R$)', top_n, participacao_minima)
     
     fig = px.treemap(
         df_top,
@@ -181,7 +432,8 @@ def criar_grafico_mercado_subcategorias(df: pd.DataFrame) -> go.Figure:
         values='Mercado (R$)',
         color='Score',
         color_continuous_scale='RdYlGn',
-        title='Tamanho de Mercado por Subcategoria'
+        title='Tamanho de Mercado por Subcategoria',
+        template=TEMA_ESCURO
     )
     
     fig.update_traces(
@@ -189,15 +441,16 @@ def criar_grafico_mercado_subcategorias(df: pd.DataFrame) -> go.Figure:
         texttemplate='<b>%{label}</b><br>R$ %{value:,.0f}<br>%{percentRoot}'
     )
     
-    fig.update_layout(height=500)
+    fig.update_layout(template=TEMA_ESCURO, height=500)
     
     return fig
 
 
+@cache_figura
 def criar_grafico_cenarios(df_cenarios: pd.DataFrame) -> go.Figure:
     """Cria gráfico comparativo de cenários"""
     if df_cenarios.empty:
-        return go.Figure()
+        return go.Figure(layout_template=TEMA_ESCURO)
     
     fig = go.Figure()
     
@@ -222,21 +475,22 @@ def criar_grafico_cenarios(df_cenarios: pd.DataFrame) -> go.Figure:
     ))
     
     fig.update_layout(
+        template=TEMA_ESCURO,
         title='Comparação de Cenários - Receita e Lucro Projetados',
         xaxis=dict(title='Cenário'),
         yaxis=dict(title='Valor (R$)'),
         barmode='group',
-        height=450,
-        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+        height=450
     )
     
     return fig
 
 
+@cache_figura
 def criar_grafico_crescimento(df_cenarios: pd.DataFrame) -> go.Figure:
     """Cria gráfico de crescimento percentual"""
     if df_cenarios.empty:
-        return go.Figure()
+        return go.Figure(layout_template=TEMA_ESCURO)
     
     fig = go.Figure()
     
@@ -254,6 +508,7 @@ def criar_grafico_crescimento(df_cenarios: pd.DataFrame) -> go.Figure:
     ))
     
     fig.update_layout(
+        template=TEMA_ESCURO,
         title='Crescimento Percentual vs Situação Atual',
         xaxis=dict(title='Cenário'),
         yaxis=dict(title='Crescimento (%)'),
@@ -263,6 +518,7 @@ def criar_grafico_crescimento(df_cenarios: pd.DataFrame) -> go.Figure:
     return fig
 
 
+@cache_figura
 def criar_gauge_score(score: float, status: str) -> go.Figure:
     """Cria indicador gauge para o score"""
     # Definir cor baseada no status
@@ -297,6 +553,7 @@ def criar_gauge_score(score: float, status: str) -> go.Figure:
     ))
     
     fig.update_layout(
+        template=TEMA_ESCURO,
         height=300,
         margin=dict(l=20, r=20, t=60, b=20)
     )
@@ -304,6 +561,7 @@ def criar_gauge_score(score: float, status: str) -> go.Figure:
     return fig
 
 
+@cache_figura
 def criar_comparacao_tickets(ticket_mercado: float, ticket_cliente: float, 
                              limite_inf: float, limite_sup: float) -> go.Figure:
     """Cria gráfico comparativo de tickets"""
@@ -344,86 +602,74 @@ def criar_comparacao_tickets(ticket_mercado: float, ticket_cliente: float,
     ))
     
     fig.update_layout(
+        template=TEMA_ESCURO,
         title='Comparação de Tickets - Cliente vs Mercado',
         xaxis=dict(title=''),
         yaxis=dict(title='Valor (R$)'),
         height=350,
-        showlegend=True,
-        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
+        showlegend=True
     )
     
     return fig
 
-def criar_grafico_evolucao_subcategoria(df_mensal: pd.DataFrame, subcategoria: str) -> go.Figure:
-    """Cria gráfico de evolução mensal para uma subcategoria específica"""
+@cache_figura
+def criar_grafico_evolucao_subcategoria(df_mensal: pd.DataFrame, subcategoria: str, fidelidade_total: bool = False) -> go.Figure:
+    """
+    Cria gráfico de evolução mensal para uma subcategoria específica (fidelidade_total desativa a redução de séries longas).
+    Aceita os registros mensais brutos ou a série contínua de MarketAnalyzer.get_evolucao_subcategoria,
+    que já vem preenchida e dispensa o filtro e o merge.
+    """
     if df_mensal.empty:
-        return go.Figure()
+        return go.Figure(layout_template=TEMA_ESCURO)
     
-    # Filtrar apenas a subcategoria desejada
-    df_sub = df_mensal[df_mensal['subcategoria'] == subcategoria].copy()
+    if 'subcategoria' not in df_mensal.columns and 'periodo_label' in df_mensal.columns:
+        df_sub = df_mensal
+    else:
+        # Filtrar apenas a subcategoria desejada
+        df_sub = df_mensal[df_mensal['subcategoria'] == subcategoria].copy()
     if df_sub.empty:
-        return go.Figure()
+        return go.Figure(layout_template=TEMA_ESCURO)
         
-    # Ordenar por período e garantir continuidade
-    try:
-        df_sub = df_sub.copy()
-        # Normalizar datas para o primeiro dia do mês
-        df_sub['periodo_dt'] = pd.to_datetime(df_sub['periodo'], errors='coerce').dt.to_period('M').dt.to_timestamp()
-        df_sub = df_sub.dropna(subset=['periodo_dt'])
+    # Série bruta: ordenar por período e garantir continuidade
+    if 'periodo_label' not in df_sub.columns:
+        try:
+            df_sub = df_sub.copy()
+            # Normalizar datas para o primeiro dia do mês
+            df_sub['periodo_dt'] = pd.to_datetime(df_sub['periodo'], errors='coerce').dt.to_period('M').dt.to_timestamp()
+            df_sub = df_sub.dropna(subset=['periodo_dt'])
         
-        if not df_sub.empty:
-            # Criar range completo de meses
-            min_date = df_sub['periodo_dt'].min()
-            max_date = df_sub['periodo_dt'].max()
-            all_months = pd.date_range(start=min_date, end=max_date, freq='MS')
+            if not df_sub.empty:
+                # Criar range completo de meses
+                min_date = df_sub['periodo_dt'].min()
+                max_date = df_sub['periodo_dt'].max()
+                all_months = pd.date_range(start=min_date, end=max_date, freq='MS')
             
-            df_full = pd.DataFrame({'periodo_dt': all_months})
-            df_sub = pd.merge(df_full, df_sub, on='periodo_dt', how='left')
+                df_full = pd.DataFrame({'periodo_dt': all_months})
+                df_sub = pd.merge(df_full, df_sub, on='periodo_dt', how='left')
             
-            # Ordenar pelo campo de data
-            df_sub = df_sub.sort_values('periodo_dt')
+                # Ordenar pelo campo de data
+                df_sub = df_sub.sort_values('periodo_dt')
             
-            # Atualizar a coluna para exibição
-            df_sub['periodo_label'] = df_sub['periodo_dt'].dt.strftime('%b %Y')
+                # Atualizar a coluna para exibição
+                df_sub['periodo_label'] = df_sub['periodo_dt'].dt.strftime('%b %Y')
             
-            # Preencher faturamento e unidades com 0 apenas onde for NaN
-            df_sub['faturamento'] = pd.to_numeric(df_sub['faturamento']).fillna(0)
-            df_sub['unidades'] = pd.to_numeric(df_sub['unidades']).fillna(0)
-    except Exception as e:
-        pass
+                # Preencher faturamento e unidades com 0 apenas onde for NaN
+                df_sub['faturamento'] = pd.to_numeric(df_sub['faturamento']).fillna(0)
+                df_sub['unidades'] = pd.to_numeric(df_sub['unidades']).fillna(0)
+        except Exception as e:
+            pass
     
     fig = go.Figure()
-    
-    # Faturamento
-    fig.add_trace(go.Scatter(
-        x=df_sub['periodo_label'] if 'periodo_label' in df_sub.columns else df_sub['periodo'],
-        y=df_sub['faturamento'],
-        name='Faturamento',
-        mode='lines+markers',
-        line=dict(color='#1E3A8A', width=3),
-        marker=dict(size=8),
-        yaxis='y1'
-    ))
-    
-    # Unidades
-    fig.add_trace(go.Scatter(
-        x=df_sub['periodo_label'] if 'periodo_label' in df_sub.columns else df_sub['periodo'],
-        y=df_sub['unidades'],
-        name='Unidades',
-        mode='lines+markers',
-        line=dict(color='#2ecc71', width=3),
-        marker=dict(size=8),
-        yaxis='y2'
-    ))
+    _adicionar_series_evolucao(fig, df_sub, {'faturamento': '#1E3A8A', 'unidades': '#2ecc71'}, fidelidade_total)
     
     fig.update_layout(
+        template=TEMA_ESCURO,
         title=f'Evolução Mensal: {subcategoria}',
         xaxis=dict(title='Período'),
         yaxis=dict(
             title='Faturamento (R$)',
             side='left',
-            showgrid=True,
-            gridcolor='rgba(255,255,255,0.1)'
+            showgrid=True
         ),
         yaxis2=dict(
             title='Unidades',
@@ -432,11 +678,60 @@ def criar_grafico_evolucao_subcategoria(df_mensal: pd.DataFrame, subcategoria: s
             showgrid=False
         ),
         hovermode='x unified',
-        height=400,
-        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='#FFFFFF')
+        height=400
+    )
+    
+    return fig
+
+
+@cache_figura
+def criar_grafico_evolucao_multiplas(grade_faturamento: pd.DataFrame, subcategorias: List[str],
+                                     colunas: int = 3) -> go.Figure:
+    """Cria pequenos múltiplos da evolução de faturamento (cada subcategoria é uma linha da grade mensal)"""
+    subcategorias = [s for s in subcategorias if s in grade_faturamento.index]
+    if grade_faturamento.empty or not subcategorias:
+        return go.Figure(layout_template=TEMA_ESCURO)
+    
+    linhas = (len(subcategorias) + colunas - 1) // colunas
+    fig = make_subplots(rows=linhas, cols=colunas, subplot_titles=subcategorias,
+                        shared_xaxes=True, vertical_spacing=0.12 if linhas > 1 else 0.2)
+    
+    meses = grade_faturamento.columns
+    valores = grade_faturamento.loc[subcategorias].to_numpy()
+    for i, serie in enumerate(valores):
+        fig.add_trace(go.Scatter(
+            x=meses,
+            y=serie,
+            mode='lines',
+            line=dict(color='#1E3A8A', width=2),
+            fill='tozeroy',
+            fillcolor='rgba(30, 58, 138, 0.2)',
+            name=subcategorias[i],
+            hovertemplate='%{x|%b %Y}<br>R$ %{y:,.0f}<extra></extra>'
+        ), row=i // colunas + 1, col=i % colunas + 1)
+    
+    fig.update_layout(
+        template=TEMA_ESCURO,
+        title='Evolução Mensal por Subcategoria',
+        height=max(300, linhas * 220),
+        showlegend=False
     )
     
     return fig
+
+
+def criar_grafico_historico_desempenho(historico: pd.DataFrame) -> go.Figure:
+    """Barras empilhadas do tempo por etapa nos últimos reruns (colunas: rerun, etapa, segundos)"""
+    if historico.empty:
+        return go.Figure(layout_template=TEMA_ESCURO)
+
+    fig = px.bar(historico, x='rerun', y='segundos', color='etapa', template=TEMA_ESCURO,
+                 labels={'rerun': 'Rerun', 'segundos': 'Tempo (s)', 'etapa': 'Etapa'})
+    fig.update_layout(
+        title='Últimos reruns',
+        height=300,
+        barmode='stack',
+        legend=dict(orientation='h', yanchor='top', y=-0.25, xanchor='left', x=0, font=dict(size=9)),
+        margin=dict(l=10, r=10, t=40, b=10)
+    )
+    return fig